@@ -6,9 +6,7 @@ from flask_jwt_extended import (
     get_jwt_identity,
     jwt_required,
 )
-from flask_limiter import Limiter
 from flask_cors import CORS
-from flask_limiter.util import get_remote_address
 import bcrypt
 from database import user_queries as db
 from util.activity_logger import log_activity
@@ -16,10 +14,10 @@ from util.models import RegisterRequest, LoginRequest
 from pydantic import ValidationError
 from util.authlib import role_scopes
 from config.settings import settings
+from util.limiter import limiter, rate_limits
 from database.user_queries import get_user_id_by_email, get_user_name_by_email
 
 auth_bp = Blueprint("auth", __name__)
-limiter = Limiter(key_func=get_remote_address)
 CORS(auth_bp, resources=settings.CORS_resource_allow_all, supports_credentials=True)
 
 
@@ -63,6 +61,7 @@ def register():
 
 
 @auth_bp.route("/login", methods=["POST"])
+@limiter.limit(rate_limits.login)
 def login():
     try:
         payload = LoginRequest.parse_obj(request.get_json())
@@ -110,6 +109,7 @@ def login():
 
 
 @auth_bp.route("/admin", methods=["POST"])
+@limiter.limit(rate_limits.login)
 def admin_login():
     start_time = datetime.now(timezone.utc)
     try:
@@ -1,36 +1,19 @@
+from datetime import datetime
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from pydantic import BaseModel, Field, ValidationError
+from pydantic import ValidationError
 from psycopg2 import sql
 from psycopg2.extras import RealDictCursor
 from database.postgres import get_connection
 from database.user_queries import get_user_id_by_email, get_user_role_by_email
+from database.job_index import query_jobs, sync_job
+from database.job_import import JobImportError, detect_format, import_jobs
 from util.activity_logger import log_activity
-from Blueprints.notifications import send_notification
+from util.models import JobCreateRequest, JobListFilters, JobUpdateRequest
+from database.notification_queries import enqueue_notification, enqueue_team_notification
 
 jobs_bp = Blueprint("jobs", __name__)
 
-class JobCreateRequest(BaseModel):
-    title: str = Field(..., min_length=2)
-    description: str | None = None
-    priority: str = Field("Medium", regex="^(Critical|High|Medium|Low)$")
-    location: str | None = None
-    latitude: float | None = Field(None, ge=-90, le=90)
-    longitude: float | None = Field(None, ge=-180, le=180)
-    team_id: int | None = None
-    assignee_id: int | None = None
-
-class JobUpdateRequest(BaseModel):
-    title: str | None = None
-    description: str | None = None
-    priority: str | None = Field(None, regex="^(Critical|High|Medium|Low)$")
-    location: str | None = None
-    latitude: float | None = Field(None, ge=-90, le=90)
-    longitude: float | None = Field(None, ge=-180, le=180)
-    status: str | None = Field(None, regex="^(open|in_progress|completed|closed)$")
-    team_id: int | None = None
-    assignee_id: int | None = None
-
 # --- Create a Job ---
 @jobs_bp.route("/", methods=["POST"])
 @jwt_required()
@@ -52,7 +35,7 @@ def create_job():
                 ) VALUES (
                   %s, %s, %s, %s, %s, %s, %s, %s, %s, 'open'
                 )
-                RETURNING id, title, status, created_at
+                RETURNING *
                 """,
                 (
                     payload.title,
@@ -66,12 +49,50 @@ def create_job():
                     payload.assignee_id,
                 )
             )
-            job = cur.fetchone()
+            row = cur.fetchone()
             conn.commit()
 
+    sync_job(row)
+    job = {k: row[k] for k in ("id", "title", "status", "created_at")}
     log_activity("Job created", "job", user_id=reporter_id, details=job)
     return jsonify(job), 201
 
+# --- Bulk Import Jobs (CSV / JSON lines) ---
+@jobs_bp.route("/import", methods=["POST"])
+@jwt_required()
+def import_jobs_file():
+    """
+    Upload as multipart field `file` or as the raw body.
+    Query: format=csv|jsonl (default: file extension or Content-Type),
+    dry_run=true to validate only, strict=true to import nothing if any
+    row is invalid. Columns as in POST /jobs/; `row` in the error report
+    is the line in the file.
+    """
+    upload = request.files.get("file")
+    data = upload.read() if upload else request.get_data()
+    if not data:
+        return jsonify({"error": "Empty upload"}), 400
+    fmt = request.args.get("format") or detect_format(
+        upload.filename if upload else None,
+        upload.content_type if upload else request.content_type,
+    )
+    dry_run = request.args.get("dry_run", "false").lower() == "true"
+    strict = request.args.get("strict", "false").lower() == "true"
+
+    reporter_id = get_user_id_by_email(get_jwt_identity())
+    try:
+        report = import_jobs(data, fmt, reporter_id, dry_run=dry_run, strict=strict)
+    except JobImportError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if report["created"]:
+        # One activity row per import rather than per job
+        log_activity("Jobs imported", "job", user_id=reporter_id,
+                     details={k: report[k] for k in ("rows", "created")})
+    if strict and report["errors"]:
+        return jsonify(report), 422
+    return jsonify(report), 201 if report["created"] else 200
+
 # --- Update a Job ---
 @jobs_bp.route("/<int:job_id>", methods=["PATCH"])
 @jwt_required()
@@ -97,15 +118,17 @@ def update_job(job_id):
         UPDATE jobs
         SET {set_clause}, updated_at = NOW()
         WHERE id = %s
-        RETURNING id, title, status, updated_at
+        RETURNING *
         """
     ).format(set_clause=set_clause)
 
+    identity = get_jwt_identity()
+    user_id = get_user_id_by_email(identity)
     with get_connection() as conn:
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
             cur.execute(query, params)
-            job = cur.fetchone()
-            if not job:
+            row = cur.fetchone()
+            if not row:
                 return jsonify({"error": "Job not found"}), 404
 
             if "status" in updatable:
@@ -119,12 +142,24 @@ def update_job(job_id):
                         job_id,
                         request.json.get("old_status"),
                         updatable["status"],
-                        get_jwt_identity(),
+                        identity,
                     )
                 )
+            # Delivered by util/notification_dispatcher.py once this commits
+            enqueue_notification(
+                cur, user_id, job_id,
+                f"Your Intanded job is Updated by {get_user_role_by_email(identity)[0].upper()}!",
+                kind="job_updated",
+            )
+            if row["team_id"] is not None:
+                enqueue_team_notification(
+                    cur, row["team_id"], job_id, f"Job #{job_id} ({row['title']}) was updated",
+                    exclude_user_id=user_id, kind="job_updated",
+                )
             conn.commit()
-    send_notification(get_user_id_by_email(get_jwt_identity()), job_id, f"Your Intanded job is Updated by {get_user_role_by_email(get_jwt_identity())[0].upper()}!")
-    log_activity("Job updated", "job", user_id=get_user_id_by_email(get_jwt_identity()), details=job)
+    sync_job(row)
+    job = {k: row[k] for k in ("id", "title", "status", "updated_at")}
+    log_activity("Job updated", "job", user_id=user_id, details=job)
     return jsonify(job)
 
 # --- List/Filter/Search Jobs ---
@@ -132,13 +167,13 @@ def update_job(job_id):
 @jwt_required()
 def list_jobs():
     # Filters
-    filters = [
-        ("status", request.args.get("status")),
-        ("priority", request.args.get("priority")),
-        ("team_id", request.args.get("team_id")),
-        ("assignee_id", request.args.get("assignee_id")),
-        ("reporter_id", request.args.get("reporter_id")),
-    ]
+    try:
+        filters = JobListFilters.parse_obj(
+            {k: request.args.get(k) for k in JobListFilters.__fields__}
+        ).dict()
+    except ValidationError as e:
+        return jsonify({"error": e.errors()}), 400
+    filters = list(filters.items())
     conditions = []
     params = []
 
@@ -149,7 +184,17 @@ def list_jobs():
             )
             params.append(val)
 
+    page      = int(request.args.get("page", 1))
+    page_size = int(request.args.get("page_size", 20))
+    offset    = (page - 1) * page_size
+
     search = request.args.get("search")
+    if not search:
+        # Plain filters can be answered from the Redis indexes
+        jobs = query_jobs(dict(filters), page_size, offset)
+        if jobs is not None:
+            return jsonify(jobs)
+
     if search:
         conditions.append(
             sql.SQL("(title ILIKE %s OR description ILIKE %s)")
@@ -161,9 +206,6 @@ def list_jobs():
         if conditions else sql.SQL("")
     )
 
-    page      = int(request.args.get("page", 1))
-    page_size = int(request.args.get("page_size", 20))
-    offset    = (page - 1) * page_size
     params.extend([page_size, offset])
 
     query = sql.SQL(
@@ -183,24 +225,90 @@ def list_jobs():
 
     return jsonify(jobs)
 
+# Relations get_job can embed with ?include=, as (response key, subquery).
+# Each is a correlated json_agg, so the job and all of them come back in
+# one statement instead of one request per screen section.
+JOB_INCLUDES = {
+    "history": ("status_history", """
+        SELECT COALESCE(json_agg(h ORDER BY h.changed_at), '[]'::json)
+        FROM job_status_history h
+        WHERE h.job_id = j.id
+    """),
+    "files": ("files", """
+        SELECT COALESCE(json_agg(f ORDER BY f.id), '[]'::json)
+        FROM job_files f
+        WHERE f.job_id = j.id
+    """),
+    # Newest points first, as GET /geo/?job_id= returns them
+    "locations": ("locations", """
+        SELECT COALESCE(json_agg(l ORDER BY l.timestamp DESC), '[]'::json)
+        FROM (
+            SELECT id, job_id, user_id, latitude, longitude, timestamp
+            FROM locations
+            WHERE job_id = j.id
+            ORDER BY timestamp DESC
+            LIMIT %(locations_limit)s
+        ) l
+    """),
+    # Only the caller's own notifications about the job
+    "notifications": ("notifications", """
+        SELECT COALESCE(json_agg(n ORDER BY n.updated_at DESC), '[]'::json)
+        FROM (
+            SELECT * FROM notifications
+            WHERE job_id = j.id AND user_id = %(user_id)s
+            ORDER BY updated_at DESC
+            LIMIT 50
+        ) n
+    """),
+}
+
+def _parse_times(rows):
+    # json_agg renders timestamps as ISO strings; turn them back into
+    # datetimes so embedded rows serialize like the plain queries' rows
+    for row in rows:
+        for k, v in row.items():
+            if isinstance(v, str) and (k.endswith("_at") or k == "timestamp"):
+                try:
+                    row[k] = datetime.fromisoformat(v)
+                except ValueError:
+                    pass
+    return rows
+
 # --- Get Single Job Details ---
 @jobs_bp.route("/<int:job_id>", methods=["GET"])
 @jwt_required()
 def get_job(job_id):
+    """
+    Query: include=history,files,locations,notifications (default: history;
+    include= for the job alone), locations_limit=100 (max 1000).
+    """
+    names = [n.strip() for n in request.args.get("include", "history").split(",") if n.strip()]
+    unknown = [n for n in names if n not in JOB_INCLUDES]
+    if unknown:
+        return jsonify({"error": f"Unknown include: {', '.join(unknown)}",
+                        "allowed": list(JOB_INCLUDES)}), 400
+    try:
+        locations_limit = min(max(int(request.args.get("locations_limit", 100)), 1), 1000)
+    except ValueError:
+        return jsonify({"error": "Invalid locations_limit"}), 400
+
+    params = {"job_id": job_id, "locations_limit": locations_limit, "user_id": None}
+    if "notifications" in names:
+        params["user_id"] = get_user_id_by_email(get_jwt_identity())
+    columns = [sql.SQL("j.*")] + [
+        sql.SQL("({}) AS {}").format(sql.SQL(JOB_INCLUDES[n][1]), sql.Identifier(JOB_INCLUDES[n][0]))
+        for n in dict.fromkeys(names)
+    ]
+    query = sql.SQL("SELECT {} FROM jobs j WHERE j.id = %(job_id)s").format(sql.SQL(", ").join(columns))
+
     with get_connection() as conn:
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute(
-                "SELECT * FROM jobs WHERE id = %s", (job_id,)
-            )
+            cur.execute(query, params)
             job = cur.fetchone()
-            if not job:
-                return jsonify({"error": "Job not found"}), 404
-
-            cur.execute(
-                "SELECT * FROM job_status_history WHERE job_id = %s ORDER BY changed_at", (job_id,)
-            )
-            job["status_history"] = cur.fetchall()
-
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    for n in names:
+        _parse_times(job[JOB_INCLUDES[n][0]])
     return jsonify(job)
 
 # --- Close Job ---
@@ -212,14 +320,14 @@ def close_job(job_id):
             cur.execute(
                 """
                 UPDATE jobs
-                SET status = 'completed', completed_at = NOW()
+                SET status = 'completed', completed_at = NOW(), updated_at = NOW()
                 WHERE id = %s AND status != 'completed'
-                RETURNING id, status, completed_at
+                RETURNING *
                 """,
                 (job_id,)
             )
-            job = cur.fetchone()
-            if not job:
+            row = cur.fetchone()
+            if not row:
                 return jsonify({"error": "Job not found or already completed"}), 404
 
             cur.execute(
@@ -232,5 +340,7 @@ def close_job(job_id):
             )
             conn.commit()
 
+    sync_job(row)
+    job = {k: row[k] for k in ("id", "status", "completed_at")}
     log_activity("Job closed", "job", user_id=get_user_id_by_email(get_jwt_identity()), details=job)
     return jsonify(job)
@@ -3,12 +3,18 @@ from flask_jwt_extended import verify_jwt_in_request_optional, get_jwt_identity
 from datetime import datetime, timezone
 from pydantic import ValidationError
 from database.location_ops import insert_location
+from database.latest_positions import record_positions
+from database.user_queries import get_user_id
+from util.geofence import evaluate_points
 from util.models import LocationPayload
 from helper.error import logger
+from util.limiter import limiter, rate_limits, get_identity_or_address
+from util.ingest_queue import IngestQueueFull, firestore_queue, ingest_settings
 
 location_bp = Blueprint("location", __name__)
 
 @location_bp.route("/location", methods=["POST"])
+@limiter.limit(rate_limits.location_ingest, key_func=get_identity_or_address)
 def save_location():
     """
     Receives job_id, latitude & longitude, saves with timestamp and user_id (optional).
@@ -27,21 +33,43 @@ def save_location():
     # Try to get user_id if JWT present; else, set as None
     try:
         verify_jwt_in_request_optional()
-        user_id = get_jwt_identity()
+        identity = get_jwt_identity()
     except Exception:
-        user_id = None
+        identity = None
+    # The JWT identity is the email; positions and geofences key on the id
+    user_id = get_user_id(identity) if identity else None
 
     timestamp = datetime.now(timezone.utc)
 
+    if ingest_settings.write_behind:
+        point = {
+            "job_id": payload.job_id,
+            "latitude": payload.latitude,
+            "longitude": payload.longitude,
+            "user_id": user_id,
+            "timestamp": timestamp,
+        }
+        try:
+            queued = firestore_queue.submit(point)
+        except IngestQueueFull as e:
+            return jsonify({"error": str(e)}), 503
+        return jsonify({
+            "message": "Location queued" if queued else "Location unchanged",
+            **point,
+            "timestamp": timestamp.isoformat()
+        }), 202
+
     # Save to DB
     try:
-        insert_location(
+        doc = insert_location(
             job_id=payload.job_id,
             latitude=payload.latitude,
             longitude=payload.longitude,
             user_id=user_id,
             timestamp=timestamp
         )
+        record_positions([doc])
+        evaluate_points([doc])
         print(f"Job {payload.job_id}, User {user_id}: ({payload.latitude}, {payload.longitude}) at {timestamp}")
     except Exception as e:
         logger.error(e)
@@ -1,8 +1,21 @@
-from flask import Blueprint, request, jsonify
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+from flask import Blueprint, Response, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from database.postgres import get_connection
+from database.location_queries import (
+    insert_locations, find_jobs_nearby, get_latest_user_location, get_track, reference_error,
+)
+from database.latest_positions import get_latest, record_positions
 from database.user_queries import get_user_id_by_email
 from util.activity_logger import log_activity
+from util.ingest_queue import IngestQueueFull, ingest_settings, ingest_stats, postgres_queue
+from util.limiter import limiter, rate_limits, get_identity_or_address
+from util.geo import simplify_track
+from util.polyline import encode_polyline
+from util.position_stream import StreamFull, broadcaster
+from util.sse import sse_events
+from util.track_codec import TRACK_BINARY_MIME, TRACK_JSON_MIME, encode_track_binary, encode_track_columns
 from pydantic import BaseModel, ValidationError, Field
 from psycopg2.extras import RealDictCursor
 
@@ -14,6 +27,18 @@ class LocationCreateRequest(BaseModel):
     longitude: float = Field(..., ge=-180, le=180)
     user_id: int | None = None
 
+class LocationBatchPoint(BaseModel):
+    job_id: int
+    latitude: float = Field(..., ge=-90, le=90)
+    longitude: float = Field(..., ge=-180, le=180)
+    user_id: int | None = None
+    timestamp: datetime | None = None
+
+class LocationBatchRequest(BaseModel):
+    # Points are validated one by one so a bad point does not reject the batch
+    points: List[Dict[str, Any]] = Field(..., min_items=1, max_items=5000)
+    user_id: int | None = None
+
 class LocationUpdateRequest(BaseModel):
     latitude: float | None = Field(None, ge=-90, le=90)
     longitude: float | None = Field(None, ge=-180, le=180)
@@ -21,38 +46,81 @@ class LocationUpdateRequest(BaseModel):
 # --- Endpoint: Create Location ---
 @locations_bp.route("/", methods=["POST"])
 @jwt_required()
+@limiter.limit(rate_limits.location_ingest, key_func=get_identity_or_address)
 def create_location():
     try:
         payload = LocationCreateRequest.parse_obj(request.get_json())
     except ValidationError as e:
         return jsonify({"error": e.errors()}), 400
 
-    with get_connection() as conn:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            # Validate job_id exists
-            cur.execute("SELECT id FROM jobs WHERE id = %s", (payload.job_id,))
-            if not cur.fetchone():
-                return jsonify({"error": "Invalid job_id"}), 404
+    if ingest_settings.write_behind:
+        # Same 404 as a direct write; the flush thread cannot report it
+        error = reference_error(payload.job_id, payload.user_id)
+        if error:
+            return jsonify({"error": error}), 404
+        # Stored by the ingest queue's flush thread; see util/ingest_queue.py
+        point = {**payload.dict(), "timestamp": datetime.now(timezone.utc)}
+        try:
+            queued = postgres_queue.submit(point)
+        except IngestQueueFull as e:
+            return jsonify({"error": str(e)}), 503
+        return jsonify({"status": "queued" if queued else "deduplicated", **point}), 202
 
-            # Validate user_id if provided
-            if payload.user_id is not None:
-                cur.execute("SELECT id FROM users WHERE id = %s", (payload.user_id,))
-                if not cur.fetchone():
-                    return jsonify({"error": "Invalid user_id"}), 404
-
-            cur.execute(
-                """INSERT INTO locations (job_id, user_id, latitude, longitude, timestamp)
-                   VALUES (%s, %s, %s, %s, NOW())
-                   RETURNING id, job_id, user_id, latitude, longitude, timestamp
-                """,
-                (payload.job_id, payload.user_id, payload.latitude, payload.longitude)
-            )
-            location = cur.fetchone()
-            conn.commit()
+    result = insert_locations([payload.dict()])[0]
+    if "error" in result:
+        return jsonify({"error": result["error"]}), 404
+    location = result["location"]
 
     log_activity("Location created", "location", user_id=get_user_id_by_email(get_jwt_identity()), details=location)
     return jsonify(location), 201
 
+# --- Endpoint: Batch Create Locations ---
+@locations_bp.route("/batch", methods=["POST"])
+@jwt_required()
+@limiter.limit(rate_limits.location_ingest, key_func=get_identity_or_address)
+def create_locations_batch():
+    """
+    Ingests buffered tracks for any number of jobs in one request.
+    Example payload:
+    {
+        "user_id": 7,
+        "points": [
+            {"job_id": 12, "latitude": 36.8, "longitude": 36.2, "timestamp": "2025-05-01T08:00:00Z"},
+            {"job_id": 13, "latitude": 36.9, "longitude": 36.1}
+        ]
+    }
+    Returns one result per point; 207 when only some points were stored.
+    """
+    try:
+        payload = LocationBatchRequest.parse_obj(request.get_json())
+    except ValidationError as e:
+        return jsonify({"error": e.errors()}), 400
+
+    results = [{"index": i} for i in range(len(payload.points))]
+    valid, positions = [], []
+    for i, raw in enumerate(payload.points):
+        try:
+            point = LocationBatchPoint.parse_obj(raw)
+        except ValidationError as e:
+            results[i]["error"] = e.errors()
+            continue
+        if point.user_id is None:
+            point.user_id = payload.user_id
+        valid.append(point.dict())
+        positions.append(i)
+
+    for i, result in zip(positions, insert_locations(valid)):
+        result["index"] = i
+        results[i] = result
+
+    created = sum(1 for r in results if "location" in r)
+    rejected = len(results) - created
+    log_activity("Locations batch created", "location", user_id=get_user_id_by_email(get_jwt_identity()),
+                 details={"created": created, "rejected": rejected})
+
+    status = 201 if not rejected else (207 if created else 422)
+    return jsonify({"created": created, "rejected": rejected, "results": results}), status
+
 # --- Endpoint: Update Location ---
 @locations_bp.route("/<int:location_id>", methods=["PATCH"])
 @jwt_required()
@@ -80,6 +148,7 @@ def update_location(location_id):
                 return jsonify({"error": "Location not found"}), 404
             conn.commit()
 
+    record_positions([location])
     log_activity("Location updated", "location", user_id=get_user_id_by_email(get_jwt_identity()), details=location)
     return jsonify(location)
 
@@ -91,6 +160,9 @@ def get_locations():
     user_id = request.args.get("user_id")
     start = request.args.get("start")
     end = request.args.get("end")
+    if request.args.get("simplify", "").lower() in ("1", "true", "yes"):
+        return get_simplified_track(job_id, user_id, start, end)
+
     page = int(request.args.get("page", 1))
     page_size = int(request.args.get("page_size", 20))
     offset = (page - 1) * page_size
@@ -124,7 +196,152 @@ def get_locations():
             )
             results = cur.fetchall()
 
-    return jsonify(results)
+    return track_response(results)
+
+# Explicit ?format= for clients that cannot set Accept
+_TRACK_FORMATS = {"json": "application/json", "columnar": TRACK_JSON_MIME, "binary": TRACK_BINARY_MIME}
+
+def track_response(rows):
+    """
+    Location rows as plain JSON, or in a compact columnar format when the
+    client asks for it (Accept header or ?format=): see util/track_codec.py.
+    """
+    mimetype = _TRACK_FORMATS.get(request.args.get("format", "")) or request.accept_mimetypes.best_match(
+        ["application/json", TRACK_JSON_MIME, TRACK_BINARY_MIME], default="application/json"
+    )
+    if mimetype == TRACK_BINARY_MIME:
+        response = Response(encode_track_binary(rows), mimetype=TRACK_BINARY_MIME)
+    elif mimetype == TRACK_JSON_MIME:
+        response = jsonify(encode_track_columns(rows))
+        response.mimetype = TRACK_JSON_MIME
+    else:
+        response = jsonify(rows)
+    response.vary.add("Accept")
+    return response
+
+def get_simplified_track(job_id, user_id, start, end):
+    """
+    simplify=1 mode of GET /geo/: the whole track as one encoded polyline,
+    simplified with Douglas–Peucker at `tolerance` meters (default 5).
+    """
+    if not job_id and not user_id:
+        return jsonify({"error": "simplify requires job_id or user_id"}), 400
+    try:
+        tolerance = float(request.args.get("tolerance", 5))
+    except ValueError:
+        return jsonify({"error": "Invalid tolerance"}), 400
+
+    lat, lon, ts = get_track(job_id, user_id, start, end)
+    keep = simplify_track(lat, lon, tolerance)
+    return jsonify({
+        "job_id": job_id,
+        "user_id": user_id,
+        "tolerance_m": tolerance,
+        "points_in": int(len(lat)),
+        "points_out": int(len(keep)),
+        "start": float(ts[0]) if len(ts) else None,
+        "end": float(ts[-1]) if len(ts) else None,
+        "polyline": encode_polyline(lat[keep], lon[keep]),
+    })
+
+# --- Endpoint: Jobs Near a Point or Crew Member ---
+@locations_bp.route("/nearby", methods=["GET"])
+@jwt_required()
+def get_nearby_jobs():
+    """
+    Open jobs within radius_m of lat/lon, or of a crew member's latest position.
+    Query: lat & lon | user_id, radius_m (default 2000, max 50000),
+           status (comma list, default open,in_progress), limit (default 50, max 200)
+    """
+    try:
+        radius_m = float(request.args.get("radius_m", 2000))
+        limit = int(request.args.get("limit", 50))
+        user_id = request.args.get("user_id", type=int)
+        lat = request.args.get("lat", type=float)
+        lon = request.args.get("lon", type=float)
+    except ValueError:
+        return jsonify({"error": "Invalid query parameters"}), 400
+    if not 0 < radius_m <= 50000:
+        return jsonify({"error": "radius_m must be between 0 and 50000"}), 400
+    if not 0 < limit <= 200:
+        return jsonify({"error": "limit must be between 1 and 200"}), 400
+
+    origin = None
+    if lat is None or lon is None:
+        if user_id is None:
+            return jsonify({"error": "Provide lat and lon, or user_id"}), 400
+        origin = get_latest_user_location(user_id)
+        if not origin:
+            return jsonify({"error": "No known location for user_id"}), 404
+        lat, lon = float(origin["latitude"]), float(origin["longitude"])
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return jsonify({"error": "Invalid coordinates"}), 400
+
+    statuses = [s for s in request.args.get("status", "open,in_progress").split(",") if s]
+    jobs = find_jobs_nearby(lat, lon, radius_m, statuses=statuses, limit=limit)
+    return jsonify({
+        "origin": {"latitude": lat, "longitude": lon, "location": origin},
+        "radius_m": radius_m,
+        "jobs": jobs,
+    })
+
+# --- Endpoint: Latest Positions ---
+@locations_bp.route("/latest", methods=["GET"])
+@jwt_required()
+def get_latest_positions():
+    """
+    Current position of many users or jobs in one read.
+    Query: by=user|job (default user), ids=1,2,3 (optional),
+           max_age_s (optional, only those seen recently)
+    """
+    by = request.args.get("by", "user")
+    if by not in ("user", "job"):
+        return jsonify({"error": "by must be 'user' or 'job'"}), 400
+    try:
+        ids = request.args.get("ids")
+        ids = [int(i) for i in ids.split(",") if i] if ids else None
+        max_age_s = request.args.get("max_age_s", type=float)
+    except ValueError:
+        return jsonify({"error": "Invalid query parameters"}), 400
+
+    positions = get_latest(by, ids=ids, max_age_s=max_age_s)
+    return jsonify({"by": by, "count": len(positions), "positions": positions})
+
+# --- Endpoint: Live Positions Stream (SSE) ---
+@locations_bp.route("/stream", methods=["GET"])
+@jwt_required()
+def stream_positions():
+    """
+    Server-sent events with every new location point, instead of polling.
+    Query: job_id=1,2 and/or team_id=3,4 to filter (default: all points).
+    Events: `position` (a location row, plus team_id when filtering by team),
+    `dropped` (points skipped because the client fell behind).
+    """
+    try:
+        job_ids = {int(i) for i in request.args.get("job_id", "").split(",") if i} or None
+        team_ids = {int(i) for i in request.args.get("team_id", "").split(",") if i} or None
+    except ValueError:
+        return jsonify({"error": "Invalid job_id or team_id"}), 400
+    try:
+        subscriber = broadcaster.subscribe(job_ids, team_ids)
+    except StreamFull as e:
+        return jsonify({"error": str(e)}), 503
+
+    return Response(
+        sse_events(subscriber, "position", broadcaster.unsubscribe),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# --- Endpoint: Ingest Queue Stats ---
+@locations_bp.route("/ingest/stats", methods=["GET"])
+@jwt_required()
+def get_ingest_stats():
+    """
+    Counters of the write-behind queues: points accepted, deduplicated,
+    written, rejected by validation, failed, and currently queued.
+    """
+    return jsonify({"write_behind": ingest_settings.write_behind, "queues": ingest_stats()})
 
 # --- Endpoint: Get Single Location ---
 @locations_bp.route("/<int:location_id>", methods=["GET"])
@@ -1,19 +1,73 @@
-from flask import Blueprint, request, jsonify
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from typing import List
+from flask import Blueprint, Response, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from pydantic import BaseModel, Field, StrictBool, ValidationError, constr, root_validator, validator
 from psycopg2.extras import RealDictCursor
 from database.postgres import get_connection
-from database.user_queries import get_user_id_by_email
+from database.user_queries import get_user_id
+from database.notification_queries import notify_team, upsert_notifications
+from database.unread_counters import adjust_unread, count_new, get_unread
 from util.activity_logger import log_activity
+from util.authlib import has_scope
+from util.email_delivery import email_new_notifications
+from util.notification_stream import notification_hub, wait_for_notifications
+from util.sse import StreamFull, sse_events
 
 notifications_bp = Blueprint("notifications", __name__)
 
+class InboxCursor(BaseModel):
+    # The newest row the client has seen, as GET /notify/ returned it
+    updated_at: datetime
+    id: int
+
+    @validator("updated_at", pre=True)
+    def http_date(cls, v):
+        # jsonify renders datetimes as HTTP dates; accept those besides ISO 8601
+        if isinstance(v, str) and not v[:4].isdigit():
+            try:
+                return parsedate_to_datetime(v)
+            except (TypeError, ValueError):
+                pass
+        return v
+
+class BulkSelection(BaseModel):
+    # Either explicit ids, or everything up to the newest notification the
+    # client has seen in the inbox order (updated_at, id), never both.
+    # Not plain ids: coalescing moves an older row to the top of the inbox.
+    ids: List[int] | None = Field(None, min_items=1, max_items=5000)
+    up_to: InboxCursor | None = None
+
+    @root_validator
+    def one_selector(cls, values):
+        if (values.get("ids") is None) == (values.get("up_to") is None):
+            raise ValueError("Provide either ids or up_to")
+        return values
+
+class TeamNotificationRequest(BaseModel):
+    job_id: int | None = None
+    message: constr(strip_whitespace=True, min_length=1)  # type: ignore
+    # A real boolean: the string "false" must not count as true
+    dedup: StrictBool = True
+    kind: constr(strip_whitespace=True, min_length=1, max_length=64) = "general"  # type: ignore
+
+def _selection_sql(selection: BulkSelection):
+    if selection.ids is not None:
+        return "id = ANY(%s)", (selection.ids,)
+    # Whole seconds, the precision the inbox shows timestamps with
+    return (
+        "(date_trunc('second', updated_at), id) <= (date_trunc('second', %s::timestamptz), %s)",
+        (selection.up_to.updated_at, selection.up_to.id),
+    )
+
 # Subscribe/Unsubscribe can be implemented if you have user preferences in another table
 
 # ----- Get User Notifications (Paginated Inbox) -----
 @notifications_bp.route("/", methods=["GET"])
 @jwt_required()
 def get_user_notifications():
-    user_id = get_user_id_by_email(get_jwt_identity())
+    user_id = get_user_id(get_jwt_identity())
     page = int(request.args.get("page", 1))
     page_size = int(request.args.get("page_size", 20))
     offset = (page - 1) * page_size
@@ -23,54 +77,217 @@ def get_user_notifications():
             cur.execute("""
                 SELECT * FROM notifications
                 WHERE user_id=%s
-                ORDER BY created_at DESC
+                ORDER BY updated_at DESC, id DESC
                 LIMIT %s OFFSET %s
             """, (user_id, page_size, offset))
             notifications = cur.fetchall()
     return jsonify(notifications), 200
 
+# ----- Unread Count (app badge) -----
+@notifications_bp.route("/unread_count", methods=["GET"])
+@jwt_required()
+def get_unread_count():
+    user_id = get_user_id(get_jwt_identity())
+    if user_id is None:
+        return jsonify({"error": "User not found"}), 404
+    return jsonify({"user_id": user_id, "unread": get_unread(user_id)}), 200
+
+# ----- Live Notifications (SSE) -----
+@notifications_bp.route("/stream", methods=["GET"])
+@jwt_required()
+def stream_notifications():
+    """
+    Server-sent events with the caller's new notifications as they are
+    inserted, instead of polling GET /notify/.
+    Events: `notification` (a notifications row), `dropped`.
+    """
+    user_id = get_user_id(get_jwt_identity())
+    if user_id is None:
+        return jsonify({"error": "User not found"}), 404
+    try:
+        subscriber = notification_hub.subscribe(user_id)
+    except StreamFull as e:
+        return jsonify({"error": str(e)}), 503
+    return Response(
+        sse_events(subscriber, "notification", notification_hub.unsubscribe),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# ----- Long Poll for New Notifications -----
+@notifications_bp.route("/poll", methods=["GET"])
+@jwt_required()
+def poll_notifications():
+    """
+    Query: after=<newest notification id the client has>, timeout=25 (max 55)
+    Returns at once when newer notifications exist, otherwise holds the
+    request until one arrives or the timeout passes (then []).
+    """
+    try:
+        after_id = int(request.args.get("after", 0))
+        timeout = min(max(float(request.args.get("timeout", 25)), 0), 55)
+    except ValueError:
+        return jsonify({"error": "Invalid after or timeout"}), 400
+    user_id = get_user_id(get_jwt_identity())
+    if user_id is None:
+        return jsonify({"error": "User not found"}), 404
+    try:
+        rows = wait_for_notifications(user_id, after_id, timeout)
+    except StreamFull as e:
+        return jsonify({"error": str(e)}), 503
+    return jsonify(rows), 200
+
 # ----- Mark Notification as Read -----
 @notifications_bp.route("/<int:notification_id>/read", methods=["PATCH"])
 @jwt_required()
 def mark_notification_read(notification_id):
-    user_id = get_user_id_by_email(get_jwt_identity())
+    user_id = get_user_id(get_jwt_identity())
     with get_connection() as conn:
         with conn.cursor() as cur:
             cur.execute("""
                 UPDATE notifications SET status='read'
-                WHERE id=%s AND user_id=%s
+                WHERE id=%s AND user_id=%s AND status='unread'
+                RETURNING id
             """, (notification_id, user_id))
+            changed = cur.fetchone()
             conn.commit()
+    if changed:
+        adjust_unread({user_id: -1})
     return jsonify({"message": "Notification marked as read"}), 200
 
+# ----- Bulk Mark as Read -----
+@notifications_bp.route("/bulk_read", methods=["PATCH"])
+@jwt_required()
+def bulk_mark_read():
+    """
+    Example payloads: {"ids": [4, 8, 15]} or
+    {"up_to": {"updated_at": "Mon, 19 Oct 2026 08:00:00 GMT", "id": 1234}}
+    Marks the caller's unread notifications in one statement.
+    """
+    try:
+        selection = BulkSelection.parse_obj(request.get_json() or {})
+    except ValidationError as e:
+        return jsonify({"error": e.errors()}), 400
+
+    user_id = get_user_id(get_jwt_identity())
+    condition, params = _selection_sql(selection)
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"""
+                UPDATE notifications SET status='read'
+                WHERE user_id=%s AND status='unread' AND {condition}
+            """, (user_id, *params))
+            updated = cur.rowcount
+            conn.commit()
+    adjust_unread({user_id: -updated})
+    return jsonify({"updated": updated}), 200
+
+# ----- Bulk Delete -----
+@notifications_bp.route("/bulk_delete", methods=["POST"])
+@jwt_required()
+def bulk_delete():
+    """
+    Example payloads: {"ids": [4, 8, 15]} or
+    {"up_to": {"updated_at": "Mon, 19 Oct 2026 08:00:00 GMT", "id": 1234}}
+    Deletes the caller's selected notifications in one statement.
+    """
+    try:
+        selection = BulkSelection.parse_obj(request.get_json() or {})
+    except ValidationError as e:
+        return jsonify({"error": e.errors()}), 400
+
+    user_id = get_user_id(get_jwt_identity())
+    condition, params = _selection_sql(selection)
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"""
+                WITH deleted AS (
+                    DELETE FROM notifications
+                    WHERE user_id=%s AND {condition}
+                    RETURNING status
+                )
+                SELECT COUNT(*), COUNT(*) FILTER (WHERE status='unread') FROM deleted
+            """, (user_id, *params))
+            deleted, unread = cur.fetchone()
+            conn.commit()
+    adjust_unread({user_id: -unread})
+    return jsonify({"deleted": deleted, "unread_deleted": unread}), 200
+
 # ----- Utility: Notification Trigger -----
-def send_notification(user_id, job_id, message, status="unread"):
+def send_notification(user_id, job_id, message, status="unread", kind="general"):
     """
     Call this from other modules when you need to notify a user.
     - user_id: int, receiver
     - job_id: int or None
     - message: text, notification content
     - status: 'unread', 'read', etc.
+    - kind: e.g. 'job_updated'; unread ones for the same job and kind
+      within NOTIFY_COALESCE_WINDOW_SECONDS merge into one row
     """
     with get_connection() as conn:
         with conn.cursor() as cur:
-            cur.execute("""
-                INSERT INTO notifications (user_id, job_id, message, status, created_at)
-                VALUES (%s, %s, %s, %s, NOW())
-            """, (user_id, job_id, message, status))
+            if status == "unread":
+                inserted = upsert_notifications(cur, [
+                    {"user_id": user_id, "job_id": job_id, "kind": kind, "message": message}
+                ])
+            else:
+                cur.execute("""
+                    INSERT INTO notifications (user_id, job_id, kind, message, status, created_at)
+                    VALUES (%s, %s, %s, %s, %s, NOW())
+                """, (user_id, job_id, kind, message, status))
+                inserted = []
             conn.commit()
+    count_new(inserted)
+    email_new_notifications(inserted)
     log_activity("Notification sent", "notification", user_id=user_id,
                  details={"job_id": job_id, "message": message})
 
+# ----- Notify Every Member of a Team -----
+@notifications_bp.route("/team/<int:team_id>", methods=["POST"])
+@jwt_required()
+def send_team_notification(team_id):
+    """
+    Example payload: {"job_id": 12, "message": "Site access moved to the north gate", "dedup": true, "kind": "site_access"}
+    With dedup (default), members who still have an unread notification
+    for the job are not notified again. Only members of the team and
+    admins may notify it.
+    """
+    try:
+        payload = TeamNotificationRequest.parse_obj(request.get_json() or {})
+    except ValidationError as e:
+        return jsonify({"error": e.errors()}), 400
+    sender_id = get_user_id(get_jwt_identity())
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            if not has_scope("admin"):
+                cur.execute(
+                    "SELECT 1 FROM team_members WHERE team_id=%s AND user_id=%s",
+                    (team_id, sender_id),
+                )
+                if cur.fetchone() is None:
+                    return jsonify({"error": "Only team members or admins can notify this team"}), 403
+            notified = notify_team(cur, team_id, payload.job_id, payload.message,
+                                   exclude_user_id=sender_id, dedup=payload.dedup, kind=payload.kind)
+            conn.commit()
+    count_new(notified)
+    email_new_notifications(notified)
+    log_activity("Team notified", "notification", user_id=sender_id,
+                 details={"team_id": team_id, "job_id": payload.job_id, "notified": len(notified)})
+    return jsonify({"team_id": team_id, "notified": len(notified), "user_ids": notified}), 201
+
 # ----- (Optional) Delete Notification -----
 @notifications_bp.route("/<int:notification_id>", methods=["DELETE"])
 @jwt_required()
 def delete_notification(notification_id):
-    user_id = get_user_id_by_email(get_jwt_identity())
+    user_id = get_user_id(get_jwt_identity())
     with get_connection() as conn:
         with conn.cursor() as cur:
             cur.execute("""
                 DELETE FROM notifications WHERE id=%s AND user_id=%s
+                RETURNING status
             """, (notification_id, user_id))
+            deleted = cur.fetchone()
             conn.commit()
+    if deleted and deleted[0] == "unread":
+        adjust_unread({user_id: -1})
     return jsonify({"message": "Notification deleted"}), 200
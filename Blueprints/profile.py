@@ -1,8 +1,6 @@
 from flask import Blueprint, jsonify
 from flask_jwt_extended import get_jwt_identity, jwt_required
-from flask_limiter import Limiter
 from flask_cors import CORS
-from flask_limiter.util import get_remote_address
 from config.settings import settings
 from database.user_queries import (
     get_current_user_by_email
@@ -10,7 +8,6 @@ from database.user_queries import (
 from util.authlib import requires_scope
 
 profile_bp = Blueprint("profile", __name__)
-limiter = Limiter(key_func=get_remote_address)
 
 # Enable CORS for all routes in this blueprint
 CORS(profile_bp, resources=settings.CORS_resource_allow_all)
@@ -3,6 +3,7 @@
 from io import BytesIO
 from flask import Blueprint, request, jsonify, send_file
 from flask_jwt_extended import jwt_required
+from util.limiter import limiter, rate_limits, get_identity_or_address
 from util.reports_service import (
     get_job_metrics,
     get_team_performance,
@@ -85,6 +86,7 @@ def system_health():
 
 @reports_bp.route("/export", methods=["POST"])
 @jwt_required()
+@limiter.limit(rate_limits.export, key_func=get_identity_or_address)
 def export():
     """
     Expects JSON:
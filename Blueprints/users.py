@@ -1,9 +1,7 @@
 from flask import Blueprint, jsonify, request
-from flask_limiter import Limiter
 from flask_cors import CORS
-from flask_limiter.util import get_remote_address
 from config.settings import settings
-from database.user_queries import get_all_users, get_one_user_by_email, get_user_id_by_email
+from database.user_queries import get_all_users, get_one_user_by_email, get_user_id_by_email, invalidate_user_id, invalidate_user_lists
 from util.activity_logger import log_activity
 from util.authlib import requires_scope
 from flask_jwt_extended import jwt_required, get_jwt_identity
@@ -12,7 +10,6 @@ from pydantic import BaseModel, ValidationError
 from werkzeug.exceptions import Forbidden
 
 user_bp = Blueprint("users", __name__)
-limiter = Limiter(key_func=get_remote_address)
 
 # Enable CORS for all routes in this blueprint
 CORS(user_bp, resources=settings.CORS_resource_allow_all)
@@ -106,6 +103,8 @@ def update_user(user_id):
             if not user:
                 return jsonify({"error": "User not found"}), 404
 
+    invalidate_user_id(user[1])
+    invalidate_user_lists()
     log_activity("User profile updated", "user", user_id=get_user_id_by_email(get_jwt_identity()), details=fields)
     return jsonify({"user": dict(zip(["id", "email", "name", "avatar_url", "status", "role"], user))})
 
@@ -119,5 +118,7 @@ def delete_user(user_id):
             deleted = cur.fetchone()
             if not deleted:
                 return jsonify({"error": "User not found"}), 404
+    invalidate_user_id(deleted[0])
+    invalidate_user_lists()
     log_activity("User soft-deleted", "user", user_id=get_user_id_by_email(get_jwt_identity()), details={"target_user_id": user_id})
     return jsonify({"message": "User deleted (soft delete)", "user_id": user_id})
@@ -1,6 +1,7 @@
 # config/settings.py
 import secrets
 from typing       import Optional
+from urllib.parse import quote
 from pydantic     import BaseSettings, Field
 
 
@@ -23,13 +24,180 @@ class PostgresSettings(BaseSettings):
 
 
 class RedisSettings(BaseSettings):
-    host: str = Field("localhost", env="REDIS_HOST")
-    port: int = Field(6379, env="REDIS_PORT")
-    db:   int = Field(0, env="REDIS_DB")
+    host:     str           = Field("localhost", env="REDIS_HOST")
+    port:     int           = Field(6379,        env="REDIS_PORT")
+    db:       int           = Field(0,           env="REDIS_DB")
+    password: Optional[str] = Field(None,        env="REDIS_PASSWORD")
+    ssl:      bool          = Field(False,       env="REDIS_SSL")
+    ssl_ca_certs: Optional[str] = Field(
+        None, env="REDIS_SSL_CA_CERTS",
+        description="CA bundle used to verify the server when REDIS_SSL is on"
+    )
+
+    # Process-wide connection pool (database/redisdb.get_pool)
+    max_connections:        int   = Field(50,  env="REDIS_MAX_CONNECTIONS")
+    pool_timeout:           float = Field(5.0, env="REDIS_POOL_TIMEOUT")
+    socket_timeout:         float = Field(5.0, env="REDIS_SOCKET_TIMEOUT")
+    socket_connect_timeout: float = Field(2.0, env="REDIS_SOCKET_CONNECT_TIMEOUT")
+    health_check_interval:  int   = Field(30,  env="REDIS_HEALTH_CHECK_INTERVAL")
+
+    # Local snapshot of the pg:* mirror (database/redis_snapshot.py)
+    snapshot_path: str = Field("snapshots/redis_mirror.snap", env="REDIS_SNAPSHOT_PATH")
+    # Older snapshots are ignored at startup (full clone instead); a new one
+    # is written after startup and every snapshot_interval_s (0 = never)
+    snapshot_max_age_s:  float = Field(21600.0, env="REDIS_SNAPSHOT_MAX_AGE_S")
+    snapshot_interval_s: float = Field(900.0,   env="REDIS_SNAPSHOT_INTERVAL_S")
 
     @property
     def url(self) -> str:
-        return f"redis://{self.host}:{self.port}/{self.db}"
+        scheme = "rediss" if self.ssl else "redis"
+        auth = f":{quote(self.password, safe='')}@" if self.password else ""
+        return f"{scheme}://{auth}{self.host}:{self.port}/{self.db}"
+
+    class Config:
+        env_file = ".env"
+        env_file_encoding = "utf-8"
+
+class RateLimitSettings(BaseSettings):
+    # Flask-Limiter rate strings, e.g. "10 per minute;100 per hour"
+    default:         str = Field("",                env="RATELIMIT_DEFAULT")
+    login:           str = Field("10 per minute",   env="RATELIMIT_LOGIN")
+    location_ingest: str = Field("120 per minute",  env="RATELIMIT_LOCATION_INGEST")
+    export:          str = Field("5 per minute",    env="RATELIMIT_EXPORT")
+    strategy:        str = Field("moving-window",   env="RATELIMIT_STRATEGY")
+
+    class Config:
+        env_file = ".env"
+        env_file_encoding = "utf-8"
+
+class CacheSettings(BaseSettings):
+    # Seconds a cached read is fresh, then how long it may still be served
+    # stale while one worker recomputes it (util/cache.py)
+    reports_ttl: int   = Field(60,  env="CACHE_REPORTS_TTL")
+    users_ttl:   int   = Field(30,  env="CACHE_USERS_TTL")
+    stale_ttl:   int   = Field(300, env="CACHE_STALE_TTL")
+    beta:        float = Field(1.0, env="CACHE_EARLY_REFRESH_BETA")
+    # How long the Redis job indexes are trusted after a full rebuild
+    # (database/job_index.py); a lost write can never outlive this
+    job_index_ttl: int = Field(3600, env="CACHE_JOB_INDEX_TTL")
+
+    class Config:
+        env_file = ".env"
+        env_file_encoding = "utf-8"
+
+class IngestSettings(BaseSettings):
+    # Write-behind queue in front of single-point location writes
+    # (util/ingest_queue.py). Opt-in: queued writes answer 202 before the
+    # point is stored. A point closer than dedup_distance_m to the previous
+    # stored point of the same device, and younger than dedup_seconds, is
+    # dropped as GPS jitter.
+    write_behind:      bool  = Field(False,  env="INGEST_WRITE_BEHIND")
+    dedup_distance_m:  float = Field(10.0,   env="INGEST_DEDUP_DISTANCE_M")
+    dedup_seconds:     float = Field(30.0,   env="INGEST_DEDUP_SECONDS")
+    flush_interval:    float = Field(1.0,    env="INGEST_FLUSH_INTERVAL")
+    max_batch:         int   = Field(1000,   env="INGEST_MAX_BATCH")
+    max_queue:         int   = Field(50000,  env="INGEST_MAX_QUEUE")
+    max_devices:       int   = Field(100000, env="INGEST_MAX_DEVICES")
+
+    class Config:
+        env_file = ".env"
+        env_file_encoding = "utf-8"
+
+class LocationRetentionSettings(BaseSettings):
+    # Monthly locations partitions (database/location_partitions.py): raw
+    # points older than raw_months are rolled up into location_tracks and
+    # their partitions dropped; months_ahead partitions are kept ready.
+    # Points older than the raw window, or more than future_skew_s ahead
+    # of the server clock, are rejected.
+    raw_months:          int   = Field(6,     env="LOCATIONS_RAW_MONTHS")
+    months_ahead:        int   = Field(3,     env="LOCATIONS_MONTHS_AHEAD")
+    rollup_tolerance_m:  float = Field(5.0,   env="LOCATIONS_ROLLUP_TOLERANCE_M")
+    future_skew_s:       float = Field(300.0, env="LOCATIONS_FUTURE_SKEW_S")
+
+    class Config:
+        env_file = ".env"
+        env_file_encoding = "utf-8"
+
+class GeofenceSettings(BaseSettings):
+    # Arrival detection around open job sites (util/geofence.py). A crew
+    # enters a fence within radius_m and leaves it beyond
+    # radius_m + exit_margin_m, so GPS noise at the edge does not flap.
+    enabled:         bool  = Field(True,  env="GEOFENCE_ENABLED")
+    radius_m:        float = Field(150.0, env="GEOFENCE_RADIUS_M")
+    exit_margin_m:   float = Field(50.0,  env="GEOFENCE_EXIT_MARGIN_M")
+    refresh_seconds: float = Field(60.0,  env="GEOFENCE_REFRESH_SECONDS")
+    max_point_age_s: float = Field(600.0, env="GEOFENCE_MAX_POINT_AGE_S")
+
+    class Config:
+        env_file = ".env"
+        env_file_encoding = "utf-8"
+
+class StreamSettings(BaseSettings):
+    # Server-sent event streams (util/sse.py): events buffered
+    # per client before the oldest are dropped, and the keep-alive period
+    buffer_size:       int   = Field(256,  env="STREAM_BUFFER_SIZE")
+    heartbeat_seconds: float = Field(15.0, env="STREAM_HEARTBEAT_SECONDS")
+    max_clients:       int   = Field(500,  env="STREAM_MAX_CLIENTS")
+    # Job -> team lookups of the live position stream, kept this long and
+    # for at most this many jobs, so a job moved to another team is seen
+    team_cache_seconds: float = Field(60.0,  env="STREAM_TEAM_CACHE_SECONDS")
+    team_cache_size:    int   = Field(10000, env="STREAM_TEAM_CACHE_SIZE")
+
+    class Config:
+        env_file = ".env"
+        env_file_encoding = "utf-8"
+
+class NotificationSettings(BaseSettings):
+    # Outbox dispatcher (util/notification_dispatcher.py)
+    workers:       int   = Field(2,     env="NOTIFY_WORKERS")
+    batch_size:    int   = Field(200,   env="NOTIFY_BATCH_SIZE")
+    poll_interval: float = Field(2.0,   env="NOTIFY_POLL_INTERVAL")
+    max_attempts:  int   = Field(5,     env="NOTIFY_MAX_ATTEMPTS")
+    retry_base_s:  float = Field(5.0,   env="NOTIFY_RETRY_BASE_SECONDS")
+    # Seconds between rebuilds of the Redis unread counters from Postgres
+    reconcile_interval: float = Field(300.0, env="NOTIFY_RECONCILE_INTERVAL")
+    # Repeats for the same (user, job, kind) within this many seconds merge
+    # into one unread row (database/notification_queries.py); 0 disables
+    coalesce_window_s: float = Field(300.0, env="NOTIFY_COALESCE_WINDOW_SECONDS")
+
+    class Config:
+        env_file = ".env"
+        env_file_encoding = "utf-8"
+
+class RetentionSettings(BaseSettings):
+    # Archiving of old notifications and job status history
+    # (database/retention.py). A policy with 0 days is off. Rows move in
+    # chunks of batch_size, each in its own short transaction, to archive
+    # tables (target "table") or gzipped JSON lines under archive_dir
+    # (target "file").
+    read_notification_days:   int   = Field(90,        env="RETENTION_READ_NOTIFICATION_DAYS")
+    unread_notification_days: int   = Field(0,         env="RETENTION_UNREAD_NOTIFICATION_DAYS")
+    status_history_days:      int   = Field(365,       env="RETENTION_STATUS_HISTORY_DAYS")
+    target:                   str   = Field("table",   env="RETENTION_TARGET")
+    archive_dir:              str   = Field("archive", env="RETENTION_ARCHIVE_DIR")
+    batch_size:               int   = Field(5000,      env="RETENTION_BATCH_SIZE")
+    pause_seconds:            float = Field(0.05,      env="RETENTION_PAUSE_SECONDS")
+
+    class Config:
+        env_file = ".env"
+        env_file_encoding = "utf-8"
+
+class EmailSettings(BaseSettings):
+    # Email copies of new notifications (util/email_delivery.py), sent
+    # through the Mailjet v3.1 Send API with the SMTP_ID / SMTP_SECRET keys.
+    # Up to batch_size messages go in one call (Mailjet allows 50), at most
+    # max_concurrency calls in flight; messages wait up to linger_seconds
+    # for a batch to fill.
+    enabled:          bool  = Field(False, env="EMAIL_ENABLED")
+    api_url:          str   = Field("https://api.mailjet.com/v3.1/send", env="EMAIL_API_URL")
+    sender:           str   = Field("",    env="EMAIL_SENDER")
+    sender_name:      str   = Field("D4B", env="EMAIL_SENDER_NAME")
+    batch_size:       int   = Field(50,    env="EMAIL_BATCH_SIZE")
+    max_concurrency:  int   = Field(4,     env="EMAIL_MAX_CONCURRENCY")
+    linger_seconds:   float = Field(2.0,   env="EMAIL_LINGER_SECONDS")
+    max_attempts:     int   = Field(5,     env="EMAIL_MAX_ATTEMPTS")
+    retry_base_s:     float = Field(1.0,   env="EMAIL_RETRY_BASE_SECONDS")
+    timeout_s:        float = Field(10.0,  env="EMAIL_TIMEOUT_SECONDS")
 
     class Config:
         env_file = ".env"
@@ -68,17 +236,22 @@ class MongoSettings(BaseSettings):
 
 
 class FirebaseSettings(BaseSettings):
-    api_key: str = Field(..., env="FIREBASE_APIKEY")
-    auth_domain: str = Field(..., env="FIREBASE_AUTHDOMAIN")
+    # Web config values are optional so the local emulator works without them
+    api_key: Optional[str] = Field(None, env="FIREBASE_APIKEY")
+    auth_domain: Optional[str] = Field(None, env="FIREBASE_AUTHDOMAIN")
     project_id: str = Field(..., env="FIREBASE_PROJECTID")
-    storage_bucket: str = Field(..., env="FIREBASE_STORAGEBUCKET")
-    messaging_sender_id: str = Field(...,
-                                     env="FIREBASE_MESSAGINGSENDERID")
-    app_id: str = Field(..., env="FIREBASE_APPID")
-    creds_path: str = Field(
-        ..., env="FIREBASE_CREDENTIALS",
+    storage_bucket: Optional[str] = Field(None, env="FIREBASE_STORAGEBUCKET")
+    messaging_sender_id: Optional[str] = Field(None,
+                                               env="FIREBASE_MESSAGINGSENDERID")
+    app_id: Optional[str] = Field(None, env="FIREBASE_APPID")
+    creds_path: Optional[str] = Field(
+        None, env="FIREBASE_CREDENTIALS",
         description="Path to service-account JSON file"
     )
+    emulator_host: Optional[str] = Field(
+        None, env="FIRESTORE_EMULATOR_HOST",
+        description="e.g. localhost:8080 to use the local Firestore emulator"
+    )
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,11 @@
+-- Grid cell of each job site for /geo/nearby (util/geo.py).
+-- 0.01° cells, 36000 cells per latitude row; keep in sync with util.geo.CELL_DEG.
+ALTER TABLE jobs
+    ADD COLUMN IF NOT EXISTS geo_cell BIGINT GENERATED ALWAYS AS (
+        floor((latitude + 90) / 0.01)::bigint * 36000
+        + floor((longitude + 180) / 0.01)::bigint
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_jobs_geo_cell_status
+    ON jobs (geo_cell, status)
+    WHERE geo_cell IS NOT NULL;
@@ -0,0 +1,99 @@
+-- Monthly range partitioning of locations on "timestamp" (database/location_partitions.py).
+-- Run once; converts the existing table in place inside one transaction.
+-- Partitions are named locations_yYYYYmMM and cover [first of month, first of next month).
+
+BEGIN;
+
+-- Creates the partition holding `month` if it does not exist yet; safe to call concurrently.
+CREATE OR REPLACE FUNCTION ensure_location_partition(month date)
+RETURNS text
+LANGUAGE plpgsql AS $$
+DECLARE
+    lower_bound date := date_trunc('month', month)::date;
+    upper_bound date := (date_trunc('month', month) + interval '1 month')::date;
+    partition   text := format('locations_y%sm%s', to_char(lower_bound, 'YYYY'), to_char(lower_bound, 'MM'));
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('ensure_location_partition'));
+    IF to_regclass(partition) IS NULL THEN
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF locations FOR VALUES FROM (%L) TO (%L)',
+            partition, lower_bound, upper_bound
+        );
+    END IF;
+    RETURN partition;
+END;
+$$;
+
+ALTER TABLE locations RENAME TO locations_unpartitioned;
+ALTER SEQUENCE locations_id_seq OWNED BY NONE;
+
+-- Same columns and defaults as before (id keeps drawing from locations_id_seq).
+-- The primary key of a partitioned table must include the partition key.
+CREATE TABLE locations (
+    LIKE locations_unpartitioned INCLUDING DEFAULTS,
+    PRIMARY KEY (id, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+ALTER TABLE locations ALTER COLUMN timestamp SET DEFAULT NOW();
+ALTER SEQUENCE locations_id_seq OWNED BY locations.id;
+
+-- Carry the foreign keys (job_id, user_id) over unchanged
+DO $$
+DECLARE
+    fk record;
+BEGIN
+    FOR fk IN
+        SELECT conname, pg_get_constraintdef(oid) AS def
+        FROM pg_constraint
+        WHERE conrelid = 'locations_unpartitioned'::regclass AND contype = 'f'
+    LOOP
+        EXECUTE format('ALTER TABLE locations_unpartitioned DROP CONSTRAINT %I', fk.conname);
+        EXECUTE format('ALTER TABLE locations ADD CONSTRAINT %I %s', fk.conname, fk.def);
+    END LOOP;
+END;
+$$;
+
+-- One partition per month that has data, plus the next three months
+SELECT ensure_location_partition(m::date)
+FROM generate_series(
+    date_trunc('month', COALESCE((SELECT MIN(timestamp) FROM locations_unpartitioned), NOW())),
+    date_trunc('month', NOW()) + interval '3 months',
+    interval '1 month'
+) AS m;
+
+-- The partition key cannot be NULL
+UPDATE locations_unpartitioned SET timestamp = NOW() WHERE timestamp IS NULL;
+
+INSERT INTO locations SELECT * FROM locations_unpartitioned;
+
+DROP TABLE locations_unpartitioned;
+
+-- Partitioned indexes, built after the copy; every partition gets its
+-- own copy, so the "ORDER BY timestamp DESC LIMIT n" reads of
+-- get_locations become a merge of short per-partition index scans,
+-- pruned by start/end.
+CREATE INDEX IF NOT EXISTS idx_locations_job_ts  ON locations (job_id, timestamp DESC);
+CREATE INDEX IF NOT EXISTS idx_locations_user_ts ON locations (user_id, timestamp DESC);
+CREATE INDEX IF NOT EXISTS idx_locations_ts      ON locations (timestamp DESC);
+
+-- Per-job, per-user simplified tracks of raw points past retention
+CREATE TABLE IF NOT EXISTS location_tracks (
+    id            BIGSERIAL   PRIMARY KEY,
+    job_id        INTEGER     NOT NULL,
+    user_id       INTEGER,
+    month         DATE        NOT NULL,
+    started_at    TIMESTAMPTZ NOT NULL,
+    ended_at      TIMESTAMPTZ NOT NULL,
+    points_in     INTEGER     NOT NULL,
+    points_out    INTEGER     NOT NULL,
+    tolerance_m   REAL        NOT NULL,
+    polyline      TEXT        NOT NULL,
+    created_at    TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_location_tracks_job_month
+    ON location_tracks (job_id, month);
+CREATE INDEX IF NOT EXISTS idx_location_tracks_user_month
+    ON location_tracks (user_id, month);
+
+COMMIT;
@@ -0,0 +1,53 @@
+-- Coalescing of repeated notifications (database/notification_queries.upsert_notifications).
+-- An unread notification for the same (user, job, kind) updated within
+-- NOTIFY_COALESCE_WINDOW_SECONDS absorbs the next one: update_count goes
+-- up, message and updated_at take the latest values.
+ALTER TABLE notifications ADD COLUMN IF NOT EXISTS kind TEXT NOT NULL DEFAULT 'general';
+ALTER TABLE notifications ADD COLUMN IF NOT EXISTS update_count INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE notifications ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ;
+UPDATE notifications SET updated_at = created_at WHERE updated_at IS NULL;
+ALTER TABLE notifications ALTER COLUMN updated_at SET DEFAULT NOW();
+ALTER TABLE notifications ALTER COLUMN updated_at SET NOT NULL;
+
+ALTER TABLE notification_outbox ADD COLUMN IF NOT EXISTS kind TEXT NOT NULL DEFAULT 'general';
+
+-- Finds the row to merge into
+CREATE INDEX IF NOT EXISTS idx_notifications_coalesce
+    ON notifications (user_id, job_id, kind, updated_at)
+    WHERE status = 'unread';
+
+-- Inbox order (GET /notify/): most recently updated first
+CREATE INDEX IF NOT EXISTS idx_notifications_user_updated
+    ON notifications (user_id, updated_at DESC);
+
+-- Push merged rows too (see notification_push.sql), so live clients see
+-- the new count; mark-read and other updates do not notify.
+CREATE OR REPLACE FUNCTION notify_coalesced_notifications() RETURNS trigger AS $$
+DECLARE
+    r RECORD;
+    i INTEGER;
+BEGIN
+    FOR r IN
+        SELECT n.user_id, array_agg(n.id ORDER BY n.id) AS ids
+        FROM new_rows n
+        JOIN old_rows o ON o.id = n.id
+        WHERE n.user_id IS NOT NULL AND n.update_count > o.update_count
+        GROUP BY n.user_id
+    LOOP
+        FOR i IN 1 .. array_length(r.ids, 1) BY 300 LOOP
+            PERFORM pg_notify(
+                'notifications_new',
+                json_build_object('user_id', r.user_id, 'ids', r.ids[i:i + 299])::text
+            );
+        END LOOP;
+    END LOOP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_notifications_push_coalesced ON notifications;
+CREATE TRIGGER trg_notifications_push_coalesced
+    AFTER UPDATE ON notifications
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notify_coalesced_notifications();
@@ -0,0 +1,30 @@
+-- Durable outbox of notification intents (util/notification_dispatcher.py).
+-- Rows are written in the same transaction as the change that causes them
+-- and delivered into notifications by background workers.
+CREATE TABLE IF NOT EXISTS notification_outbox (
+    id            BIGSERIAL   PRIMARY KEY,
+    user_id       INTEGER,
+    team_id       INTEGER,                                 -- set: fan out to every member
+    job_id        INTEGER,
+    message       TEXT        NOT NULL,
+    dedup         BOOLEAN     NOT NULL DEFAULT TRUE,       -- skip members with an unread one for the job
+    status        TEXT        NOT NULL DEFAULT 'pending',  -- pending | failed
+    attempts      INTEGER     NOT NULL DEFAULT 0,
+    available_at  TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    last_error    TEXT,
+    created_at    TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Workers claim the oldest due rows; delivered rows are deleted, so this stays small
+CREATE INDEX IF NOT EXISTS idx_notification_outbox_due
+    ON notification_outbox (available_at, id)
+    WHERE status = 'pending';
+
+-- Team fan-out (database/notification_queries.notify_team); for outboxes created before it
+ALTER TABLE notification_outbox ADD COLUMN IF NOT EXISTS team_id INTEGER;
+ALTER TABLE notification_outbox ADD COLUMN IF NOT EXISTS dedup BOOLEAN NOT NULL DEFAULT TRUE;
+
+-- Serves the "already has an unread notification for this job" check
+CREATE INDEX IF NOT EXISTS idx_notifications_unread_user_job
+    ON notifications (user_id, job_id)
+    WHERE status = 'unread';
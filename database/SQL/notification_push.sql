@@ -0,0 +1,34 @@
+-- Push channel for new notifications (util/notification_stream.py).
+-- A statement-level trigger sends one NOTIFY per receiving user and
+-- statement, so a team fan-out of N rows costs N small payloads instead
+-- of clients polling GET /notify/ every few seconds. Listeners only see
+-- them once the inserting transaction commits.
+CREATE OR REPLACE FUNCTION notify_new_notifications() RETURNS trigger AS $$
+DECLARE
+    r RECORD;
+    i INTEGER;
+BEGIN
+    FOR r IN
+        SELECT user_id, array_agg(id ORDER BY id) AS ids
+        FROM new_rows
+        WHERE user_id IS NOT NULL
+        GROUP BY user_id
+    LOOP
+        -- 300 ids keep every payload well under the 8000 byte NOTIFY limit
+        FOR i IN 1 .. array_length(r.ids, 1) BY 300 LOOP
+            PERFORM pg_notify(
+                'notifications_new',
+                json_build_object('user_id', r.user_id, 'ids', r.ids[i:i + 299])::text
+            );
+        END LOOP;
+    END LOOP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_notifications_push ON notifications;
+CREATE TRIGGER trg_notifications_push
+    AFTER INSERT ON notifications
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notify_new_notifications();
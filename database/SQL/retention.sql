@@ -0,0 +1,27 @@
+-- Archive tables and indexes for database/retention.py.
+-- Archives copy the live columns (no defaults, keys or foreign keys, so
+-- archived rows never block deleting a user or a job) plus archived_at.
+-- Run after notification_coalescing.sql so the notification columns match.
+CREATE TABLE IF NOT EXISTS notifications_archive (
+    LIKE notifications,
+    archived_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS idx_notifications_archive_user
+    ON notifications_archive (user_id, created_at);
+
+CREATE TABLE IF NOT EXISTS job_status_history_archive (
+    LIKE job_status_history,
+    archived_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS idx_job_status_history_archive_job
+    ON job_status_history_archive (job_id, changed_at);
+
+-- Let each retention chunk find its rows without scanning the table
+CREATE INDEX IF NOT EXISTS idx_notifications_status_updated
+    ON notifications (status, updated_at);
+CREATE INDEX IF NOT EXISTS idx_job_status_history_changed
+    ON job_status_history (changed_at);
+
+-- get_job reads one job's history in order
+CREATE INDEX IF NOT EXISTS idx_job_status_history_job_changed
+    ON job_status_history (job_id, changed_at);
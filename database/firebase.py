@@ -1,21 +1,33 @@
 # database/firebase.py
 from contextlib import contextmanager
 import os
+import threading
 import firebase_admin
 from config.settings import FirebaseSettings
 from firebase_admin import credentials, firestore
 
 _fb = FirebaseSettings()
 
-@contextmanager
-def get_connection():
+_client = None
+_lock = threading.Lock()
+
+
+def _get_app():
+    """
+    Returns the default Firebase app, initialising it on first use only;
+    firebase_admin raises if initialize_app runs twice in one process.
+    """
+    try:
+        return firebase_admin.get_app()
+    except ValueError:
+        pass
     if not _fb.project_id or not _fb.creds_path:
         raise RuntimeError("FIREBASE_PROJECT_ID and GOOGLE_APPLICATION_CREDENTIALS are required")
     os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = _fb.creds_path
     current_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
     cert_path = os.path.join(current_dir, _fb.creds_path)
     cred = credentials.Certificate(cert=cert_path)
-    firebase_admin.initialize_app(
+    return firebase_admin.initialize_app(
         cred,
         {
             "apiKey": _fb.api_key,
@@ -26,8 +38,32 @@ def get_connection():
             "appId": _fb.app_id,
         },
     )
-    db = firestore.client()
-    try:
-        yield db
-    finally:
-        pass
+
+
+def get_client():
+    """
+    Process-wide Firestore client, created lazily.
+
+    With FIRESTORE_EMULATOR_HOST set, connects to the local emulator
+    with anonymous credentials instead of the service account.
+    """
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                if _fb.emulator_host:
+                    from google.auth.credentials import AnonymousCredentials
+                    from google.cloud import firestore as gcloud_firestore
+
+                    os.environ["FIRESTORE_EMULATOR_HOST"] = _fb.emulator_host
+                    _client = gcloud_firestore.Client(
+                        project=_fb.project_id, credentials=AnonymousCredentials()
+                    )
+                else:
+                    _client = firestore.client(_get_app())
+    return _client
+
+
+@contextmanager
+def get_connection():
+    yield get_client()
@@ -1,10 +1,10 @@
 import json
 import time
 import sys
-from decimal import Decimal
-from datetime import datetime, date
+from psycopg2 import sql
 from database.postgres import get_connection as Postgres
-from database.redisdb import get_connection as Redis
+from database.redisdb import get_connection as Redis, to_redis_compatible, to_redis_json
+from database.job_index import index_job, rebuild_job_indexes
 from colorama import init, Fore, Style
 
 init(autoreset=True)
@@ -25,17 +25,6 @@ SYSTEMS = [
     ('LIFE_SUPPORT', 'system_health')
 ]
 
-def to_redis_compatible(value):
-    if value is None:
-        return ""
-    if isinstance(value, Decimal):
-        return float(value)
-    if isinstance(value, (datetime, date)):
-        return value.isoformat()
-    if isinstance(value, (bytes, bytearray)):
-        return value.decode("utf-8")
-    return str(value)
-
 def get_primary_key(cur, table):
     """
     Returns the primary key column for the table, or first column as fallback.
@@ -66,13 +55,17 @@ def get_table_columns(cur, table):
     """, (table,))
     return [row[0] for row in cur.fetchall()]
 
-def clone_table(table, cur, redis_conn):
-    columns = get_table_columns(cur, table)
-    pk = get_primary_key(cur, table)
-    if not columns or not pk:
-        return (0, 0)  # no data
-    cur.execute(f"SELECT * FROM {table}")
-    rows = cur.fetchall()
+# Column used to find rows changed since the last clone, in order of preference
+WATERMARK_COLUMNS = ("updated_at", "last_updated", "created_at", "changed_at", "timestamp", "joined_at")
+WATERMARK_KEY = "pg:_meta:watermark"
+
+def get_watermark_column(columns):
+    return next((c for c in WATERMARK_COLUMNS if c in columns), None)
+
+def mirror_rows(table, columns, pk, rows, redis_conn):
+    """
+    Writes rows into the pg:<table>:<pk> hash and JSON keys. Returns the error count.
+    """
     pipeline = redis_conn.pipeline()
     error_count = 0
     for row in rows:
@@ -84,10 +77,81 @@ def clone_table(table, cur, redis_conn):
                 continue  # skip row
             key = f"pg:{table}:{pk_value}"
             pipeline.hset(key, mapping=row_dict)
-            pipeline.set(f"{key}:json", json.dumps(row_dict, default=str))
+            pipeline.set(f"{key}:json", to_redis_json(dict(zip(columns, row))))
         except Exception as _:
             error_count += 1
     pipeline.execute()
+    return error_count
+
+def record_watermark(table, columns, pk, rows, redis_conn):
+    """
+    Stores the highest primary key and change timestamp mirrored for a table,
+    so a later restore only has to fetch newer rows from Postgres.
+    """
+    previous = redis_conn.hget(WATERMARK_KEY, table)
+    mark = json.loads(previous) if previous else {"pk": None, "column": None, "value": None}
+    ts_column = get_watermark_column(columns)
+    pk_idx = columns.index(pk)
+    pks = [row[pk_idx] for row in rows if isinstance(row[pk_idx], int)]
+    if pks:
+        mark["pk"] = max(pks + ([mark["pk"]] if mark["pk"] is not None else []))
+    if ts_column:
+        ts_idx = columns.index(ts_column)
+        stamps = [row[ts_idx].isoformat() for row in rows if row[ts_idx] is not None]
+        if mark["value"] is not None and mark["column"] == ts_column:
+            stamps.append(mark["value"])
+        mark["column"] = ts_column
+        mark["value"] = max(stamps) if stamps else mark["value"]
+    redis_conn.hset(WATERMARK_KEY, table, json.dumps(mark))
+    return mark
+
+def clone_table(table, cur, redis_conn):
+    columns = get_table_columns(cur, table)
+    pk = get_primary_key(cur, table)
+    if not columns or not pk:
+        return (0, 0)  # no data
+    cur.execute(f"SELECT * FROM {table}")
+    rows = cur.fetchall()
+    error_count = mirror_rows(table, columns, pk, rows, redis_conn)
+    if table == "jobs":
+        rebuild_job_indexes(redis_conn, [dict(zip(columns, row)) for row in rows])
+    redis_conn.hdel(WATERMARK_KEY, table)
+    record_watermark(table, columns, pk, rows, redis_conn)
+    return (len(rows), error_count)
+
+def catch_up_table(table, cur, redis_conn, mark):
+    """
+    Mirrors only the rows added or changed after the recorded watermark.
+    Deleted rows are not detected; run a full clone to drop them.
+    """
+    columns = get_table_columns(cur, table)
+    pk = get_primary_key(cur, table)
+    if not columns or not pk:
+        return (0, 0)
+    conditions = []
+    params = []
+    if mark.get("pk") is not None:
+        conditions.append(sql.SQL("{} > %s").format(sql.Identifier(pk)))
+        params.append(mark["pk"])
+    if mark.get("column") in columns and mark.get("value") is not None:
+        conditions.append(sql.SQL("{} > %s").format(sql.Identifier(mark["column"])))
+        params.append(mark["value"])
+    if not conditions:
+        # Nothing to compare against: fall back to a full copy of this table
+        return clone_table(table, cur, redis_conn)
+    cur.execute(
+        sql.SQL("SELECT * FROM {} WHERE {}").format(
+            sql.Identifier(table), sql.SQL(" OR ").join(conditions)
+        ),
+        params,
+    )
+    rows = cur.fetchall()
+    error_count = mirror_rows(table, columns, pk, rows, redis_conn)
+    if table == "jobs":
+        for row in rows:
+            index_job(redis_conn, dict(zip(columns, row)))
+    if rows:
+        record_watermark(table, columns, pk, rows, redis_conn)
     return (len(rows), error_count)
 
 def starship_print(msg, color=None, delay=0.1, end='\n'):
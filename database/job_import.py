@@ -0,0 +1,267 @@
+# database/job_import.py
+
+import argparse
+import io
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from psycopg2.extras import RealDictCursor
+from database.job_index import sync_new_jobs
+from database.postgres import get_connection
+from util.logit import get_logger
+from util.models import FINISHED_JOB_STATUSES, JobCreateRequest
+
+logger = get_logger("logs", "Job Import")
+
+FORMATS = ("csv", "jsonl")
+MAX_ROWS = 50000
+TEXT_COLUMNS = ("title", "description", "priority", "location")
+COORD_COLUMNS = ("latitude", "longitude")
+# Reference columns and the table their ids must exist in
+ID_COLUMNS = {"team_id": "teams", "assignee_id": "users"}
+COLUMNS = TEXT_COLUMNS + COORD_COLUMNS + tuple(ID_COLUMNS)
+# Rows with the same values here are the same job
+DUPLICATE_KEY = ["title", "location", "latitude", "longitude"]
+
+
+class JobImportError(Exception):
+    """The file as a whole cannot be imported (format, header, size)."""
+
+
+def detect_format(filename: Optional[str], content_type: Optional[str]) -> Optional[str]:
+    ext = os.path.splitext(filename or "")[1].lower()
+    if ext == ".csv":
+        return "csv"
+    if ext in (".jsonl", ".ndjson", ".json"):
+        return "jsonl"
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type in ("text/csv", "application/csv"):
+        return "csv"
+    if content_type in ("application/x-ndjson", "application/jsonl", "application/x-jsonlines"):
+        return "jsonl"
+    return None
+
+
+def read_jobs(data: bytes, fmt: str) -> pd.DataFrame:
+    """
+    Parses the upload into a DataFrame with a `row` column: the line of
+    the row in the file (CSV counts the header as line 1).
+    """
+    if fmt not in FORMATS:
+        raise JobImportError(f"Unsupported format {fmt!r}, use one of {', '.join(FORMATS)}")
+    try:
+        if fmt == "csv":
+            df = pd.read_csv(io.BytesIO(data), dtype=str, keep_default_na=False, skip_blank_lines=True)
+            first_line = 2
+        else:
+            df = pd.read_json(io.BytesIO(data), lines=True, dtype=False, convert_dates=False)
+            first_line = 1
+    except (ValueError, pd.errors.ParserError, UnicodeDecodeError) as e:
+        raise JobImportError(f"Could not parse {fmt}: {e}")
+    df.columns = [str(c).strip().lower() for c in df.columns]
+    if "title" not in df.columns:
+        raise JobImportError("A title column is required")
+    if len(df) > MAX_ROWS:
+        raise JobImportError(f"At most {MAX_ROWS} rows per import")
+    df.insert(0, "row", np.arange(first_line, first_line + len(df)))
+    return df
+
+
+def _blank(series: pd.Series) -> pd.Series:
+    return series.isna() | (series.astype(str).str.strip() == "")
+
+
+def _existing_ids(cur, table: str, ids: np.ndarray) -> np.ndarray:
+    if not len(ids):
+        return ids
+    cur.execute(f"SELECT id FROM {table} WHERE id = ANY(%s)", ([int(i) for i in ids],))
+    return np.array([r["id"] for r in cur.fetchall()], dtype=np.int64)
+
+
+def validate_jobs(df: pd.DataFrame, cur) -> Tuple[pd.DataFrame, List[Dict[str, Any]]]:
+    """
+    Applies the JobCreateRequest rules a column at a time instead of
+    building one model per row, and checks that the referenced teams and
+    assignees exist with one query per column.
+    Returns the clean rows (typed for COPY) and one error per failed check:
+    {"row": <line>, "field": ..., "error": ...}.
+    """
+    rules = JobCreateRequest.__fields__
+    n = len(df)
+    errors: List[Dict[str, Any]] = []
+
+    def fail(mask, field: str, message):
+        mask = np.asarray(mask, dtype=bool)
+        rows = df["row"].to_numpy()[mask]
+        messages = np.asarray(message)[mask] if not isinstance(message, str) else [message] * len(rows)
+        errors.extend({"row": int(r), "field": field, "error": str(m)} for r, m in zip(rows, messages))
+
+    clean = pd.DataFrame({"row": df["row"]})
+    for col in TEXT_COLUMNS:
+        values = df[col] if col in df.columns else pd.Series([None] * n, index=df.index)
+        text = values.where(~_blank(values)).astype("string").str.strip()
+        clean[col] = text
+
+    min_length = rules["title"].field_info.min_length or 1
+    fail(clean["title"].isna() | (clean["title"].str.len() < min_length).fillna(True),
+         "title", f"at least {min_length} characters required")
+
+    clean["priority"] = clean["priority"].fillna(rules["priority"].default)
+    allowed = clean["priority"].str.fullmatch(rules["priority"].field_info.regex.strip("^$"))
+    fail(~allowed.fillna(False), "priority", "must be one of Critical, High, Medium, Low")
+
+    for col in COORD_COLUMNS:
+        given = ~_blank(df[col]) if col in df.columns else pd.Series(False, index=df.index)
+        values = pd.to_numeric(df[col], errors="coerce") if col in df.columns else pd.Series(np.nan, index=df.index)
+        info = rules[col].field_info
+        fail(given & values.isna(), col, "not a number")
+        fail(values.notna() & ((values < info.ge) | (values > info.le)), col,
+             f"must be between {info.ge} and {info.le}")
+        clean[col] = values
+
+    for col, table in ID_COLUMNS.items():
+        given = ~_blank(df[col]) if col in df.columns else pd.Series(False, index=df.index)
+        values = pd.to_numeric(df[col], errors="coerce") if col in df.columns else pd.Series(np.nan, index=df.index)
+        bad = given & (values.isna() | (values % 1 != 0) | (values <= 0))
+        fail(bad, col, "not a positive integer")
+        values = values.where(~bad)
+        ids = values.dropna().astype(np.int64).unique()
+        missing = values.notna() & ~np.isin(values.fillna(0).astype(np.int64), _existing_ids(cur, table, ids))
+        fail(missing, col, [f"{table[:-1]} {v} does not exist" for v in values.astype("Int64").astype(str)])
+        clean[col] = values.astype("Int64")
+
+    duplicate = clean.duplicated(subset=DUPLICATE_KEY, keep="first") & clean["title"].notna()
+    fail(duplicate, "title", "duplicate of an earlier row")
+
+    failed_rows = {e["row"] for e in errors}
+    valid = clean[~clean["row"].isin(failed_rows)]
+    errors.sort(key=lambda e: e["row"])
+    return valid, errors
+
+
+def _copy_to_staging(cur, valid: pd.DataFrame):
+    cur.execute(
+        """CREATE TEMP TABLE jobs_import_staging (
+               row_no      INTEGER,
+               title       TEXT,
+               description TEXT,
+               priority    TEXT,
+               location    TEXT,
+               latitude    DOUBLE PRECISION,
+               longitude   DOUBLE PRECISION,
+               team_id     INTEGER,
+               assignee_id INTEGER
+           ) ON COMMIT DROP
+        """
+    )
+    buf = io.StringIO()
+    valid[["row", *COLUMNS]].to_csv(buf, index=False, header=False, na_rep="")
+    buf.seek(0)
+    cur.copy_expert(
+        f"COPY jobs_import_staging (row_no, {', '.join(COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+        buf,
+    )
+
+
+def _merge_staging(cur, reporter_id) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Skips rows matching a job that is not finished yet (re-uploading the
+    same sheet is harmless) and inserts the rest with one INSERT ... SELECT.
+    Returns (inserted jobs rows, skipped {"row", "job_id"}).
+    """
+    # Two concurrent imports of the same sheet must not both pass the check
+    cur.execute("SELECT pg_advisory_xact_lock(hashtext('jobs_import'))")
+    cur.execute(
+        """SELECT s.row_no AS row, j.id AS job_id
+           FROM jobs_import_staging s
+           JOIN LATERAL (
+               SELECT id FROM jobs j
+               WHERE j.title = s.title
+                 AND j.location IS NOT DISTINCT FROM s.location
+                 AND j.latitude::double precision IS NOT DISTINCT FROM s.latitude
+                 AND j.longitude::double precision IS NOT DISTINCT FROM s.longitude
+                 AND j.status <> ALL(%s)
+               LIMIT 1
+           ) j ON TRUE
+           ORDER BY s.row_no
+        """,
+        (list(FINISHED_JOB_STATUSES),),
+    )
+    skipped = cur.fetchall()
+    cur.execute(
+        """INSERT INTO jobs (
+               title, description, priority,
+               location, latitude, longitude,
+               reporter_id, team_id, assignee_id, status
+           )
+           SELECT title, description, priority,
+                  location, latitude, longitude,
+                  %s, team_id, assignee_id, 'open'
+           FROM jobs_import_staging
+           WHERE row_no <> ALL(%s)
+           ORDER BY row_no
+           RETURNING *
+        """,
+        (reporter_id, [s["row"] for s in skipped]),
+    )
+    return cur.fetchall(), skipped
+
+
+def import_jobs(data: bytes, fmt: str, reporter_id, dry_run: bool = False, strict: bool = False) -> Dict[str, Any]:
+    """
+    Validates a CSV / JSON lines file of jobs and, unless `dry_run`, loads
+    the valid rows with COPY into a temporary staging table and merges
+    them into jobs in a single transaction. With `strict`, any invalid row
+    cancels the whole import.
+
+    Returns {"rows", "valid", "created", "job_ids", "skipped", "errors"}.
+    Raises JobImportError for problems with the file as a whole.
+    """
+    df = read_jobs(data, fmt)
+    report = {"rows": len(df), "valid": 0, "created": 0, "job_ids": [], "skipped": [], "errors": []}
+    with get_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            valid, errors = validate_jobs(df, cur)
+            report["valid"] = len(valid)
+            report["errors"] = errors
+            if dry_run or valid.empty or (strict and errors):
+                conn.rollback()
+                return report
+            _copy_to_staging(cur, valid)
+            inserted, skipped = _merge_staging(cur, reporter_id)
+            conn.commit()
+
+    sync_new_jobs(inserted)
+    report["created"] = len(inserted)
+    report["job_ids"] = [job["id"] for job in inserted]
+    report["skipped"] = skipped
+    logger.info(f"Imported {len(inserted)} of {len(df)} jobs "
+                f"({len(skipped)} already existed, {len({e['row'] for e in errors})} invalid)")
+    return report
+
+
+if __name__ == "__main__":
+    from database.user_queries import get_user_id_by_email
+    from util.activity_logger import log_activity
+
+    parser = argparse.ArgumentParser(description="Bulk import jobs from CSV or JSON lines.")
+    parser.add_argument("path")
+    parser.add_argument("--reporter", required=True, help="Email of the reporting user")
+    parser.add_argument("--format", choices=FORMATS, default=None, help="Default: from the file extension")
+    parser.add_argument("--dry-run", action="store_true", help="Validate only")
+    parser.add_argument("--strict", action="store_true", help="Import nothing if any row is invalid")
+    args = parser.parse_args()
+
+    fmt = args.format or detect_format(args.path, None)
+    reporter = get_user_id_by_email(args.reporter)
+    if reporter is None:
+        parser.error(f"Unknown user {args.reporter}")
+    reporter_id = reporter[0]
+    with open(args.path, "rb") as f:
+        result = import_jobs(f.read(), fmt, reporter_id, dry_run=args.dry_run, strict=args.strict)
+    if result["created"]:
+        log_activity("Jobs imported", "job", user_id=reporter_id,
+                     details={k: result[k] for k in ("rows", "created")} | {"file": os.path.basename(args.path)})
+    print(json.dumps({k: v for k, v in result.items() if k != "job_ids"}, indent=2, default=str))
@@ -0,0 +1,306 @@
+# database/job_index.py
+
+import json
+import threading
+import uuid
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
+from psycopg2.extras import RealDictCursor
+from config.settings import CacheSettings
+from database.postgres import get_connection as Postgres
+from database.redisdb import get_connection as Redis, to_redis_compatible
+from util.logit import get_logger
+
+logger = get_logger("logs", "Job Index")
+
+cache_settings = CacheSettings()
+
+# Filters served by list_jobs that have a Redis set per value.
+INDEXED_COLUMNS = ("status", "priority", "team_id", "assignee_id", "reporter_id")
+
+ROW_PREFIX = "pg:jobs"
+INDEX_PREFIX = "pg:jobs:idx"
+CREATED_KEY = f"{INDEX_PREFIX}:created"
+READY_KEY = f"{INDEX_PREFIX}:ready"
+REBUILD_LOCK = f"{INDEX_PREFIX}:rebuild"
+# How far before the rebuild snapshot a write may have started and still
+# be missing from it
+REPLAY_MARGIN_S = 300
+
+
+def _row_key(job_id) -> str:
+    return f"{ROW_PREFIX}:{job_id}"
+
+
+def _set_key(column: str, value) -> str:
+    return f"{INDEX_PREFIX}:{column}:{value}"
+
+
+def _index_value(value) -> str:
+    return "" if value is None else str(value)
+
+
+def _created_score(value) -> float:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return 0.0
+
+
+def _as_datetime(value) -> Optional[datetime]:
+    if isinstance(value, str) and value:
+        value = datetime.fromisoformat(value)
+    return value if isinstance(value, datetime) else None
+
+
+def _json_default(obj):
+    # Tag dates so they decode to the same types psycopg2 returned;
+    # Decimals become strings, as jsonify renders them on the Postgres path
+    if isinstance(obj, datetime):
+        return {"$datetime": obj.isoformat()}
+    if isinstance(obj, date):
+        return {"$date": obj.isoformat()}
+    return str(obj)
+
+
+def _json_hook(obj: Dict[str, Any]):
+    if len(obj) == 1:
+        if "$datetime" in obj:
+            return datetime.fromisoformat(obj["$datetime"])
+        if "$date" in obj:
+            return date.fromisoformat(obj["$date"])
+    return obj
+
+
+def _to_json(job: Dict[str, Any]) -> str:
+    return json.dumps(job, default=_json_default)
+
+
+def _from_json(doc: str) -> Dict[str, Any]:
+    """
+    Decode a mirrored job document back into the row list_jobs would
+    have read from Postgres.
+    """
+    return json.loads(doc, object_hook=_json_hook)
+
+
+def mirror_job(pipe, job: Dict[str, Any]):
+    """
+    Queue the hash and JSON copies of a jobs row on a pipeline,
+    in the same layout clone_table uses for every mirrored table.
+    """
+    key = _row_key(job["id"])
+    pipe.hset(key, mapping={k: to_redis_compatible(v) for k, v in job.items()})
+    pipe.set(f"{key}:json", _to_json(job))
+
+
+def index_job(redis_conn, job: Dict[str, Any]):
+    """
+    Mirror a full jobs row into Redis and move it between index sets.
+
+    The previous indexed values and updated_at are read from the mirrored
+    hash under WATCH, so concurrent updates of the same job retry instead
+    of leaving the id in a stale set, and a row older than the mirrored
+    one (a slow request committing late) is ignored.
+    """
+    job_id = job["id"]
+    key = _row_key(job_id)
+
+    def _apply(pipe):
+        *old_values, old_updated = pipe.hmget(key, *INDEXED_COLUMNS, "updated_at")
+        pipe.multi()
+        mirrored, incoming = _as_datetime(old_updated), _as_datetime(job.get("updated_at"))
+        if mirrored and incoming and incoming < mirrored:
+            return
+        for column, old in zip(INDEXED_COLUMNS, old_values):
+            new = _index_value(job.get(column))
+            if old and old != new:
+                pipe.srem(_set_key(column, old), job_id)
+            if new:
+                pipe.sadd(_set_key(column, new), job_id)
+        pipe.zadd(CREATED_KEY, {job_id: _created_score(job.get("created_at"))})
+        mirror_job(pipe, job)
+
+    redis_conn.transaction(_apply, key)
+
+
+def sync_job(job: Dict[str, Any]):
+    """
+    Best-effort hook for the jobs blueprint, called after a commit.
+
+    If Redis cannot be updated the index is marked not ready, so list_jobs
+    falls back to Postgres until the next rebuild. When even that fails,
+    the TTL on READY_KEY bounds how long the stale index is served.
+    """
+    try:
+        with Redis() as r:
+            try:
+                index_job(r, job)
+            except Exception:
+                r.delete(READY_KEY)
+                raise
+    except Exception as e:
+        logger.error(f"Failed to index job {job.get('id')}: {e}")
+
+
+def sync_new_jobs(jobs: List[Dict[str, Any]], chunk_size: int = 1000):
+    """
+    sync_job for many freshly inserted jobs (e.g. a bulk import). New jobs
+    have no previous index values, so no WATCH is needed and a few
+    pipelines cover every job.
+    """
+    if not jobs:
+        return
+    try:
+        with Redis() as r:
+            try:
+                for start in range(0, len(jobs), chunk_size):
+                    pipe = r.pipeline(transaction=False)
+                    for job in jobs[start:start + chunk_size]:
+                        for column in INDEXED_COLUMNS:
+                            value = _index_value(job.get(column))
+                            if value:
+                                pipe.sadd(_set_key(column, value), job["id"])
+                        pipe.zadd(CREATED_KEY, {job["id"]: _created_score(job.get("created_at"))})
+                        mirror_job(pipe, job)
+                    pipe.execute()
+            except Exception:
+                r.delete(READY_KEY)
+                raise
+    except Exception as e:
+        logger.error(f"Failed to index {len(jobs)} new jobs: {e}")
+
+
+def _changed_at(job: Dict[str, Any]) -> Optional[datetime]:
+    stamps = [t for t in (_as_datetime(job.get("updated_at")), _as_datetime(job.get("created_at"))) if t]
+    return max(stamps) if stamps else None
+
+
+def _replay_changes(redis_conn, since: Optional[datetime]):
+    """
+    Re-index jobs written while a rebuild was running. updated_at is the
+    start of the writing transaction, so REPLAY_MARGIN_S also covers one
+    that started before the snapshot and committed after it.
+    """
+    with Postgres() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            if since is None:
+                cur.execute("SELECT * FROM jobs")
+            else:
+                cur.execute(
+                    """SELECT * FROM jobs
+                       WHERE GREATEST(updated_at, created_at) >= %s - make_interval(secs => %s)""",
+                    (since, REPLAY_MARGIN_S),
+                )
+            jobs = cur.fetchall()
+    for job in jobs:
+        index_job(redis_conn, job)
+
+
+def rebuild_job_indexes(redis_conn, jobs: List[Dict[str, Any]]):
+    """
+    Drop and rebuild every job index from a full list of jobs rows.
+    Called by clone_table once the jobs rows themselves are mirrored.
+
+    The new sets are built under temporary keys and swapped in with the
+    snapshot's rows in one MULTI, so the mirrored rows and the sets always
+    agree. A sync_job that landed before the swap is overwritten by the
+    older snapshot row; those jobs are re-read from Postgres and indexed
+    again (with the updated_at check) before READY_KEY is set.
+    """
+    redis_conn.delete(READY_KEY)
+    build = f"{INDEX_PREFIX}:build:{uuid.uuid4().hex}"
+    built = set()
+    pipe = redis_conn.pipeline(transaction=False)
+    for job in jobs:
+        for column in INDEXED_COLUMNS:
+            value = _index_value(job.get(column))
+            if value:
+                key = _set_key(column, value)
+                built.add(key)
+                pipe.sadd(f"{build}:{key}", job["id"])
+        pipe.zadd(f"{build}:{CREATED_KEY}", {job["id"]: _created_score(job.get("created_at"))})
+    pipe.execute()
+    if jobs:
+        built.add(CREATED_KEY)
+
+    try:
+        stale = [k for k in redis_conn.scan_iter(match=f"{INDEX_PREFIX}:*", count=1000)
+                 if k != REBUILD_LOCK and not k.startswith((f"{INDEX_PREFIX}:build:", f"{INDEX_PREFIX}:tmp:"))]
+        pipe = redis_conn.pipeline(transaction=True)
+        if stale:
+            pipe.delete(*stale)
+        for key in built:
+            pipe.rename(f"{build}:{key}", key)
+        for job in jobs:
+            mirror_job(pipe, job)
+        pipe.execute()
+    finally:
+        leftovers = list(redis_conn.scan_iter(match=f"{build}:*", count=1000))
+        if leftovers:
+            redis_conn.delete(*leftovers)
+
+    since = max(filter(None, map(_changed_at, jobs)), default=None)
+    _replay_changes(redis_conn, since)
+    redis_conn.set(READY_KEY, 1, ex=cache_settings.job_index_ttl)
+
+
+def refresh_job_indexes():
+    """
+    Rebuild the indexes straight from Postgres, at most one worker at a
+    time. Run in the background once READY_KEY has expired or was cleared.
+    """
+    try:
+        with Redis() as r:
+            if not r.set(REBUILD_LOCK, 1, nx=True, ex=300):
+                return
+            try:
+                with Postgres() as conn:
+                    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                        cur.execute("SELECT * FROM jobs")
+                        jobs = cur.fetchall()
+                rebuild_job_indexes(r, jobs)
+                logger.info(f"Rebuilt job indexes for {len(jobs)} jobs")
+            finally:
+                r.delete(REBUILD_LOCK)
+    except Exception as e:
+        logger.error(f"Job index rebuild failed: {e}")
+
+
+def query_jobs(filters: Dict[str, Optional[str]], limit: int, offset: int) -> Optional[List[Dict[str, Any]]]:
+    """
+    Answer a list_jobs filter from the Redis indexes, newest first.
+
+    Returns None when the indexes are not ready or Redis is unavailable,
+    in which case the caller should query Postgres instead.
+    """
+    keys = [_set_key(col, val) for col, val in filters.items() if val is not None]
+    stop = offset + limit - 1
+    try:
+        with Redis() as r:
+            if not r.exists(READY_KEY):
+                if not r.exists(REBUILD_LOCK):
+                    threading.Thread(target=refresh_job_indexes, name="job-index-rebuild", daemon=True).start()
+                return None
+            if keys:
+                tmp = f"{INDEX_PREFIX}:tmp:{uuid.uuid4().hex}"
+                pipe = r.pipeline()
+                # Sets count as score 1; weight 0 keeps the created_at score.
+                pipe.zinterstore(tmp, {CREATED_KEY: 1, **{k: 0 for k in keys}})
+                pipe.zrevrange(tmp, offset, stop)
+                pipe.delete(tmp)
+                _, ids, _ = pipe.execute()
+            else:
+                ids = r.zrevrange(CREATED_KEY, offset, stop)
+            if not ids:
+                return []
+            docs = r.mget([f"{_row_key(i)}:json" for i in ids])
+    except Exception as e:
+        logger.error(f"Job index query failed: {e}")
+        return None
+
+    if any(d is None for d in docs):
+        # Index points at a row that is not mirrored; let Postgres answer.
+        return None
+    return [_from_json(d) for d in docs]
@@ -0,0 +1,143 @@
+# database/latest_positions.py
+
+import json
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+from database.postgres import get_connection as Postgres
+from database.redisdb import get_client, to_redis_json
+from util.logit import get_logger
+
+logger = get_logger("logs", "Latest Positions")
+
+# geo:latest:<kind>     hash  id -> JSON of the newest location row
+# geo:latest:<kind>:ts  zset  id -> epoch seconds of that row
+KINDS = ("user", "job")
+_KEY_FIELD = {"user": "user_id", "job": "job_id"}
+
+# Only replace a position with a newer one, so late uploads of buffered
+# tracks never move a crew back in time.
+_UPSERT_IF_NEWER = """
+local current = redis.call('ZSCORE', KEYS[2], ARGV[1])
+if current and tonumber(current) >= tonumber(ARGV[2]) then
+    return 0
+end
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[3])
+redis.call('ZADD', KEYS[2], ARGV[2], ARGV[1])
+return 1
+"""
+_upsert_script = None
+
+
+def _keys(kind: str):
+    return f"geo:latest:{kind}", f"geo:latest:{kind}:ts"
+
+
+def _epoch(value) -> float:
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, str):
+        return datetime.fromisoformat(value).timestamp()
+    return float(value)
+
+
+def record_positions(rows: Iterable[Dict[str, Any]]):
+    """
+    Updates the latest position of every user and job seen in `rows`
+    (location rows with job_id, user_id, latitude, longitude, timestamp).
+    Best-effort: failures are logged, never raised to the ingestion path.
+    """
+    global _upsert_script
+    newest = {kind: {} for kind in KINDS}
+    for row in rows:
+        ts = _epoch(row["timestamp"])
+        for kind in KINDS:
+            ident = row.get(_KEY_FIELD[kind])
+            if ident is None:
+                continue
+            seen = newest[kind].get(ident)
+            if seen is None or ts > seen[0]:
+                newest[kind][ident] = (ts, row)
+    try:
+        client = get_client()
+        if _upsert_script is None:
+            _upsert_script = client.register_script(_UPSERT_IF_NEWER)
+        pipe = client.pipeline(transaction=False)
+        for kind, latest in newest.items():
+            hash_key, ts_key = _keys(kind)
+            for ident, (ts, row) in latest.items():
+                _upsert_script(keys=[hash_key, ts_key], args=[ident, ts, to_redis_json(row)], client=pipe)
+        pipe.execute()
+    except Exception as e:
+        logger.error(f"Failed to record latest positions: {e}")
+
+
+def get_latest(kind: str, ids: Optional[List[int]] = None, max_age_s: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    Current positions for the given ids, or for every user/job seen within
+    max_age_s seconds, or for all of them. One hash read, O(n) in the result.
+    """
+    hash_key, ts_key = _keys(kind)
+    client = get_client()
+    if ids is None and max_age_s is not None:
+        ids = client.zrangebyscore(ts_key, time.time() - max_age_s, "+inf")
+    if ids is None:
+        docs = client.hvals(hash_key)
+    elif ids:
+        docs = client.hmget(hash_key, ids)
+    else:
+        docs = []
+    return [json.loads(d) for d in docs if d is not None]
+
+
+def _load_latest(cur, where: str = "", params=()) -> int:
+    count = 0
+    for kind in KINDS:
+        column = _KEY_FIELD[kind]
+        cur.execute(
+            f"""SELECT DISTINCT ON ({column}) id, job_id, user_id, latitude, longitude, timestamp
+                FROM locations
+                WHERE {column} IS NOT NULL {where}
+                ORDER BY {column}, timestamp DESC
+            """,
+            params,
+        )
+        cols = [d[0] for d in cur.description]
+        rows = [dict(zip(cols, r)) for r in cur.fetchall()]
+        record_positions(rows)
+        count += len(rows)
+    return count
+
+
+def location_watermark() -> int:
+    """
+    Highest locations id so far; points after it are not in a snapshot
+    of the indexes taken now.
+    """
+    with Postgres() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT COALESCE(MAX(id), 0) FROM locations")
+            return cur.fetchone()[0]
+
+
+def catch_up_latest_positions(after_id: int) -> int:
+    """
+    Applies the locations stored after `after_id` to restored indexes.
+    Older positions already in Redis are kept by the newer-only upsert,
+    so late uploads of old points cannot move anyone back in time.
+    """
+    with Postgres() as conn:
+        with conn.cursor() as cur:
+            return _load_latest(cur, "AND id > %s", (after_id,))
+
+
+def rebuild_latest_positions():
+    """
+    Reloads both indexes from Postgres, e.g. after Redis lost its data.
+    """
+    client = get_client()
+    for kind in KINDS:
+        client.delete(*_keys(kind))
+    with Postgres() as conn:
+        with conn.cursor() as cur:
+            _load_latest(cur)
@@ -1,26 +1,18 @@
 from datetime import datetime, timezone
 from database.firebase import get_connection
 
-def insert_location(job_id, latitude, longitude, user_id=None, timestamp=None):
-    """
-    Inserts a location record into Firestore (locations collection).
+# Firestore rejects write batches with more than 500 operations
+FIRESTORE_BATCH_LIMIT = 500
 
-    Args:
-        job_id (int): Required job ID.
-        latitude (float): Required latitude.
-        longitude (float): Required longitude.
-        user_id (int or None): Optional user ID.
-        timestamp (datetime or None): Optional timestamp (UTC). If None, set to now.
-    Returns:
-        dict: Inserted document fields.
-    """
+
+def _location_doc(job_id, latitude, longitude, user_id=None, timestamp=None):
     if job_id is None or latitude is None or longitude is None:
         raise ValueError("job_id, latitude, and longitude are required.")
 
     if timestamp is None:
         timestamp = datetime.now(timezone.utc)
 
-    doc = {
+    return {
         "job_id": job_id,
         "user_id": user_id,
         "latitude": latitude,
@@ -28,6 +20,50 @@ def insert_location(job_id, latitude, longitude, user_id=None, timestamp=None):
         "timestamp": timestamp.isoformat()
     }
 
+
+def insert_location(job_id, latitude, longitude, user_id=None, timestamp=None):
+    """
+    Inserts a location record into Firestore (locations collection).
+
+    Args:
+        job_id (int): Required job ID.
+        latitude (float): Required latitude.
+        longitude (float): Required longitude.
+        user_id (int or None): Optional user ID.
+        timestamp (datetime or None): Optional timestamp (UTC). If None, set to now.
+    Returns:
+        dict: Inserted document fields.
+    """
+    doc = _location_doc(job_id, latitude, longitude, user_id, timestamp)
+
     with get_connection() as db:
         db.collection("locations").add(doc)
     return doc
+
+
+def insert_locations(points, batch_size=FIRESTORE_BATCH_LIMIT):
+    """
+    Inserts many location records into Firestore using write batches,
+    committing one batch per `batch_size` points.
+
+    Args:
+        points (list[dict]): Each with job_id, latitude, longitude and
+            optional user_id and timestamp, as for insert_location.
+        batch_size (int): Writes per commit, capped at the Firestore limit.
+    Returns:
+        list[dict]: Inserted document fields, in input order.
+    """
+    batch_size = max(1, min(batch_size, FIRESTORE_BATCH_LIMIT))
+    docs = [
+        _location_doc(p["job_id"], p["latitude"], p["longitude"], p.get("user_id"), p.get("timestamp"))
+        for p in points
+    ]
+
+    with get_connection() as db:
+        collection = db.collection("locations")
+        for start in range(0, len(docs), batch_size):
+            batch = db.batch()
+            for doc in docs[start:start + batch_size]:
+                batch.set(collection.document(), doc)
+            batch.commit()
+    return docs
@@ -0,0 +1,321 @@
+# database/location_partitions.py
+
+import argparse
+import re
+import threading
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+import numpy as np
+from psycopg2 import errors, sql
+from psycopg2.extras import execute_values
+from config.settings import LocationRetentionSettings
+from database.postgres import get_connection
+from util.geo import simplify_track
+from util.logit import get_logger
+from util.polyline import decode_polyline, encode_polyline
+
+logger = get_logger("logs", "Location Partitions")
+
+# Monthly partitions of locations, see database/SQL/locations_partitioning.sql
+PARTITION_NAME = re.compile(r"^locations_y(\d{4})m(\d{2})$")
+ROLLUP_FETCH_SIZE = 50000
+
+_retention = LocationRetentionSettings()
+
+# Months this process already made sure exist
+_known_months = set()
+_known_lock = threading.Lock()
+# Whether locations_partitioning.sql has been applied, checked once per process
+_partitioned = None
+
+
+def _add_months(month: date, n: int) -> date:
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _as_datetime(value) -> datetime:
+    if value is None:
+        return datetime.now(timezone.utc)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _month_of(value) -> date:
+    value = _as_datetime(value)
+    return date(value.year, value.month, 1)
+
+
+def _oldest_month() -> date:
+    return _add_months(_month_of(None), -_retention.raw_months)
+
+
+def partitioning_enabled() -> bool:
+    """
+    True once database/SQL/locations_partitioning.sql has been applied.
+    Without it locations is a plain table and every partition helper
+    here is a no-op, so ingestion keeps working.
+    """
+    global _partitioned
+    if _partitioned is None:
+        with get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT to_regproc('ensure_location_partition') IS NOT NULL")
+                enabled = cur.fetchone()[0]
+            conn.commit()
+        if not enabled:
+            logger.warning("locations is not partitioned, run database/SQL/locations_partitioning.sql")
+        _partitioned = enabled
+    return _partitioned
+
+
+def timestamp_error(value) -> Optional[str]:
+    """
+    Why a point with this timestamp cannot be stored, or None. Only the
+    raw retention window is accepted: older points would recreate a
+    dropped partition, far-future ones would create partitions on demand.
+    """
+    ts = _as_datetime(value)
+    now = datetime.now(timezone.utc)
+    oldest = _oldest_month()
+    if ts < datetime(oldest.year, oldest.month, 1, tzinfo=timezone.utc):
+        return f"timestamp before {oldest.isoformat()} is past retention"
+    if (ts - now).total_seconds() > _retention.future_skew_s:
+        return "timestamp is in the future"
+    return None
+
+
+def ensure_partitions(months: Iterable[date] = (), months_ahead: int = None) -> List[str]:
+    """
+    Creates the partitions for the given months and for the current month
+    plus `months_ahead` (LOCATIONS_MONTHS_AHEAD), skipping existing ones.
+    Returns the partition names (none when locations is not partitioned).
+    """
+    if not partitioning_enabled():
+        return []
+    if months_ahead is None:
+        months_ahead = _retention.months_ahead
+    current = _month_of(None)
+    wanted = set(months) | {_add_months(current, i) for i in range(months_ahead + 1)}
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            names = []
+            for month in sorted(wanted):
+                cur.execute("SELECT ensure_location_partition(%s)", (month,))
+                names.append(cur.fetchone()[0])
+            conn.commit()
+    with _known_lock:
+        _known_months.update(wanted)
+    return names
+
+
+def ensure_partitions_for(timestamps: Iterable[Any]):
+    """
+    Makes sure every month touched by `timestamps` (datetimes, ISO strings
+    or None for now) has a partition before rows are inserted. Neighbouring
+    months are included so the database time zone cannot push a point
+    near a month boundary into a missing partition, except the month
+    before the retention window, which apply_retention would drop again.
+    Cached per process.
+    """
+    if not partitioning_enabled():
+        return
+    months = set()
+    for ts in timestamps:
+        month = _month_of(ts)
+        months.update((_add_months(month, -1), month, _add_months(month, 1)))
+    oldest = _oldest_month()
+    months = {m for m in months if m >= oldest}
+    with _known_lock:
+        missing = months - _known_months
+    if missing:
+        ensure_partitions(missing, months_ahead=0)
+
+
+def forget_partitions():
+    """
+    Clears the per-process cache, e.g. after another worker's retention
+    run dropped a partition this process still believed in.
+    """
+    with _known_lock:
+        _known_months.clear()
+
+
+def is_missing_partition(error: Exception) -> bool:
+    return isinstance(error, errors.CheckViolation) and "no partition" in str(error)
+
+
+def list_partitions(cur) -> List[Dict[str, Any]]:
+    """
+    Partitions of locations with the month each one holds, oldest first.
+    """
+    cur.execute(
+        """SELECT c.relname
+           FROM pg_inherits i
+           JOIN pg_class c ON c.oid = i.inhrelid
+           WHERE i.inhparent = 'locations'::regclass
+        """
+    )
+    partitions = []
+    for (name,) in cur.fetchall():
+        match = PARTITION_NAME.match(name)
+        if match:
+            partitions.append({"name": name, "month": date(int(match[1]), int(match[2]), 1)})
+    return sorted(partitions, key=lambda p: p["month"])
+
+
+def _track_rows(conn, partition: str):
+    """
+    Streams (job_id, user_id, latitude, longitude, timestamp) of one
+    partition with a server-side cursor, grouped by job and user.
+    """
+    with conn.cursor(name=f"rollup_{partition}") as cur:
+        cur.itersize = ROLLUP_FETCH_SIZE
+        cur.execute(
+            sql.SQL(
+                """SELECT job_id, user_id, latitude, longitude, timestamp
+                   FROM {}
+                   ORDER BY job_id, user_id NULLS FIRST, timestamp"""
+            ).format(sql.Identifier(partition))
+        )
+        group, rows = None, []
+        for job_id, user_id, lat, lon, ts in cur:
+            if (job_id, user_id) != group:
+                if rows:
+                    yield group, rows
+                group, rows = (job_id, user_id), []
+            rows.append((float(lat), float(lon), ts))
+        if rows:
+            yield group, rows
+
+
+def rollup_partition(conn, partition: str, month: date, tolerance_m: float) -> int:
+    """
+    Rolls the partition up into one simplified, polyline-encoded track per
+    (job_id, user_id) in location_tracks. A track already stored for the
+    month (the partition was recreated after an earlier rollup) is merged
+    with the new points, never replaced.
+    Runs inside the caller's transaction. Returns the number of tracks.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            """SELECT job_id, user_id, id, started_at, ended_at, points_in, polyline
+               FROM location_tracks WHERE month = %s
+               FOR UPDATE""",
+            (month,),
+        )
+        existing = {(r[0], r[1]): r[2:] for r in cur.fetchall()}
+
+    inserts, updates = [], []
+    for (job_id, user_id), rows in _track_rows(conn, partition):
+        lat = np.fromiter((r[0] for r in rows), dtype=float, count=len(rows))
+        lon = np.fromiter((r[1] for r in rows), dtype=float, count=len(rows))
+        started_at, ended_at, points_in = rows[0][2], rows[-1][2], len(rows)
+        previous = existing.get((job_id, user_id))
+        if previous is not None:
+            track_id, prev_start, prev_end, prev_in, polyline = previous
+            old = np.array(decode_polyline(polyline), dtype=float).reshape(-1, 2)
+            # Tracks do not overlap in practice; keep them in time order
+            if prev_start <= started_at:
+                lat, lon = np.concatenate((old[:, 0], lat)), np.concatenate((old[:, 1], lon))
+            else:
+                lat, lon = np.concatenate((lat, old[:, 0])), np.concatenate((lon, old[:, 1]))
+            started_at, ended_at = min(started_at, prev_start), max(ended_at, prev_end)
+            points_in += prev_in
+        keep = simplify_track(lat, lon, tolerance_m)
+        track = (started_at, ended_at, points_in, len(keep), tolerance_m, encode_polyline(lat[keep], lon[keep]))
+        if previous is not None:
+            updates.append((previous[0], *track))
+        else:
+            inserts.append((job_id, user_id, month, *track))
+
+    with conn.cursor() as cur:
+        execute_values(
+            cur,
+            """INSERT INTO location_tracks
+                   (job_id, user_id, month, started_at, ended_at,
+                    points_in, points_out, tolerance_m, polyline)
+               VALUES %s
+            """,
+            inserts,
+            page_size=1000,
+        )
+        execute_values(
+            cur,
+            """UPDATE location_tracks t
+               SET started_at = v.started_at, ended_at = v.ended_at, points_in = v.points_in,
+                   points_out = v.points_out, tolerance_m = v.tolerance_m, polyline = v.polyline
+               FROM (VALUES %s) AS v (id, started_at, ended_at, points_in, points_out, tolerance_m, polyline)
+               WHERE t.id = v.id
+            """,
+            updates,
+            template="(%s::bigint, %s::timestamptz, %s::timestamptz, %s::int, %s::int, %s::real, %s::text)",
+            page_size=1000,
+        )
+    return len(inserts) + len(updates)
+
+
+def drop_partition(cur, partition: str):
+    cur.execute(
+        sql.SQL("ALTER TABLE locations DETACH PARTITION {}").format(sql.Identifier(partition))
+    )
+    cur.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(partition)))
+
+
+def apply_retention(raw_months: int = None, tolerance_m: float = None, dry_run: bool = False) -> List[Dict[str, Any]]:
+    """
+    Rolls every partition older than `raw_months` full months up into
+    location_tracks and drops it, one transaction per partition, so a
+    failure leaves that month's raw points in place.
+    """
+    if not partitioning_enabled():
+        return []
+    raw_months = _retention.raw_months if raw_months is None else raw_months
+    tolerance_m = _retention.rollup_tolerance_m if tolerance_m is None else tolerance_m
+    cutoff = _add_months(_month_of(None), -raw_months)
+
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            expired = [p for p in list_partitions(cur) if p["month"] < cutoff]
+        conn.commit()
+
+        results = []
+        for partition in expired:
+            result = {"partition": partition["name"], "month": partition["month"].isoformat()}
+            if dry_run:
+                results.append(result)
+                continue
+            try:
+                result["tracks"] = rollup_partition(conn, partition["name"], partition["month"], tolerance_m)
+                with conn.cursor() as cur:
+                    drop_partition(cur, partition["name"])
+                conn.commit()
+                logger.info(f"Rolled up {partition['name']} into {result['tracks']} tracks and dropped it")
+            except Exception as e:
+                conn.rollback()
+                result["error"] = str(e)
+                logger.error(f"Retention of {partition['name']} failed: {e}")
+            results.append(result)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage monthly locations partitions.")
+    parser.add_argument("command", choices=["ensure", "retention"])
+    parser.add_argument("--months-ahead", type=int, default=None,
+                        help="Future partitions to create (default LOCATIONS_MONTHS_AHEAD)")
+    parser.add_argument("--raw-months", type=int, default=None,
+                        help="Months of raw points to keep (default LOCATIONS_RAW_MONTHS)")
+    parser.add_argument("--tolerance", type=float, default=None,
+                        help="Rollup simplification tolerance in meters")
+    parser.add_argument("--dry-run", action="store_true", help="List expired partitions only")
+    args = parser.parse_args()
+
+    if args.command == "ensure":
+        for name in ensure_partitions(months_ahead=args.months_ahead):
+            print(name)
+    else:
+        for r in apply_retention(args.raw_months, args.tolerance, dry_run=args.dry_run):
+            status = r.get("error") or (f"{r['tracks']} tracks" if "tracks" in r else "expired")
+            print(f"{r['partition']} ({r['month']}): {status}")
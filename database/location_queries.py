@@ -0,0 +1,245 @@
+# database/location_queries.py
+
+from typing import Any, Dict, List, Optional, Set, Tuple
+import numpy as np
+from psycopg2.extras import RealDictCursor, execute_values
+from database.postgres import get_connection
+from database.pg_listener import publish
+from database.latest_positions import record_positions
+from database.location_partitions import (
+    ensure_partitions_for,
+    forget_partitions,
+    is_missing_partition,
+    partitioning_enabled,
+    timestamp_error,
+)
+from util.geo import cell_ranges_within, haversine_m
+from util.geofence import evaluate_points
+from util.position_stream import POSITIONS_CHANNEL
+
+LOCATION_COLUMNS = "id, job_id, user_id, latitude, longitude, timestamp"
+# Above this many grid cells, find_jobs_nearby scans cell ranges instead
+MAX_NEARBY_CELLS = 400
+
+
+def find_existing_refs(cur, job_ids, user_ids) -> Tuple[Set[int], Set[int]]:
+    """
+    Returns which of the given job and user ids exist, one query per table
+    no matter how many points reference them.
+    """
+    jobs, users = set(), set()
+    if job_ids:
+        cur.execute("SELECT id FROM jobs WHERE id = ANY(%s)", (list(job_ids),))
+        jobs = {r["id"] for r in cur.fetchall()}
+    if user_ids:
+        cur.execute("SELECT id FROM users WHERE id = ANY(%s)", (list(user_ids),))
+        users = {r["id"] for r in cur.fetchall()}
+    return jobs, users
+
+
+def reference_error(job_id: int, user_id: Optional[int] = None) -> Optional[str]:
+    """
+    The error insert_locations would report for a point of this job and
+    user, or None when both exist. Lets a queued write be checked up front.
+    """
+    with get_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            jobs, users = find_existing_refs(cur, {job_id}, {user_id} if user_id is not None else set())
+    if job_id not in jobs:
+        return "Invalid job_id"
+    if user_id is not None and user_id not in users:
+        return "Invalid user_id"
+    return None
+
+
+def insert_locations(points: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Validates and inserts many location points in one transaction.
+
+    Each point is a dict with job_id, latitude, longitude and optional
+    user_id and timestamp (NOW() when missing). Points referencing an unknown
+    job or user, or (once locations is partitioned) timestamped outside
+    the raw retention window, are skipped rather than failing the whole
+    batch.
+
+    Returns one result per input point, in order: either
+    {"index": i, "location": inserted row} or {"index": i, "error": message}.
+    """
+    if not points:
+        return []
+
+    results = [{"index": i} for i in range(len(points))]
+    partitioned = partitioning_enabled()
+    in_window = []
+    for i, p in enumerate(points):
+        error = timestamp_error(p.get("timestamp")) if partitioned else None
+        if error:
+            results[i]["error"] = error
+        else:
+            in_window.append(i)
+    if not in_window:
+        return results
+
+    ensure_partitions_for(points[i].get("timestamp") for i in in_window)
+    try:
+        rows = _insert_points(points, in_window, results)
+    except Exception as e:
+        if not (partitioned and is_missing_partition(e)):
+            raise
+        # Another worker dropped a partition this process had cached
+        forget_partitions()
+        ensure_partitions_for(points[i].get("timestamp") for i in in_window)
+        rows = _insert_points(points, in_window, results)
+
+    record_positions(rows)
+    evaluate_points(rows)
+    return results
+
+
+def _insert_points(points: List[Dict[str, Any]], candidates: List[int],
+                   results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    with get_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            valid_jobs, valid_users = find_existing_refs(
+                cur,
+                {points[i]["job_id"] for i in candidates},
+                {points[i]["user_id"] for i in candidates if points[i].get("user_id") is not None},
+            )
+
+            accepted = []
+            for i in candidates:
+                p = points[i]
+                if p["job_id"] not in valid_jobs:
+                    results[i]["error"] = "Invalid job_id"
+                elif p.get("user_id") is not None and p["user_id"] not in valid_users:
+                    results[i]["error"] = "Invalid user_id"
+                else:
+                    accepted.append(i)
+
+            rows = []
+            if accepted:
+                # Ids are drawn up front so each returned row can be matched
+                # to its input point by ord; RETURNING order is not guaranteed
+                rows = execute_values(
+                    cur,
+                    f"""WITH v (ord, job_id, user_id, latitude, longitude, timestamp) AS (VALUES %s),
+                             numbered AS (SELECT v.*, nextval('locations_id_seq') AS id FROM v),
+                             inserted AS (
+                                 INSERT INTO locations (id, job_id, user_id, latitude, longitude, timestamp)
+                                 SELECT id, job_id, user_id, latitude, longitude, timestamp FROM numbered
+                                 RETURNING {LOCATION_COLUMNS}
+                             )
+                        SELECT n.ord, i.* FROM inserted i JOIN numbered n USING (id)
+                    """,
+                    [
+                        (i, points[i]["job_id"], points[i].get("user_id"),
+                         points[i]["latitude"], points[i]["longitude"], points[i].get("timestamp"))
+                        for i in accepted
+                    ],
+                    template="(%s::int, %s::int, %s::int, %s::double precision, %s::double precision, "
+                             "COALESCE(%s::timestamptz, NOW()))",
+                    page_size=1000,
+                    fetch=True,
+                )
+                for row in rows:
+                    results[row.pop("ord")]["location"] = row
+                # Delivered to the live position streams on commit
+                publish(cur, POSITIONS_CHANNEL, rows)
+            conn.commit()
+    return rows
+
+
+def get_latest_user_location(user_id: int):
+    with get_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(
+                f"""SELECT {LOCATION_COLUMNS} FROM locations
+                    WHERE user_id = %s
+                    ORDER BY timestamp DESC
+                    LIMIT 1
+                """,
+                (user_id,),
+            )
+            return cur.fetchone()
+
+
+def find_jobs_nearby(latitude: float, longitude: float, radius_m: float,
+                     statuses=("open", "in_progress"), limit: int = 50) -> List[Dict[str, Any]]:
+    """
+    Jobs within radius_m of a point, nearest first.
+
+    The geo_cell B-tree index prunes candidates to the few grid cells
+    around the point; an exact haversine check then filters the short list.
+    """
+    ranges = cell_ranges_within(latitude, longitude, radius_m)
+    with get_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            if sum(hi - lo + 1 for lo, hi in ranges) <= MAX_NEARBY_CELLS:
+                cur.execute(
+                    """SELECT id, title, status, priority, location, latitude, longitude, team_id, assignee_id
+                       FROM jobs
+                       WHERE geo_cell = ANY(%s) AND status = ANY(%s)
+                    """,
+                    ([c for lo, hi in ranges for c in range(lo, hi + 1)], list(statuses)),
+                )
+            else:
+                # Wide radius: one index range scan per latitude row of cells
+                cur.execute(
+                    """SELECT j.id, j.title, j.status, j.priority, j.location, j.latitude, j.longitude,
+                              j.team_id, j.assignee_id
+                       FROM unnest(%s::bigint[], %s::bigint[]) AS r(lo, hi)
+                       JOIN jobs j ON j.geo_cell BETWEEN r.lo AND r.hi
+                       WHERE j.status = ANY(%s)
+                    """,
+                    ([lo for lo, _ in ranges], [hi for _, hi in ranges], list(statuses)),
+                )
+            candidates = cur.fetchall()
+    if not candidates:
+        return []
+
+    distances = haversine_m(
+        latitude, longitude,
+        np.array([float(c["latitude"]) for c in candidates]),
+        np.array([float(c["longitude"]) for c in candidates]),
+    )
+    nearby = []
+    for i in np.argsort(distances):
+        if distances[i] > radius_m or len(nearby) >= limit:
+            break
+        nearby.append({**candidates[i], "distance_m": round(float(distances[i]), 1)})
+    return nearby
+
+
+def get_track(job_id=None, user_id=None, start=None, end=None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    All points of a job's or user's track in time order, as NumPy arrays
+    (latitude, longitude, epoch seconds) rather than one dict per row.
+    """
+    where, params = [], []
+    if job_id:
+        where.append("job_id = %s")
+        params.append(job_id)
+    if user_id:
+        where.append("user_id = %s")
+        params.append(user_id)
+    if start:
+        where.append("timestamp >= %s")
+        params.append(start)
+    if end:
+        where.append("timestamp <= %s")
+        params.append(end)
+    where_clause = "WHERE " + " AND ".join(where) if where else ""
+
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                f"""SELECT latitude, longitude, EXTRACT(EPOCH FROM timestamp)
+                    FROM locations
+                    {where_clause}
+                    ORDER BY timestamp
+                """,
+                params,
+            )
+            rows = cur.fetchall()
+    data = np.array(rows, dtype=float).reshape(-1, 3)
+    return data[:, 0], data[:, 1], data[:, 2]
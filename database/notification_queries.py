@@ -0,0 +1,239 @@
+# database/notification_queries.py
+
+from typing import Any, Dict, List
+from psycopg2.extras import Json
+from config.settings import NotificationSettings
+
+notification_settings = NotificationSettings()
+
+# Workers LISTEN here to pick up new outbox rows without waiting for the poll
+OUTBOX_CHANNEL = "notification_outbox"
+
+
+def enqueue_notification(cur, user_id, job_id, message: str, kind: str = "general"):
+    """
+    Records a notification intent on the caller's cursor, so it commits or
+    rolls back together with the change that caused it. Delivery happens
+    later in util/notification_dispatcher.py.
+    """
+    cur.execute(
+        """INSERT INTO notification_outbox (user_id, job_id, message, kind)
+           VALUES (%s, %s, %s, %s)
+        """,
+        (user_id, job_id, message, kind),
+    )
+    cur.execute("SELECT pg_notify(%s, '')", (OUTBOX_CHANNEL,))
+
+
+def enqueue_team_notification(cur, team_id, job_id, message: str, exclude_user_id=None,
+                              dedup: bool = True, kind: str = "general"):
+    """
+    Like enqueue_notification, for every member of `team_id` (see
+    notify_team). `exclude_user_id`, usually the user who made the change,
+    is stored in user_id and skipped at delivery.
+    """
+    cur.execute(
+        """INSERT INTO notification_outbox (team_id, user_id, job_id, message, dedup, kind)
+           VALUES (%s, %s, %s, %s, %s, %s)
+        """,
+        (team_id, exclude_user_id, job_id, message, dedup, kind),
+    )
+    cur.execute("SELECT pg_notify(%s, '')", (OUTBOX_CHANNEL,))
+
+
+def _lock_jobs(cur, job_ids):
+    # Same per-job lock for every writer, taken in id order to avoid deadlocks
+    job_ids = sorted({j for j in job_ids if j is not None})
+    if job_ids:
+        cur.execute(
+            """SELECT pg_advisory_xact_lock(hashtext('notify_job'), j)
+               FROM (SELECT unnest(%s::int[]) AS j ORDER BY 1) ids
+            """,
+            (job_ids,),
+        )
+
+
+def notify_team(cur, team_id, job_id, message: str, exclude_user_id=None, dedup: bool = True,
+                kind: str = "general", window_s: float = None) -> List[int]:
+    """
+    Inserts one unread notification per member of `team_id` with a single
+    INSERT ... SELECT from team_members, however large the team.
+
+    Members with an unread notification of the same job and kind updated
+    within the coalescing window get that row updated instead (see
+    upsert_notifications). With `dedup`, members who still have an older
+    unread notification for the job are skipped. A transaction-level
+    advisory lock per job keeps concurrent writers from both passing
+    these checks. Returns the ids of the users given a new row.
+    """
+    window_s = notification_settings.coalesce_window_s if window_s is None else window_s
+    if dedup or window_s > 0:
+        _lock_jobs(cur, [job_id])
+    cur.execute(
+        """WITH members AS (
+               SELECT user_id FROM team_members
+               WHERE team_id = %(team_id)s AND user_id IS DISTINCT FROM %(exclude)s
+           ),
+           merged AS (
+               UPDATE notifications n
+               SET message = %(message)s, update_count = n.update_count + 1, updated_at = NOW()
+               FROM members m
+               WHERE %(window)s > 0
+                 AND n.user_id = m.user_id
+                 AND n.job_id = %(job_id)s
+                 AND n.kind = %(kind)s
+                 AND n.status = 'unread'
+                 AND n.updated_at >= NOW() - make_interval(secs => %(window)s)
+               RETURNING n.user_id
+           )
+           INSERT INTO notifications (user_id, job_id, kind, message, status, created_at, updated_at)
+           SELECT m.user_id, %(job_id)s, %(kind)s, %(message)s, 'unread', NOW(), NOW()
+           FROM members m
+           WHERE NOT EXISTS (SELECT 1 FROM merged WHERE merged.user_id = m.user_id)
+             AND NOT (%(dedup)s AND EXISTS (
+                 SELECT 1 FROM notifications n
+                 WHERE n.user_id = m.user_id
+                   AND n.job_id = %(job_id)s
+                   AND n.status = 'unread'
+             ))
+           RETURNING user_id
+        """,
+        {"team_id": team_id, "job_id": job_id, "message": message, "kind": kind,
+         "exclude": exclude_user_id, "dedup": dedup, "window": float(window_s)},
+    )
+    return [r["user_id"] if isinstance(r, dict) else r[0] for r in cur.fetchall()]
+
+
+def upsert_notifications(cur, rows: List[Dict[str, Any]], window_s: float = None) -> List[int]:
+    """
+    Inserts unread notifications (dicts with user_id, job_id, message and
+    optionally kind), coalescing: when the user has an unread notification
+    of the same job and kind updated within `window_s` seconds
+    (NOTIFY_COALESCE_WINDOW_SECONDS, 0 disables), that row takes the new
+    message and timestamp and its update_count grows instead. Notifications
+    without a job are never merged.
+
+    One statement per call. Returns the user id of every inserted row, so
+    callers only count genuinely new notifications as unread.
+    """
+    window_s = notification_settings.coalesce_window_s if window_s is None else window_s
+    if window_s > 0:
+        # Repeats within the batch collapse before they reach the table
+        batch: Dict[Any, Dict[str, Any]] = {}
+        for i, r in enumerate(rows):
+            kind = r.get("kind") or "general"
+            # Rows without a job are never merged, so each keeps its own key
+            key = (r["user_id"], r["job_id"], kind) if r["job_id"] is not None else i
+            n = batch[key]["n"] + 1 if key in batch else 1
+            batch[key] = {"user_id": r["user_id"], "job_id": r["job_id"], "kind": kind,
+                          "message": r["message"], "n": n}
+        items = list(batch.values())
+        _lock_jobs(cur, [r["job_id"] for r in items])
+    else:
+        items = [{"user_id": r["user_id"], "job_id": r["job_id"], "kind": r.get("kind") or "general",
+                  "message": r["message"], "n": 1} for r in rows]
+
+    cur.execute(
+        """WITH incoming AS (
+               SELECT * FROM json_to_recordset(%(rows)s::json)
+                   AS i(user_id INTEGER, job_id INTEGER, kind TEXT, message TEXT, n INTEGER)
+           ),
+           merged AS (
+               UPDATE notifications t
+               SET message = i.message, update_count = t.update_count + i.n, updated_at = NOW()
+               FROM incoming i
+               WHERE %(window)s > 0
+                 AND t.user_id = i.user_id
+                 AND t.job_id = i.job_id
+                 AND t.kind = i.kind
+                 AND t.status = 'unread'
+                 AND t.updated_at >= NOW() - make_interval(secs => %(window)s)
+               RETURNING t.user_id, t.job_id, t.kind
+           )
+           INSERT INTO notifications (user_id, job_id, kind, message, update_count, status, created_at, updated_at)
+           SELECT i.user_id, i.job_id, i.kind, i.message, i.n, 'unread', NOW(), NOW()
+           FROM incoming i
+           WHERE NOT EXISTS (
+               SELECT 1 FROM merged m
+               WHERE m.user_id = i.user_id AND m.job_id = i.job_id AND m.kind = i.kind
+           )
+           RETURNING user_id
+        """,
+        {"rows": Json(items), "window": float(window_s)},
+    )
+    return [r["user_id"] if isinstance(r, dict) else r[0] for r in cur.fetchall()]
+
+
+def claim_outbox(cur, limit: int) -> List[Dict[str, Any]]:
+    """
+    Locks up to `limit` due outbox rows. SKIP LOCKED lets several workers
+    claim disjoint batches without waiting on each other.
+    """
+    cur.execute(
+        """SELECT id, user_id, team_id, job_id, kind, message, dedup, attempts
+           FROM notification_outbox
+           WHERE status = 'pending' AND available_at <= NOW()
+           ORDER BY available_at, id
+           LIMIT %s
+           FOR UPDATE SKIP LOCKED
+        """,
+        (limit,),
+    )
+    return cur.fetchall()
+
+
+def claim_outbox_ids(cur, ids: List[int]) -> List[Dict[str, Any]]:
+    """
+    Re-locks specific outbox rows, e.g. after a failed batch was rolled back.
+    """
+    cur.execute(
+        """SELECT id, user_id, team_id, job_id, kind, message, dedup, attempts
+           FROM notification_outbox
+           WHERE id = ANY(%s) AND status = 'pending'
+           FOR UPDATE SKIP LOCKED
+        """,
+        (ids,),
+    )
+    return cur.fetchall()
+
+
+def deliver_outbox(cur, rows: List[Dict[str, Any]]) -> List[int]:
+    """
+    Delivers claimed outbox rows: user intents with one upsert_notifications,
+    team intents with one notify_team each. Returns the user id of every
+    notification created (not of the ones coalesced into an existing row).
+
+    Every job lock of the batch is taken up front, in id order: taken by
+    each upsert and team in turn, two workers with overlapping batches
+    could lock the same jobs in opposite orders and deadlock. The later
+    calls re-take locks this transaction already holds, which never waits.
+    """
+    _lock_jobs(cur, [r["job_id"] for r in rows])
+    direct = [r for r in rows if r["team_id"] is None]
+    notified = upsert_notifications(cur, direct) if direct else []
+    for r in rows:
+        if r["team_id"] is not None:
+            notified += notify_team(cur, r["team_id"], r["job_id"], r["message"],
+                                    exclude_user_id=r["user_id"], dedup=r["dedup"], kind=r["kind"])
+    return notified
+
+
+def delete_outbox(cur, ids: List[int]):
+    cur.execute("DELETE FROM notification_outbox WHERE id = ANY(%s)", (ids,))
+
+
+def reschedule_outbox(cur, ids: List[int], error: str, max_attempts: int, retry_base_s: float):
+    """
+    Backs off failed rows exponentially; after max_attempts they are parked
+    as 'failed' for inspection instead of being retried forever.
+    """
+    cur.execute(
+        """UPDATE notification_outbox
+           SET attempts = attempts + 1,
+               last_error = %s,
+               available_at = NOW() + make_interval(secs => %s * power(2, attempts)),
+               status = CASE WHEN attempts + 1 >= %s THEN 'failed' ELSE 'pending' END
+           WHERE id = ANY(%s)
+        """,
+        (error[:1000], retry_base_s, max_attempts, ids),
+    )
@@ -0,0 +1,109 @@
+# database/pg_listener.py
+
+import json
+import select
+import threading
+import time
+from collections import defaultdict
+from decimal import Decimal
+from typing import Any, Callable, Dict, List
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+from database.postgres import get_connection
+from util.logit import get_logger
+
+logger = get_logger("logs", "PG Listener")
+
+# Postgres rejects NOTIFY payloads of 8000 bytes or more
+MAX_PAYLOAD_BYTES = 7900
+POLL_TIMEOUT = 5.0
+MAX_BACKOFF = 30.0
+
+
+def _json_default(obj):
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    return str(obj)
+
+
+def publish(cur, channel: str, items: List[Dict[str, Any]]):
+    """
+    Sends `items` as JSON arrays on `channel` with pg_notify, split so each
+    payload stays under the NOTIFY size limit. Runs on the caller's cursor,
+    so listeners only see the items once that transaction commits.
+    """
+    chunk, size = [], 2
+    for item in items:
+        encoded = json.dumps(item, default=_json_default, separators=(",", ":"))
+        if chunk and size + len(encoded) + 1 > MAX_PAYLOAD_BYTES:
+            cur.execute("SELECT pg_notify(%s, %s)", (channel, "[" + ",".join(chunk) + "]"))
+            chunk, size = [], 2
+        chunk.append(encoded)
+        size += len(encoded) + 1
+    if chunk:
+        cur.execute("SELECT pg_notify(%s, %s)", (channel, "[" + ",".join(chunk) + "]"))
+
+
+class PgListener:
+    """
+    One dedicated connection per process that LISTENs on every channel
+    somebody subscribed to and calls the handlers from a single daemon
+    thread. Reconnects with backoff; notifications sent while the
+    connection was down are lost, as with any LISTEN.
+    """
+
+    def __init__(self):
+        self._handlers = defaultdict(list)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def subscribe(self, channel: str, handler: Callable[[str], None]):
+        with self._lock:
+            self._handlers[channel].append(handler)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="pg-listener", daemon=True)
+                self._thread.start()
+
+    def unsubscribe(self, channel: str, handler: Callable[[str], None]):
+        with self._lock:
+            if handler in self._handlers.get(channel, []):
+                self._handlers[channel].remove(handler)
+
+    def _dispatch(self, channel: str, payload: str):
+        with self._lock:
+            handlers = list(self._handlers.get(channel, []))
+        for handler in handlers:
+            try:
+                handler(payload)
+            except Exception as e:
+                logger.error(f"Handler for '{channel}' failed: {e}")
+
+    def _run(self):
+        backoff = 1.0
+        while True:
+            try:
+                with get_connection() as conn:
+                    conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+                    listening = set()
+                    backoff = 1.0
+                    while True:
+                        with self._lock:
+                            channels = set(self._handlers)
+                        with conn.cursor() as cur:
+                            for channel in channels - listening:
+                                cur.execute(f'LISTEN "{channel}"')
+                                listening.add(channel)
+                        if select.select([conn], [], [], POLL_TIMEOUT) == ([], [], []):
+                            continue
+                        conn.poll()
+                        while conn.notifies:
+                            note = conn.notifies.pop(0)
+                            self._dispatch(note.channel, note.payload)
+            except Exception as e:
+                logger.error(f"Listener connection lost: {e}; retrying in {backoff:.0f}s")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, MAX_BACKOFF)
+
+
+listener = PgListener()
@@ -0,0 +1,286 @@
+# database/redis_snapshot.py
+
+import argparse
+import gzip
+import json
+import os
+import struct
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Optional
+from colorama import Fore
+from config.settings import RedisSettings
+from database.postgres import get_connection as Postgres
+from database.redisdb import get_binary_client, get_connection as Redis
+from database.latest_positions import (
+    catch_up_latest_positions,
+    location_watermark,
+    rebuild_latest_positions,
+)
+from database.into_redis import (
+    SYSTEMS,
+    WATERMARK_KEY,
+    catch_up_table,
+    clone_postgres_to_redis,
+    starship_print,
+)
+
+# File layout:
+#   MAGIC | u32 header length | JSON header | gzip stream of records
+#   record = u16 key length | key | i64 pttl (-1 = no expiry) | u32 dump length | DUMP payload
+MAGIC = b"D4BSNAP1"
+# The pg:* mirror and the geo:latest:* position indexes
+KEY_PATTERNS = ("pg:*", "geo:latest:*")
+BATCH_SIZE = 1000
+# One process per interval writes the scheduled snapshot
+SNAPSHOT_LOCK = "snapshot:lock"
+
+_redis_settings = RedisSettings()
+_schedule_lock = threading.Lock()
+_schedule_thread = None
+
+
+def _scan_batches(client, pattern, count=BATCH_SIZE):
+    batch = []
+    for key in client.scan_iter(match=pattern, count=count):
+        batch.append(key)
+        if len(batch) >= count:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def snapshot(path: str = None) -> dict:
+    """
+    Writes every pg:* and geo:latest:* key to a compact binary file using
+    Redis DUMP payloads, with the per-table Postgres watermark and the last
+    locations id stored in the header.
+    """
+    path = path or _redis_settings.snapshot_path
+    client = get_binary_client()
+    watermark = {
+        k.decode(): json.loads(v) for k, v in client.hgetall(WATERMARK_KEY).items()
+    }
+    try:
+        # Read before the dump, so a point stored meanwhile is caught up
+        # on restore rather than missed
+        watermark["locations"] = {"pk": location_watermark()}
+    except Exception as e:
+        starship_print(f"[!] No locations watermark ({e}), restore will rebuild positions", Fore.YELLOW, 0)
+    header = json.dumps({
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "watermark": watermark,
+    }).encode("utf-8")
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    keys = 0
+    with open(tmp_path, "wb") as raw:
+        raw.write(MAGIC)
+        raw.write(struct.pack(">I", len(header)))
+        raw.write(header)
+        with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6) as out:
+            for batch in (b for pattern in KEY_PATTERNS for b in _scan_batches(client, pattern)):
+                pipe = client.pipeline(transaction=False)
+                for key in batch:
+                    pipe.dump(key)
+                    pipe.pttl(key)
+                results = pipe.execute()
+                for key, payload, pttl in zip(batch, results[0::2], results[1::2]):
+                    if payload is None:
+                        continue  # expired or deleted between SCAN and DUMP
+                    out.write(struct.pack(">H", len(key)))
+                    out.write(key)
+                    out.write(struct.pack(">qI", pttl if pttl > 0 else -1, len(payload)))
+                    out.write(payload)
+                    keys += 1
+    os.replace(tmp_path, path)
+    return {"path": path, "keys": keys, "watermark": watermark}
+
+
+def _read_records(fh):
+    while True:
+        head = fh.read(2)
+        if not head:
+            return
+        (key_len,) = struct.unpack(">H", head)
+        key = fh.read(key_len)
+        pttl, payload_len = struct.unpack(">qI", fh.read(12))
+        yield key, pttl, fh.read(payload_len)
+
+
+def _read_header(raw) -> dict:
+    if raw.read(len(MAGIC)) != MAGIC:
+        raise ValueError(f"{raw.name} is not a Redis mirror snapshot")
+    (header_len,) = struct.unpack(">I", raw.read(4))
+    return json.loads(raw.read(header_len))
+
+
+def snapshot_age(path: str = None) -> Optional[float]:
+    """
+    Seconds since the snapshot at `path` was taken, None without one.
+    """
+    path = path or _redis_settings.snapshot_path
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as raw:
+        created_at = datetime.fromisoformat(_read_header(raw)["created_at"])
+    return (datetime.now(timezone.utc) - created_at).total_seconds()
+
+
+def restore(path: str = None, catch_up: bool = True) -> dict:
+    """
+    Pipelines a snapshot back into Redis with RESTORE ... REPLACE, then
+    mirrors only the Postgres rows newer than the recorded watermark.
+    """
+    path = path or _redis_settings.snapshot_path
+    client = get_binary_client()
+    keys = 0
+    with open(path, "rb") as raw:
+        header = _read_header(raw)
+        with gzip.GzipFile(fileobj=raw, mode="rb") as src:
+            pipe = client.pipeline(transaction=False)
+            pending = 0
+            for key, pttl, payload in _read_records(src):
+                pipe.restore(key, max(pttl, 0), payload, replace=True)
+                pending += 1
+                if pending >= BATCH_SIZE:
+                    pipe.execute()
+                    keys += pending
+                    pending = 0
+            if pending:
+                pipe.execute()
+                keys += pending
+
+    caught_up = {}
+    if catch_up:
+        watermark = header.get("watermark", {})
+        caught_up = catch_up_from_postgres(watermark)
+        if "locations" in watermark:
+            try:
+                caught_up["locations"] = catch_up_latest_positions(watermark["locations"]["pk"])
+            except Exception as e:
+                starship_print(f"[✗] Catch-up of latest positions failed: {e}", Fore.RED, 0)
+    return {"path": path, "keys": keys, "created_at": header.get("created_at"), "caught_up": caught_up}
+
+
+def catch_up_from_postgres(watermark: dict) -> dict:
+    """
+    Incremental sync of every mirrored table from its watermark.
+    Returns {table: rows_mirrored}.
+    """
+    counts = {}
+    with Postgres() as pg:
+        with pg.cursor() as cur:
+            with Redis() as redis_conn:
+                for _, table in SYSTEMS:
+                    mark = watermark.get(table)
+                    if mark is None:
+                        continue
+                    try:
+                        rows, _ = catch_up_table(table, cur, redis_conn, mark)
+                        counts[table] = rows
+                    except Exception as e:
+                        pg.rollback()
+                        starship_print(f"[✗] Catch-up of '{table}' failed: {e}", Fore.RED, 0)
+    return counts
+
+
+def _snapshot_loop(interval: float):
+    while True:
+        time.sleep(interval)
+        try:
+            with Redis() as redis_conn:
+                if not redis_conn.set(SNAPSHOT_LOCK, 1, nx=True, ex=max(1, int(interval * 0.9))):
+                    continue
+            info = snapshot()
+            starship_print(f"[✓] Mirror snapshot: {info['keys']} keys to {info['path']}", Fore.GREEN, 0)
+        except Exception as e:
+            starship_print(f"[✗] Scheduled mirror snapshot failed: {e}", Fore.RED, 0)
+
+
+def start_snapshot_schedule(interval: float = None):
+    """
+    Writes a new snapshot every `interval` seconds (REDIS_SNAPSHOT_INTERVAL_S)
+    from a daemon thread, once per process; a non-positive interval disables it.
+    """
+    global _schedule_thread
+    interval = _redis_settings.snapshot_interval_s if interval is None else interval
+    if interval <= 0:
+        return
+    with _schedule_lock:
+        if _schedule_thread is None:
+            _schedule_thread = threading.Thread(
+                target=_snapshot_loop, args=(interval,), name="redis-snapshot", daemon=True
+            )
+            _schedule_thread.start()
+
+
+def warm_start(path: str = None):
+    """
+    Startup path: restore the mirror from the local snapshot when one exists
+    and is at most REDIS_SNAPSHOT_MAX_AGE_S old, otherwise fall back to the
+    full clone from Postgres. The latest-position indexes come back with
+    the snapshot plus the points stored after it; they are only rebuilt
+    from every location after a full clone, or for a snapshot without a
+    locations watermark.
+
+    Catch-up only sees new rows and rows with a newer watermark column, so
+    a fresh snapshot is written right after startup and then on a
+    schedule, which keeps the next restore close to Postgres.
+    """
+    path = path or _redis_settings.snapshot_path
+    positions_restored = False
+    try:
+        age = snapshot_age(path)
+    except Exception as e:
+        starship_print(f"[✗] Unreadable snapshot {path} ({e})", Fore.YELLOW, 0)
+        age = None
+    if age is not None and age > _redis_settings.snapshot_max_age_s:
+        starship_print(f"[!] Snapshot {path} is {age / 3600:.1f}h old, running full clone", Fore.YELLOW, 0)
+        age = None
+    if age is None:
+        clone_postgres_to_redis()
+    else:
+        try:
+            result = restore(path)
+            positions_restored = "locations" in result["caught_up"]
+            starship_print(
+                f"[✓] Mirror restored from {path}: {result['keys']} keys, "
+                f"{sum(result['caught_up'].values())} rows caught up from Postgres",
+                Fore.GREEN, 0,
+            )
+        except Exception as e:
+            starship_print(f"[✗] Snapshot restore failed ({e}), running full clone", Fore.YELLOW, 0)
+            clone_postgres_to_redis()
+    if not positions_restored:
+        try:
+            rebuild_latest_positions()
+        except Exception as e:
+            starship_print(f"[✗] Latest positions rebuild failed: {e}", Fore.RED, 0)
+    try:
+        info = snapshot(path)
+        starship_print(f"[✓] Mirror snapshot: {info['keys']} keys to {info['path']}", Fore.GREEN, 0)
+    except Exception as e:
+        starship_print(f"[✗] Mirror snapshot after startup failed: {e}", Fore.RED, 0)
+    start_snapshot_schedule()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Snapshot or restore the Redis pg:* mirror and position indexes.")
+    parser.add_argument("command", choices=["snapshot", "restore"])
+    parser.add_argument("--path", default=None, help="Snapshot file (default REDIS_SNAPSHOT_PATH)")
+    parser.add_argument("--no-catch-up", action="store_true",
+                        help="Restore only, skip the incremental sync from Postgres")
+    args = parser.parse_args()
+
+    if args.command == "snapshot":
+        info = snapshot(args.path)
+        print(f"Wrote {info['keys']} keys to {info['path']}")
+    else:
+        info = restore(args.path, catch_up=not args.no_catch_up)
+        print(f"Restored {info['keys']} keys from {info['path']} (snapshot {info['created_at']})")
+        for table, rows in info["caught_up"].items():
+            print(f"  {table}: {rows} rows caught up")
@@ -1,28 +1,84 @@
 # database/redisdb.py
 
+import json
+import threading
 import redis
 from contextlib import contextmanager
+from datetime import datetime, date
+from decimal import Decimal
 from config.settings import RedisSettings
 
 _redis_settings = RedisSettings()  # Reads REDIS_* env vars if you import this module
 
-@contextmanager
-def get_connection():
-    conn = redis.Redis(
+_pool = None
+_binary_pool = None
+_client = None
+_pool_lock = threading.Lock()
+
+
+def _pool_options(decode_responses: bool) -> dict:
+    options = dict(
         host=_redis_settings.host,
         port=_redis_settings.port,
         db=_redis_settings.db,
-        password=_redis_settings.password if hasattr(_redis_settings, "password") else None,
-        decode_responses=True,
+        password=_redis_settings.password,
+        max_connections=_redis_settings.max_connections,
+        timeout=_redis_settings.pool_timeout,
+        socket_timeout=_redis_settings.socket_timeout,
+        socket_connect_timeout=_redis_settings.socket_connect_timeout,
+        health_check_interval=_redis_settings.health_check_interval,
+        decode_responses=decode_responses,
     )
-    try:
-        yield conn
-    finally:
-        # Redis-py does not need explicit connection closing; but for consistency:
-        try:
-            conn.close()
-        except Exception:
-            pass
+    if _redis_settings.ssl:
+        options["connection_class"] = redis.SSLConnection
+        options["ssl_ca_certs"] = _redis_settings.ssl_ca_certs
+    return options
+
+
+def get_pool() -> redis.ConnectionPool:
+    """
+    Process-wide connection pool shared by every module that talks to Redis.
+
+    A BlockingConnectionPool waits up to REDIS_POOL_TIMEOUT for a free
+    connection instead of failing once REDIS_MAX_CONNECTIONS are in use.
+    redis-py resets the pool automatically in forked worker processes.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = redis.BlockingConnectionPool(**_pool_options(decode_responses=True))
+    return _pool
+
+
+def get_binary_client() -> redis.Redis:
+    """
+    Client that returns raw bytes, for DUMP/RESTORE and other binary payloads.
+    Built lazily on its own pool, since decoding is a per-connection setting.
+    """
+    global _binary_pool
+    if _binary_pool is None:
+        with _pool_lock:
+            if _binary_pool is None:
+                _binary_pool = redis.BlockingConnectionPool(**_pool_options(decode_responses=False))
+    return redis.Redis(connection_pool=_binary_pool)
+
+
+def get_client() -> redis.Redis:
+    """
+    Shared Redis client bound to the process-wide pool.
+    """
+    global _client
+    if _client is None:
+        _client = redis.Redis(connection_pool=get_pool())
+    return _client
+
+
+@contextmanager
+def get_connection():
+    # Connections go back to the shared pool after each command,
+    # so there is nothing to close here.
+    yield get_client()
 
 def check_database():
     try:
@@ -32,3 +88,30 @@ def check_database():
     except Exception as e:
         print(f"Redis health check failed: {e}")
         return False
+
+
+def to_redis_compatible(value):
+    if value is None:
+        return ""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode("utf-8")
+    return str(value)
+
+
+def _json_default(obj):
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    return str(obj)
+
+
+def to_redis_json(row: dict) -> str:
+    """
+    JSON copy of a mirrored row; numbers keep their type, datetimes become ISO strings.
+    """
+    return json.dumps(row, default=_json_default)
@@ -0,0 +1,257 @@
+# database/retention.py
+
+import argparse
+import gzip
+import json
+import os
+import time
+import zlib
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List
+from psycopg2 import sql
+from psycopg2.extras import RealDictCursor
+from config.settings import RetentionSettings
+from database.postgres import get_connection
+from database.unread_counters import reconcile_unread
+from util.logit import get_logger
+
+logger = get_logger("logs", "Retention")
+
+retention_settings = RetentionSettings()
+
+TARGETS = ("table", "file")
+
+
+def policies(settings: RetentionSettings = retention_settings) -> List[Dict[str, Any]]:
+    """
+    Rows of `table` whose `age_column` is more than `days` old and that
+    match `condition` move to `archive` (see database/SQL/retention.sql).
+    """
+    return [
+        {
+            "name": "read_notifications",
+            "table": "notifications",
+            "archive": "notifications_archive",
+            "age_column": "updated_at",
+            "days": settings.read_notification_days,
+            "condition": "status = 'read'",
+        },
+        {
+            "name": "unread_notifications",
+            "table": "notifications",
+            "archive": "notifications_archive",
+            "age_column": "updated_at",
+            "days": settings.unread_notification_days,
+            "condition": "status = 'unread'",
+            # Moving these changes the cached unread counters
+            "affects_unread": True,
+        },
+        {
+            "name": "job_status_history",
+            "table": "job_status_history",
+            "archive": "job_status_history_archive",
+            "age_column": "changed_at",
+            "days": settings.status_history_days,
+            # The history of a job still being worked on stays with it
+            "condition": """NOT EXISTS (
+                SELECT 1 FROM jobs j
+                WHERE j.id = job_status_history.job_id AND j.status IN ('open', 'in_progress')
+            )""",
+        },
+    ]
+
+
+def _json_default(obj):
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    return str(obj)
+
+
+def _expired_sql(policy: Dict[str, Any], columns: str) -> sql.Composed:
+    return sql.SQL(
+        "SELECT {columns} FROM {table} WHERE {age} < NOW() - make_interval(days => %(days)s) AND ({condition})"
+    ).format(
+        columns=sql.SQL(columns),
+        table=sql.Identifier(policy["table"]),
+        age=sql.Identifier(policy["age_column"]),
+        condition=sql.SQL(policy["condition"]),
+    )
+
+
+def _archive_columns(cur, policy: Dict[str, Any]) -> List[str]:
+    # Columns present in both tables, so a column added to the live table
+    # later does not break archiving into an older archive table
+    cur.execute(
+        """SELECT c.column_name
+           FROM information_schema.columns c
+           JOIN information_schema.columns a
+             ON a.column_name = c.column_name
+            AND a.table_schema = c.table_schema
+            AND a.table_name = %s
+           WHERE c.table_schema = current_schema() AND c.table_name = %s
+           ORDER BY c.ordinal_position
+        """,
+        (policy["archive"], policy["table"]),
+    )
+    return [r[0] for r in cur.fetchall()]
+
+
+def count_expired(policy: Dict[str, Any]) -> int:
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(_expired_sql(policy, "COUNT(*)"), {"days": policy["days"]})
+            return cur.fetchone()[0]
+
+
+def _move_chunk_to_table(cur, policy: Dict[str, Any], columns: List[str], batch_size: int) -> int:
+    cols = sql.SQL(", ").join(map(sql.Identifier, columns))
+    cur.execute(
+        sql.SQL(
+            """WITH moved AS (
+                   DELETE FROM {table}
+                   WHERE id IN ({expired} LIMIT %(limit)s FOR UPDATE SKIP LOCKED)
+                   RETURNING *
+               )
+               INSERT INTO {archive} ({cols}) SELECT {cols} FROM moved
+            """
+        ).format(
+            table=sql.Identifier(policy["table"]),
+            expired=_expired_sql(policy, "id"),
+            archive=sql.Identifier(policy["archive"]),
+            cols=cols,
+        ),
+        {"days": policy["days"], "limit": batch_size},
+    )
+    return cur.rowcount
+
+
+def _move_chunk_to_file(cur, policy: Dict[str, Any], out, batch_size: int) -> int:
+    cur.execute(
+        sql.SQL(
+            """DELETE FROM {table}
+               WHERE id IN ({expired} LIMIT %(limit)s FOR UPDATE SKIP LOCKED)
+               RETURNING *
+            """
+        ).format(table=sql.Identifier(policy["table"]), expired=_expired_sql(policy, "id")),
+        {"days": policy["days"], "limit": batch_size},
+    )
+    rows = cur.fetchall()
+    for row in rows:
+        out.write((json.dumps(row, default=_json_default, separators=(",", ":")) + "\n").encode())
+    # On disk before the delete commits; a crash in between archives the
+    # chunk twice rather than losing it
+    out.flush(zlib.Z_SYNC_FLUSH)
+    os.fsync(out.fileobj.fileno())
+    return len(rows)
+
+
+def run_policy(policy: Dict[str, Any], target: str = None, batch_size: int = None,
+               settings: RetentionSettings = retention_settings) -> Dict[str, Any]:
+    """
+    Moves one policy's expired rows chunk by chunk, each chunk a DELETE of
+    at most `batch_size` rows committed on its own, so row locks are short
+    and a failure only loses the progress of the current chunk.
+    Returns {"policy", "table", "target", "moved", "chunks", "seconds"}
+    (and "file" for the file target).
+    """
+    target = target or settings.target
+    if target not in TARGETS:
+        raise ValueError(f"Unknown retention target {target!r}")
+    batch_size = batch_size or settings.batch_size
+    result = {"policy": policy["name"], "table": policy["table"], "target": target, "moved": 0, "chunks": 0}
+    started = time.monotonic()
+    out = None
+    try:
+        with get_connection() as conn:
+            if target == "table":
+                with conn.cursor() as cur:
+                    columns = _archive_columns(cur, policy)
+                conn.commit()
+                if not columns:
+                    raise RuntimeError(f"{policy['archive']} not found, run database/SQL/retention.sql")
+            else:
+                os.makedirs(settings.archive_dir, exist_ok=True)
+                stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+                result["file"] = os.path.join(settings.archive_dir, f"{policy['name']}-{stamp}.jsonl.gz")
+                out = gzip.open(result["file"], "ab")
+
+            while True:
+                try:
+                    if target == "table":
+                        with conn.cursor() as cur:
+                            moved = _move_chunk_to_table(cur, policy, columns, batch_size)
+                    else:
+                        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                            moved = _move_chunk_to_file(cur, policy, out, batch_size)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                if moved:
+                    result["chunks"] += 1
+                    result["moved"] += moved
+                if moved < batch_size:
+                    break
+                time.sleep(settings.pause_seconds)
+    finally:
+        if out is not None:
+            out.close()
+            if not result["moved"]:
+                os.remove(result["file"])
+                result.pop("file")
+    result["seconds"] = round(time.monotonic() - started, 3)
+    return result
+
+
+def apply_retention(names: Iterable[str] = None, target: str = None, batch_size: int = None,
+                    dry_run: bool = False) -> List[Dict[str, Any]]:
+    """
+    Runs every enabled policy (or only `names`) and reports the rows moved
+    per policy; with dry_run, only counts the expired rows. One failing
+    policy does not stop the others.
+    """
+    selected = [p for p in policies() if p["days"] > 0 and (not names or p["name"] in names)]
+    results = []
+    for policy in selected:
+        if dry_run:
+            results.append({"policy": policy["name"], "table": policy["table"], "expired": count_expired(policy)})
+            continue
+        try:
+            result = run_policy(policy, target, batch_size)
+            logger.info(f"Retention {policy['name']}: moved {result['moved']} rows "
+                        f"in {result['chunks']} chunks ({result['seconds']}s)")
+        except Exception as e:
+            result = {"policy": policy["name"], "table": policy["table"], "error": str(e)}
+            logger.error(f"Retention {policy['name']} failed: {e}")
+        results.append(result)
+
+    if any(r.get("moved") for p, r in zip(selected, results) if p.get("affects_unread")):
+        try:
+            reconcile_unread()
+        except Exception as e:
+            logger.error(f"Unread counter reconciliation after retention failed: {e}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive old notifications and job status history.")
+    parser.add_argument("--policy", action="append", choices=[p["name"] for p in policies()],
+                        help="Run only this policy (repeatable)")
+    parser.add_argument("--target", choices=TARGETS, default=None,
+                        help="Archive tables or gzipped JSON lines (default RETENTION_TARGET)")
+    parser.add_argument("--batch-size", type=int, default=None,
+                        help="Rows per chunk (default RETENTION_BATCH_SIZE)")
+    parser.add_argument("--dry-run", action="store_true", help="Count expired rows only")
+    args = parser.parse_args()
+
+    for r in apply_retention(args.policy, args.target, args.batch_size, dry_run=args.dry_run):
+        if "expired" in r:
+            print(f"{r['policy']} ({r['table']}): {r['expired']} expired")
+        elif "error" in r:
+            print(f"{r['policy']} ({r['table']}): {r['error']}")
+        else:
+            where = r.get("file", r["target"])
+            print(f"{r['policy']} ({r['table']}): {r['moved']} rows in {r['chunks']} chunks -> {where}")
@@ -0,0 +1,140 @@
+# database/unread_counters.py
+
+import argparse
+from collections import Counter
+from typing import Dict, Iterable
+from database.postgres import get_connection
+from database.redisdb import get_client
+from util.logit import get_logger
+
+logger = get_logger("logs", "Unread Counters")
+
+# notify:unread:<user_id>  number of unread notifications of the user
+COUNTER_PREFIX = "notify:unread"
+
+# Only adjust counters that exist: a missing counter is computed from
+# Postgres on first read, and an increment must not create it from zero.
+# Never goes below zero.
+_ADJUST_IF_PRESENT = """
+for i, key in ipairs(KEYS) do
+    if redis.call('EXISTS', key) == 1 then
+        local value = redis.call('INCRBY', key, ARGV[i])
+        if value < 0 then
+            redis.call('SET', key, 0)
+        end
+    end
+end
+return 0
+"""
+_adjust_script = None
+
+
+def _key(user_id: int) -> str:
+    # Anything else (e.g. the row tuple of a user lookup) would create a
+    # counter no reader or reconciliation can match
+    if not isinstance(user_id, int) or isinstance(user_id, bool):
+        raise TypeError(f"unread counter user_id must be an int, got {user_id!r}")
+    return f"{COUNTER_PREFIX}:{user_id}"
+
+
+def adjust_unread(deltas: Dict[int, int]):
+    """
+    Applies {user_id: +n / -n} to the cached unread counters after the
+    Postgres change committed. Best-effort: a failure is logged and
+    repaired by the next reconciliation.
+    """
+    global _adjust_script
+    deltas = {u: d for u, d in deltas.items() if u is not None and d}
+    if not deltas:
+        return
+    try:
+        client = get_client()
+        if _adjust_script is None:
+            _adjust_script = client.register_script(_ADJUST_IF_PRESENT)
+        users = list(deltas)
+        _adjust_script(keys=[_key(u) for u in users], args=[deltas[u] for u in users])
+    except Exception as e:
+        logger.error(f"Failed to adjust unread counters: {e}")
+
+
+def count_new(user_ids: Iterable[int]):
+    """
+    +1 for every user id in `user_ids` (one per new unread notification).
+    """
+    adjust_unread(Counter(user_ids))
+
+
+def count_from_postgres(user_id: int) -> int:
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT COUNT(*) FROM notifications WHERE user_id = %s AND status = 'unread'",
+                (user_id,),
+            )
+            return cur.fetchone()[0]
+
+
+def get_unread(user_id: int) -> int:
+    """
+    One Redis GET; the first read after a miss counts in Postgres (served
+    by the partial unread index) and caches the result.
+    """
+    client = get_client()
+    try:
+        value = client.get(_key(user_id))
+    except Exception as e:
+        logger.error(f"Unread counter read failed: {e}")
+        return count_from_postgres(user_id)
+    if value is not None:
+        return int(value)
+    count = count_from_postgres(user_id)
+    # NX: a concurrent reader or reconciliation may have set it meanwhile
+    client.set(_key(user_id), count, nx=True)
+    return count
+
+
+def reconcile_unread() -> Dict[str, int]:
+    """
+    Recomputes every cached counter from Postgres in one GROUP BY and fixes
+    the ones that drifted (e.g. a worker died between commit and Redis).
+    Returns how many counters were checked and corrected.
+    """
+    client = get_client()
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """SELECT user_id, COUNT(*) FROM notifications
+                   WHERE status = 'unread' AND user_id IS NOT NULL
+                   GROUP BY user_id
+                """
+            )
+            actual = dict(cur.fetchall())
+
+    keys = list(client.scan_iter(match=f"{COUNTER_PREFIX}:*", count=1000))
+    if not keys:
+        return {"checked": 0, "corrected": 0}
+    cached = client.mget(keys)
+    pipe = client.pipeline(transaction=False)
+    corrected = 0
+    for key, value in zip(keys, cached):
+        try:
+            user_id = int(key.rsplit(":", 1)[1])
+        except ValueError:
+            # Not a counter of ours; drop it rather than fail the whole run
+            logger.warning(f"Removing malformed unread counter key {key!r}")
+            pipe.delete(key)
+            continue
+        expected = actual.get(user_id, 0)
+        if value is None or int(value) != expected:
+            pipe.set(key, expected)
+            corrected += 1
+    pipe.execute()
+    if corrected:
+        logger.info(f"Reconciled {corrected} of {len(keys)} unread counters")
+    return {"checked": len(keys), "corrected": corrected}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconcile Redis unread counters with Postgres.")
+    parser.parse_args()
+    print(reconcile_unread())
@@ -1,9 +1,13 @@
 # db/user_queries.py
 
 from database.postgres import get_connection
+from config.settings import CacheSettings
+from util.cache import cached, invalidate
 import datetime
 import bcrypt
 
+_cache = CacheSettings()
+
 
 def get_user_password_and_email(email: str):
     with get_connection() as conn:
@@ -31,6 +35,24 @@ def get_user_id_by_email(email: str):
             return data
 
 
+@cached("users:id", ttl=_cache.users_ttl, stale_ttl=_cache.stale_ttl, beta=_cache.beta)
+def get_user_id(email: str):
+    """
+    Numeric id of the user with this email (the JWT identity), or None.
+    """
+    row = get_user_id_by_email(email)
+    return row[0] if row else None
+
+
+def invalidate_user_id(email: str):
+    """
+    Drop the cached get_user_id result for this email, after the user is
+    created (a cached None would outlive the registration), changed or
+    deleted.
+    """
+    invalidate(f"users:id:{email!r}")
+
+
 def get_user_by_id(id: int):
     with get_connection() as conn:
         with conn.cursor() as cur:
@@ -100,7 +122,9 @@ def insert_user(email: str, password: str) -> int:
             )
             user_id = cur.fetchone()[0]
             conn.commit()
-            return user_id
+    invalidate_user_id(email)
+    invalidate_user_lists()
+    return user_id
 
 
 def update_user_last_login(id: int):
@@ -156,6 +180,11 @@ def get_current_user_by_email(email):
             return user
 
 
+def invalidate_user_lists():
+    invalidate(prefix="users:all")
+
+
+@cached("users:all", ttl=_cache.users_ttl, stale_ttl=_cache.stale_ttl, beta=_cache.beta)
 def get_all_users(page, page_size):
     offset = (page - 1) * page_size
     with get_connection() as conn:
@@ -0,0 +1,70 @@
+"""
+Benchmark for the /geo/nearby pruning strategy on a synthetic dataset.
+
+Generates one million job sites around Hatay, builds a sorted geo_cell
+array (what the B-tree index on jobs.geo_cell gives Postgres) and compares
+  - brute force: haversine against every point
+  - grid: look up the cells from util.geo.cells_within, then haversine
+    on the short list only
+Both must return the same ids.
+
+    python test/bench_nearby.py [n_points] [radius_m] [queries]
+"""
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from util.geo import cell_of, cells_within, haversine_m  # noqa: E402
+
+
+def main(n=1_000_000, radius_m=2000.0, queries=200, seed=42):
+    rng = np.random.default_rng(seed)
+    lat = rng.uniform(35.8, 37.2, n)
+    lon = rng.uniform(35.6, 36.8, n)
+
+    t0 = time.perf_counter()
+    cells = cell_of(lat, lon)
+    order = np.argsort(cells, kind="stable")
+    sorted_cells = cells[order]
+    build_s = time.perf_counter() - t0
+
+    q_lat = rng.uniform(35.9, 37.1, queries)
+    q_lon = rng.uniform(35.7, 36.7, queries)
+
+    t0 = time.perf_counter()
+    brute = []
+    for qa, qo in zip(q_lat, q_lon):
+        brute.append(np.flatnonzero(haversine_m(qa, qo, lat, lon) <= radius_m))
+    brute_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    grid = []
+    candidates = 0
+    for qa, qo in zip(q_lat, q_lon):
+        wanted = np.asarray(cells_within(qa, qo, radius_m), dtype=np.int64)
+        lo = np.searchsorted(sorted_cells, wanted, side="left")
+        hi = np.searchsorted(sorted_cells, wanted, side="right")
+        idx = np.concatenate([order[a:b] for a, b in zip(lo, hi)]) if len(wanted) else np.array([], dtype=np.int64)
+        candidates += len(idx)
+        hits = idx[haversine_m(qa, qo, lat[idx], lon[idx]) <= radius_m]
+        grid.append(np.sort(hits))
+    grid_s = time.perf_counter() - t0
+
+    mismatches = sum(not np.array_equal(b, g) for b, g in zip(brute, grid))
+    print(f"points={n:,} radius={radius_m:.0f} m queries={queries}")
+    print(f"index build      : {build_s * 1000:9.1f} ms")
+    print(f"brute force      : {brute_s / queries * 1000:9.3f} ms/query")
+    print(f"grid + haversine : {grid_s / queries * 1000:9.3f} ms/query "
+          f"({candidates / queries:,.0f} candidates/query)")
+    print(f"speedup          : {brute_s / grid_s:9.1f}x, mismatches: {mismatches}")
+
+
+if __name__ == "__main__":
+    args = [float(a) for a in sys.argv[1:]]
+    main(
+        n=int(args[0]) if len(args) > 0 else 1_000_000,
+        radius_m=args[1] if len(args) > 1 else 2000.0,
+        queries=int(args[2]) if len(args) > 2 else 200,
+    )
@@ -0,0 +1,105 @@
+"""
+Size and latency benchmark for the GET /geo/ response formats.
+
+Generates synthetic crew tracks (one point every ~5 s, a few crews per job,
+rows in timestamp DESC order like the endpoint) and compares
+  - json:     what jsonify(rows) sends today (dates as HTTP dates)
+  - columnar: util.track_codec.encode_track_columns (application/vnd.d4b.track+json)
+  - binary:   util.track_codec.encode_track_binary  (application/vnd.d4b.track)
+raw and gzipped, plus encode and decode times. Every format must decode
+back to the same rows.
+
+    python test/bench_track_codec.py [n_rows] [repeats]
+"""
+import gzip
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from util.track_codec import (  # noqa: E402
+    decode_track_binary,
+    decode_track_columns,
+    encode_track_binary,
+    encode_track_columns,
+)
+
+
+def make_rows(n, seed=42):
+    rng = np.random.default_rng(seed)
+    start = datetime(2025, 5, 1, 6, 0, tzinfo=timezone.utc)
+    crews = [(job, user) for job in range(120, 124) for user in (7, 8, 9)]
+    rows, next_id = [], 1_000_000
+    per_crew = n // len(crews)
+    for job_id, user_id in crews:
+        lat = 36.8 + np.cumsum(rng.normal(0, 4e-5, per_crew))
+        lon = 36.2 + np.cumsum(rng.normal(0, 4e-5, per_crew))
+        ts = start + timedelta(milliseconds=int(rng.integers(0, 60_000)))
+        for i in range(per_crew):
+            rows.append({
+                "id": next_id,
+                "job_id": job_id,
+                "user_id": user_id,
+                "latitude": round(float(lat[i]), 6),
+                "longitude": round(float(lon[i]), 6),
+                "timestamp": ts + timedelta(milliseconds=5000 * i + int(rng.integers(0, 1000))),
+            })
+            next_id += 1
+    rows.sort(key=lambda r: r["timestamp"], reverse=True)
+    return rows
+
+
+def as_json(rows):
+    # Flask's default provider renders datetimes as HTTP dates
+    return json.dumps(
+        rows, default=lambda o: format_datetime(o, usegmt=True), separators=(",", ":")
+    ).encode("utf-8")
+
+
+def timed(fn, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return out, best * 1000
+
+
+def main(n=12_000, repeats=5):
+    rows = make_rows(n)
+    n = len(rows)
+    # Coordinates travel as integers of 1e-5 degrees (~1 m), timestamps in milliseconds
+    def q(x):
+        return round(round(x * 1e5) / 1e5, 5)
+    expected = [{**r, "latitude": q(r["latitude"]), "longitude": q(r["longitude"])} for r in rows]
+
+    formats = {
+        "json": (lambda: as_json(rows), lambda b: json.loads(b)),
+        "columnar": (
+            lambda: json.dumps(encode_track_columns(rows), separators=(",", ":")).encode("utf-8"),
+            lambda b: decode_track_columns(json.loads(b)),
+        ),
+        "binary": (lambda: encode_track_binary(rows), decode_track_binary),
+    }
+
+    print(f"{n} rows, best of {repeats}")
+    print(f"{'format':<10}{'bytes':>12}{'gzip':>12}{'x json':>9}{'x gzip':>9}{'enc ms':>9}{'dec ms':>9}")
+    base = base_gz = None
+    for name, (encode, decode) in formats.items():
+        payload, enc_ms = timed(encode, repeats)
+        decoded, dec_ms = timed(lambda: decode(payload), repeats)
+        size, gz = len(payload), len(gzip.compress(payload, 6))
+        if base is None:
+            base, base_gz = size, gz
+        else:
+            assert decoded == expected, f"{name} round trip mismatch"
+        print(f"{name:<10}{size:>12,}{gz:>12,}{base / size:>9.1f}{base_gz / gz:>9.1f}{enc_ms:>9.1f}{dec_ms:>9.1f}")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    main(*args)
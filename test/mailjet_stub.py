@@ -0,0 +1,152 @@
+"""
+Local stand-in for the Mailjet v3.1 Send API, for exercising
+util/email_delivery.py without real credentials or real email.
+
+The stub answers POST <anything> like Mailjet: one status per message,
+HTTP 400 when a recipient has no '@'. It fails a share of calls with
+429/503 to trigger retries, and records calls, messages and the peak
+number of concurrent requests.
+
+Run the server alone and point the app at it:
+
+    python test/mailjet_stub.py --serve --port 8025
+    EMAIL_ENABLED=true EMAIL_API_URL=http://127.0.0.1:8025/v3.1/send ...
+
+or send a burst through MailjetSender and print what the stub saw:
+
+    python test/mailjet_stub.py [n_messages] [--fail-rate 0.2]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+class StubState:
+    def __init__(self, fail_rate: float = 0.0, latency_s: float = 0.05):
+        self.fail_rate = fail_rate
+        self.latency_s = latency_s
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.failed_calls = 0
+        self.messages = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+
+def make_handler(state: StubState):
+    class MailjetStubHandler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, code: int, body: dict, headers: dict = None):
+            data = json.dumps(body).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            with state.lock:
+                state.calls += 1
+                state.in_flight += 1
+                state.peak_in_flight = max(state.peak_in_flight, state.in_flight)
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                time.sleep(state.latency_s)
+                if random.random() < state.fail_rate:
+                    with state.lock:
+                        state.failed_calls += 1
+                    if random.random() < 0.5:
+                        return self._reply(429, {"ErrorMessage": "Too many requests"}, {"Retry-After": "0.1"})
+                    return self._reply(503, {"ErrorMessage": "Service unavailable"})
+
+                results, ok = [], True
+                for message in body.get("Messages", []):
+                    to = [r.get("Email", "") for r in message.get("To", [])]
+                    if not to or any("@" not in e for e in to):
+                        ok = False
+                        results.append({"Status": "error", "Errors": [{"ErrorCode": "send-0003",
+                                                                       "ErrorMessage": "Invalid email"}]})
+                    else:
+                        results.append({"Status": "success", "CustomID": message.get("CustomID", ""),
+                                         "To": [{"Email": e, "MessageUUID": str(uuid.uuid4())} for e in to]})
+                with state.lock:
+                    state.messages += sum(1 for r in results if r["Status"] == "success")
+                self._reply(200 if ok else 400, {"Messages": results})
+            finally:
+                with state.lock:
+                    state.in_flight -= 1
+
+    return MailjetStubHandler
+
+
+def start_stub(port: int = 0, fail_rate: float = 0.0, latency_s: float = 0.05):
+    """
+    Starts the stub in a daemon thread. Returns (server, state, send_url).
+    """
+    state = StubState(fail_rate, latency_s)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state, f"http://127.0.0.1:{server.server_address[1]}/v3.1/send"
+
+
+def burst(n_messages: int, fail_rate: float, concurrency: int):
+    from config.settings import EmailSettings
+    from util.email_delivery import MailjetSender
+
+    server, state, url = start_stub(fail_rate=fail_rate)
+    settings = EmailSettings(api_url=url, sender="noreply@example.com", max_concurrency=concurrency,
+                             retry_base_s=0.05)
+    sender = MailjetSender(settings, auth=("stub", "stub"))
+    messages = [
+        {
+            "From": {"Email": settings.sender, "Name": settings.sender_name},
+            "To": [{"Email": f"crew{i}@example.com" if i % 97 else f"crew{i}-no-at", "Name": f"Crew {i}"}],
+            "Subject": f"Job #{i % 40} was updated",
+            "TextPart": f"- Job #{i % 40} was updated",
+        }
+        for i in range(n_messages)
+    ]
+    started = time.perf_counter()
+    stats = sender.send(messages)
+    elapsed = time.perf_counter() - started
+    server.shutdown()
+
+    print(f"messages: {n_messages}  sender: {stats}")
+    print(f"stub: calls={state.calls} failed_calls={state.failed_calls} "
+          f"accepted={state.messages} peak_concurrency={state.peak_in_flight}")
+    print(f"elapsed: {elapsed:.2f}s")
+    assert state.peak_in_flight <= concurrency
+    assert stats["sent"] + stats["failed"] == n_messages
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mailjet v3.1 Send API stub.")
+    parser.add_argument("n_messages", nargs="?", type=int, default=1000)
+    parser.add_argument("--serve", action="store_true", help="only run the stub server")
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--fail-rate", type=float, default=0.2)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    if args.serve:
+        server, state, url = start_stub(args.port, args.fail_rate)
+        print(f"Mailjet stub listening on {url}")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            server.shutdown()
+    else:
+        burst(args.n_messages, args.fail_rate, args.concurrency)
@@ -0,0 +1,74 @@
+"""
+End-to-end check of live notification delivery (util/notification_stream.py).
+
+Subscribes to NotificationHub the way GET /notify/stream and /notify/poll
+do (the JWT email resolved with get_user_id), inserts a notification for
+that user and sends a NOTIFY for it on the notifications_new channel, then
+asserts the subscriber receives the row through the shared pg_listener
+connection. The notification is deleted again afterwards.
+
+Needs the POSTGRES_* settings of a database with users and notifications:
+
+    python test/notification_push_check.py crew@example.com [--timeout 10]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+def check(email: str, timeout: float = 10.0):
+    from database.postgres import get_connection
+    from database.user_queries import get_user_id
+    from util.notification_stream import NOTIFICATIONS_CHANNEL, notification_hub
+
+    user_id = get_user_id(email)
+    assert user_id is not None, f"No user with email {email}"
+    assert isinstance(user_id, int), f"get_user_id returned {user_id!r}, not an int"
+
+    subscriber = notification_hub.subscribe(user_id)
+    notification_id = None
+    try:
+        # The listener thread opens its connection and LISTENs asynchronously
+        time.sleep(1.0)
+        with get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """INSERT INTO notifications (user_id, job_id, message, status, created_at)
+                       VALUES (%s, NULL, 'notification push check', 'read', NOW())
+                       RETURNING id
+                    """,
+                    (user_id,),
+                )
+                notification_id = cur.fetchone()[0]
+                # Same payload as the notification_push.sql trigger
+                cur.execute(
+                    "SELECT pg_notify(%s, %s)",
+                    (NOTIFICATIONS_CHANNEL, json.dumps({"user_id": user_id, "ids": [notification_id]})),
+                )
+            conn.commit()
+
+        started = time.perf_counter()
+        assert subscriber.ready.wait(timeout), f"No notification delivered within {timeout}s"
+        elapsed = time.perf_counter() - started
+        delivered = [row["id"] for row in subscriber.buffer]
+        assert notification_id in delivered, f"Expected {notification_id}, got {delivered}"
+        print(f"user {user_id}: notification {notification_id} delivered in {elapsed * 1000:.0f} ms")
+    finally:
+        notification_hub.unsubscribe(subscriber)
+        if notification_id is not None:
+            with get_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("DELETE FROM notifications WHERE id = %s", (notification_id,))
+                conn.commit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check NOTIFY delivery to NotificationHub subscribers.")
+    parser.add_argument("email", help="Email of an existing user (the JWT identity)")
+    parser.add_argument("--timeout", type=float, default=10.0)
+    args = parser.parse_args()
+    check(args.email, args.timeout)
@@ -2,12 +2,13 @@ from config.settings import settings
 from flask import Flask, json, jsonify, request, g
 from flask_talisman import Talisman
 from flask_jwt_extended import JWTManager
-from flask_limiter import Limiter
 from flask_cors import CORS
 from util.blueprints import register_blueprints
+from util.limiter import limiter
 from util.logit import get_logger
 from util.error_handlers import register_error_handlers
 from util.service import on_app_start
+from util.notification_dispatcher import notification_dispatcher
 from datetime import datetime, timezone
 from database.postgres import get_connection
 
@@ -23,7 +24,7 @@ def create_app(app: Flask, _start_time:any, testing=False):
              content_security_policy=settings.csp_allow_all)
 
     jwt = JWTManager(app)  # noqa: F841
-    limiter = Limiter(app)  # noqa: F841
+    limiter.init_app(app)
 
     app.config["JWT_SECRET_KEY"] = settings.JWT_SECRET_KEY
     app.config["SWAGGER_URL"] = "/api/docs"
@@ -128,5 +129,7 @@ def create_app(app: Flask, _start_time:any, testing=False):
         return jsonify({"status": "ok", "service": "Main Service"}), 200
 
     on_app_start(_start_time)
+    if not testing:
+        notification_dispatcher.start()
 
     return app
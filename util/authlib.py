@@ -4,6 +4,20 @@ from flask_jwt_extended import verify_jwt_in_request, get_jwt
 from util.utils import obfuscate
 
 
+def has_scope(scope) -> bool:
+    """
+    Whether the current request's JWT carries `scope`; call after
+    the JWT was verified (e.g. inside a @jwt_required view).
+    """
+    # Assume that the scopes are stored as a list in the "scopes"
+    # claim.
+    token_scopes = get_jwt().get("scopes", [])
+    # If scopes were added as a space-delimited string, split it:
+    if isinstance(token_scopes, str):
+        token_scopes = token_scopes.split()
+    return scope in token_scopes
+
+
 def requires_scope(required_scope):
     """
     Decorator to enforce that a valid JWT is present and it contains the required scope.
@@ -14,14 +28,7 @@ def requires_scope(required_scope):
         def wrapper(*args, **kwargs):
             # Verify that the JWT exists in the request
             verify_jwt_in_request()
-            claims = get_jwt()
-            # Assume that the scopes are stored as a list in the "scopes"
-            # claim.
-            token_scopes = claims.get("scopes", [])
-            # If scopes were added as a space-delimited string, split it:
-            if isinstance(token_scopes, str):
-                token_scopes = token_scopes.split()
-            if required_scope not in token_scopes:
+            if not has_scope(required_scope):
                 return (
                     jsonify(
                         {
@@ -0,0 +1,181 @@
+# util/cache.py
+
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, date
+from functools import wraps
+from typing import Any, Callable, Optional
+from redis.exceptions import RedisError
+from werkzeug.http import http_date
+from database.redisdb import get_client
+from util.logit import get_logger
+
+logger = get_logger("logs", "Cache")
+
+CACHE_PREFIX = "cache"
+LOCK_PREFIX = "cache:lock"
+
+# Compare-and-delete so a worker only releases the lock it still owns.
+_RELEASE_LOCK = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# Striped in-process locks: keys may come from request arguments, so a
+# fixed pool keeps memory bounded while still separating unrelated keys.
+_LOCAL_STRIPES = 64
+_local_locks = [threading.Lock() for _ in range(_LOCAL_STRIPES)]
+
+
+def _local_lock(key: str) -> threading.Lock:
+    return _local_locks[hash(key) % _LOCAL_STRIPES]
+
+
+def _json_default(obj):
+    # Same conversions as Flask's JSON provider, so a cached value renders
+    # exactly like the freshly computed one.
+    if isinstance(obj, (datetime, date)):
+        return http_date(obj)
+    return str(obj)
+
+
+def _encode(value, delta: float, ttl: int) -> str:
+    return json.dumps(
+        {"v": value, "delta": delta, "expiry": time.time() + ttl},
+        default=_json_default,
+    )
+
+
+def _should_refresh(entry: dict, beta: float) -> bool:
+    """
+    Probabilistic early expiration (XFetch): the closer an entry is to its
+    logical expiry, and the longer it took to compute, the more likely a
+    reader is to refresh it ahead of time.
+    """
+    if entry["expiry"] <= time.time():
+        return True
+    jitter = entry["delta"] * beta * -math.log(max(random.random(), 1e-12))
+    return time.time() + jitter >= entry["expiry"]
+
+
+def _compute(redis_conn, key: str, loader: Callable[[], Any], ttl: int, stale_ttl: int):
+    start = time.monotonic()
+    value = loader()
+    delta = time.monotonic() - start
+    raw = _encode(value, delta, ttl)
+    try:
+        # Keep the entry around for stale_ttl past its logical expiry,
+        # so readers have something to serve during the next refresh.
+        redis_conn.set(f"{CACHE_PREFIX}:{key}", raw, ex=ttl + stale_ttl)
+    except Exception as e:
+        logger.error(f"Cache write failed for {key}: {e}")
+    # Round-trip through JSON so hits and misses return the same shapes.
+    return json.loads(raw)["v"]
+
+
+def _release(redis_conn, lock_key: str, token: str):
+    try:
+        redis_conn.eval(_RELEASE_LOCK, 1, lock_key, token)
+    except RedisError as e:
+        # The lock expires on its own after lock_timeout.
+        logger.error(f"Cache lock release failed for {lock_key}: {e}")
+
+
+def get_or_compute(
+    key: str,
+    loader: Callable[[], Any],
+    ttl: int = 60,
+    stale_ttl: int = 300,
+    beta: float = 1.0,
+    lock_timeout: int = 30,
+    wait: float = 5.0,
+):
+    """
+    Read-through cache with single-flight recomputation.
+
+    Only one thread per process (in-process lock) and one worker across
+    processes (Redis SET NX lock) recomputes a key at a time. While that
+    happens, other callers get the stale value if one exists; callers with
+    nothing to serve wait up to `wait` seconds for the fresh value.
+    Falls back to calling `loader` directly if Redis is unavailable.
+    """
+    r = get_client()
+    try:
+        raw = r.get(f"{CACHE_PREFIX}:{key}")
+    except RedisError as e:
+        logger.error(f"Cache read failed for {key}: {e}")
+        return loader()
+
+    entry = json.loads(raw) if raw else None
+    try:
+        return _single_flight(r, key, entry, loader, ttl, stale_ttl, beta, lock_timeout, wait)
+    except RedisError as e:
+        logger.error(f"Cache lock failed for {key}: {e}")
+        return entry["v"] if entry is not None else loader()
+
+
+def _single_flight(r, key, entry, loader, ttl, stale_ttl, beta, lock_timeout, wait):
+    if entry is not None and not _should_refresh(entry, beta):
+        return entry["v"]
+
+    local = _local_lock(key)
+    token = uuid.uuid4().hex
+    lock_key = f"{LOCK_PREFIX}:{key}"
+    deadline = time.monotonic() + wait
+
+    while True:
+        if local.acquire(blocking=False):
+            try:
+                if r.set(lock_key, token, nx=True, ex=lock_timeout):
+                    try:
+                        return _compute(r, key, loader, ttl, stale_ttl)
+                    finally:
+                        _release(r, lock_key, token)
+            finally:
+                local.release()
+
+        # Someone else is recomputing: serve stale if we can.
+        if entry is not None:
+            return entry["v"]
+        if time.monotonic() >= deadline:
+            return loader()
+        time.sleep(0.05)
+        raw = r.get(f"{CACHE_PREFIX}:{key}")
+        if raw:
+            return json.loads(raw)["v"]
+
+
+def invalidate(*keys: str, prefix: Optional[str] = None):
+    """
+    Drop cached entries by exact key, or every key under `prefix`.
+    """
+    try:
+        r = get_client()
+        names = [f"{CACHE_PREFIX}:{k}" for k in keys]
+        if prefix is not None:
+            names.extend(r.scan_iter(match=f"{CACHE_PREFIX}:{prefix}*", count=1000))
+        if names:
+            r.delete(*names)
+    except Exception as e:
+        logger.error(f"Cache invalidation failed: {e}")
+
+
+def cached(namespace: str, ttl: int = 60, stale_ttl: int = 300, beta: float = 1.0):
+    """
+    Decorator form of get_or_compute; the cache key is built from the
+    namespace and the call arguments.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            parts = [repr(a) for a in args] + [f"{k}={v!r}" for k, v in sorted(kwargs.items())]
+            key = f"{namespace}:{':'.join(parts)}"
+            return get_or_compute(key, lambda: fn(*args, **kwargs), ttl=ttl, stale_ttl=stale_ttl, beta=beta)
+        return wrapper
+    return decorator
@@ -0,0 +1,252 @@
+# util/email_delivery.py
+
+import atexit
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import requests
+from requests.adapters import HTTPAdapter
+from psycopg2.extras import RealDictCursor
+from config.settings import EmailSettings, SMTPSettings
+from database.postgres import get_connection
+from util.logit import get_logger
+
+logger = get_logger("logs", "Email Delivery")
+
+email_settings = EmailSettings()
+
+# Throttling and transient server errors; anything else is final
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Messages held while Mailjet is unreachable before the oldest are dropped
+MAX_PENDING = 20000
+
+
+class MailjetSender:
+    """
+    Posts messages to the Mailjet v3.1 Send API, batch_size messages per
+    call, from max_concurrency threads sharing one keep-alive session.
+
+    429s, 5xx and network errors are retried with exponential backoff and
+    jitter (or the server's Retry-After). A 4xx is final: Mailjet reports
+    a status per message, so the ones it accepted are still counted sent.
+    """
+
+    def __init__(self, settings: EmailSettings = email_settings, auth: Optional[Tuple[str, str]] = None):
+        self._settings = settings
+        if auth is None:
+            smtp = SMTPSettings()
+            auth = (smtp.ID, smtp.SECRET)
+        workers = max(1, settings.max_concurrency)
+        self._session = requests.Session()
+        self._session.auth = auth
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="email")
+
+    def _delay(self, attempt: int, retry_after: Optional[str]) -> float:
+        if retry_after:
+            try:
+                return min(float(retry_after), 60.0)
+            except ValueError:
+                pass
+        return self._settings.retry_base_s * (2 ** attempt) * (0.5 + random.random())
+
+    @staticmethod
+    def _accepted(res: requests.Response) -> int:
+        try:
+            return sum(1 for m in res.json().get("Messages", []) if m.get("Status") == "success")
+        except ValueError:
+            return 0
+
+    def _post(self, messages: List[Dict[str, Any]]) -> Dict[str, int]:
+        stats = {"calls": 0, "sent": 0, "failed": 0, "retries": 0}
+        attempts = max(1, self._settings.max_attempts)
+        for attempt in range(attempts):
+            stats["calls"] += 1
+            retry_after = None
+            try:
+                res = self._session.post(self._settings.api_url, json={"Messages": messages},
+                                         timeout=self._settings.timeout_s)
+            except requests.RequestException as e:
+                error = str(e)
+            else:
+                if res.status_code < 300:
+                    stats["sent"] += len(messages)
+                    return stats
+                if res.status_code not in RETRY_STATUSES:
+                    accepted = self._accepted(res)
+                    stats["sent"] += accepted
+                    stats["failed"] += len(messages) - accepted
+                    logger.error(f"Mailjet rejected {len(messages) - accepted} of {len(messages)} "
+                                 f"emails ({res.status_code}): {res.text[:200]}")
+                    return stats
+                error = f"HTTP {res.status_code}"
+                retry_after = res.headers.get("Retry-After")
+            if attempt + 1 < attempts:
+                stats["retries"] += 1
+                time.sleep(self._delay(attempt, retry_after))
+        logger.error(f"Giving up on {len(messages)} emails after {attempts} attempts: {error}")
+        stats["failed"] += len(messages)
+        return stats
+
+    def send(self, messages: List[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        Sends Mailjet v3.1 message objects and blocks until every batch is
+        done. Returns {"messages", "calls", "sent", "failed", "retries"}.
+        """
+        size = max(1, min(self._settings.batch_size, 50))
+        batches = [messages[i:i + size] for i in range(0, len(messages), size)]
+        totals = Counter({"messages": len(messages)})
+        for stats in self._pool.map(self._post, batches):
+            totals.update(stats)
+        return {k: totals[k] for k in ("messages", "calls", "sent", "failed", "retries")}
+
+
+class EmailChannel:
+    """
+    Collects messages from any thread and hands them to the sender in
+    bulk: a batch goes out once enough messages for every concurrent call
+    are waiting, or linger_seconds after the first one arrived. A burst of
+    notifications therefore costs a few API calls instead of one each.
+    """
+
+    def __init__(self, settings: EmailSettings = email_settings, sender: Optional[MailjetSender] = None):
+        self._settings = settings
+        self._sender = sender
+        self._pending: List[Dict[str, Any]] = []
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stats = Counter()
+
+    @property
+    def sender(self) -> MailjetSender:
+        if self._sender is None:
+            self._sender = MailjetSender(self._settings)
+        return self._sender
+
+    def submit(self, messages: List[Dict[str, Any]]):
+        if not messages:
+            return
+        with self._cond:
+            self._pending.extend(messages)
+            overflow = len(self._pending) - MAX_PENDING
+            if overflow > 0:
+                del self._pending[:overflow]
+                self._stats["dropped"] += overflow
+                logger.warning(f"Email queue full, dropped {overflow} oldest messages")
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="email-channel", daemon=True)
+                self._thread.start()
+            # Wakes the first wait, or cuts the linger short once a batch is full
+            self._cond.notify()
+
+    def _take(self) -> List[Dict[str, Any]]:
+        full = self._settings.batch_size * max(1, self._settings.max_concurrency)
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            deadline = time.monotonic() + self._settings.linger_seconds
+            while len(self._pending) < full:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    break
+                self._cond.wait(left)
+            batch, self._pending = self._pending[:full], self._pending[full:]
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._take()
+            try:
+                self._stats.update(self.sender.send(batch))
+            except Exception as e:
+                self._stats["failed"] += len(batch)
+                logger.error(f"Email delivery failed: {e}")
+
+    def flush(self):
+        """
+        Sends whatever is still waiting, e.g. at shutdown.
+        """
+        with self._cond:
+            batch, self._pending = self._pending, []
+        if batch:
+            self._stats.update(self.sender.send(batch))
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            pending = len(self._pending)
+        return {**dict(self._stats), "pending": pending}
+
+
+email_channel = EmailChannel()
+atexit.register(lambda: email_channel.flush() if email_settings.enabled else None)
+
+
+def build_messages(rows: List[Dict[str, Any]], settings: EmailSettings = email_settings) -> List[Dict[str, Any]]:
+    """
+    One Mailjet message per user from notification rows (user_id, email,
+    name, job_id, message, update_count), newest first.
+    """
+    by_user: Dict[int, List[Dict[str, Any]]] = {}
+    for row in rows:
+        by_user.setdefault(row["user_id"], []).append(row)
+    messages = []
+    for user_id, items in by_user.items():
+        first = items[0]
+        subject = first["message"] if len(items) == 1 else f"{len(items)} new notifications"
+        lines = [
+            f"- {r['message']}"
+            + (f" (job #{r['job_id']})" if r["job_id"] is not None else "")
+            + (f" x{r['update_count']}" if r["update_count"] > 1 else "")
+            for r in items
+        ]
+        messages.append({
+            "From": {"Email": settings.sender, "Name": settings.sender_name},
+            "To": [{"Email": first["email"], "Name": first["name"] or first["email"]}],
+            "Subject": subject[:255],
+            "TextPart": "\n".join(lines),
+            "CustomID": f"notify-{user_id}",
+        })
+    return messages
+
+
+def email_new_notifications(user_ids: Iterable[int]):
+    """
+    Queues an email copy of the notifications just created for `user_ids`
+    (one entry per new notification, as passed to count_new): one email
+    per user with their newest unread notifications. No-op unless
+    EMAIL_ENABLED; failures are logged, never raised to the caller.
+    """
+    if not email_settings.enabled:
+        return
+    counts = Counter(u for u in user_ids if u is not None)
+    if not counts:
+        return
+    users = list(counts)
+    try:
+        with get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(
+                    """SELECT t.user_id, t.email, t.name, t.job_id, t.message, t.update_count
+                       FROM (
+                           SELECT n.user_id, u.email, u.name, n.job_id, n.message, n.update_count,
+                                  ROW_NUMBER() OVER (PARTITION BY n.user_id
+                                                     ORDER BY n.updated_at DESC, n.id DESC) AS rn
+                           FROM notifications n
+                           JOIN users u ON u.id = n.user_id
+                           WHERE n.user_id = ANY(%s) AND n.status = 'unread' AND u.email IS NOT NULL
+                       ) t
+                       JOIN unnest(%s::int[], %s::int[]) AS c(user_id, wanted) ON c.user_id = t.user_id
+                       WHERE t.rn <= c.wanted
+                       ORDER BY t.user_id, t.rn
+                    """,
+                    (users, users, [counts[u] for u in users]),
+                )
+                rows = cur.fetchall()
+        email_channel.submit(build_messages(rows))
+    except Exception as e:
+        logger.error(f"Could not queue notification emails: {e}")
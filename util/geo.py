@@ -0,0 +1,128 @@
+# util/geo.py
+
+import math
+from typing import List, Tuple
+import numpy as np
+
+EARTH_RADIUS_M = 6_371_000.0
+METERS_PER_DEGREE = math.pi * EARTH_RADIUS_M / 180.0
+
+# Uniform grid used for the jobs.geo_cell column (database/SQL/geo.sql).
+# Must stay in sync with the generated column expression.
+CELL_DEG = 0.01
+LON_CELLS = 36000  # 360 / CELL_DEG
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance in meters. Accepts scalars or NumPy arrays
+    (broadcast), so a whole candidate list is checked in one call.
+    """
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        np.sin((lat2 - lat1) / 2.0) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2.0) ** 2
+    )
+    return 2.0 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def cell_of(latitude, longitude):
+    """
+    Grid cell id of a point; the same formula as the geo_cell column.
+    Works on scalars and NumPy arrays.
+    """
+    row = np.floor((np.asarray(latitude, dtype=float) + 90.0) / CELL_DEG).astype(np.int64)
+    col = np.floor((np.asarray(longitude, dtype=float) + 180.0) / CELL_DEG).astype(np.int64)
+    return row * LON_CELLS + col
+
+
+def cell_ranges_within(latitude: float, longitude: float, radius_m: float) -> List[Tuple[int, int]]:
+    """
+    The cells of cells_within as inclusive (first, last) geo_cell ranges,
+    one per latitude row (two where the box wraps the antimeridian), so a
+    wide radius costs a few index range scans instead of a huge IN list.
+    """
+    dlat = radius_m / METERS_PER_DEGREE
+    max_abs_lat = min(abs(latitude) + dlat, 90.0)
+    cos_lat = math.cos(math.radians(max_abs_lat))
+    dlon = 180.0 if cos_lat < 1e-6 else min(dlat / cos_lat, 180.0)
+
+    row_lo = math.floor((max(latitude - dlat, -90.0) + 90.0) / CELL_DEG) - 1
+    row_hi = math.floor((min(latitude + dlat, 90.0) + 90.0) / CELL_DEG) + 1
+    col_lo = math.floor((longitude - dlon + 180.0) / CELL_DEG) - 1
+    col_hi = math.floor((longitude + dlon + 180.0) / CELL_DEG) + 1
+
+    if col_hi - col_lo + 1 >= LON_CELLS:
+        spans = [(0, LON_CELLS - 1)]
+    elif col_lo < 0:
+        # Wrap across the antimeridian
+        spans = [(0, col_hi), (col_lo + LON_CELLS, LON_CELLS - 1)]
+    elif col_hi >= LON_CELLS:
+        spans = [(0, col_hi - LON_CELLS), (col_lo, LON_CELLS - 1)]
+    else:
+        spans = [(col_lo, col_hi)]
+    rows = range(max(row_lo, 0), min(row_hi, int(180 / CELL_DEG)) + 1)
+    return [(r * LON_CELLS + lo, r * LON_CELLS + hi) for r in rows for lo, hi in spans]
+
+
+def cells_within(latitude: float, longitude: float, radius_m: float) -> List[int]:
+    """
+    All grid cells that may hold a point within radius_m of the given point.
+
+    The bounding box is padded by one cell on every side, so rounding
+    differences between Python and Postgres at cell edges never drop a
+    candidate; the exact haversine check removes the extras.
+    """
+    return [c for lo, hi in cell_ranges_within(latitude, longitude, radius_m) for c in range(lo, hi + 1)]
+
+
+def _project(latitude, longitude):
+    """
+    Equirectangular projection to meters around the track's mean latitude;
+    accurate enough for simplification tolerances over a city-sized track.
+    """
+    lat0 = np.radians(np.mean(latitude))
+    x = np.radians(longitude) * np.cos(lat0) * EARTH_RADIUS_M
+    y = np.radians(latitude) * EARTH_RADIUS_M
+    return x, y
+
+
+def simplify_track(latitude, longitude, tolerance_m: float) -> np.ndarray:
+    """
+    Douglas–Peucker simplification of a track.
+
+    Each split step measures every interior point of a segment in one
+    NumPy expression, so the Python loop runs once per kept point rather
+    than once per input point. Returns the sorted indices of the points
+    to keep; the first and last points are always kept.
+    """
+    latitude = np.asarray(latitude, dtype=float)
+    longitude = np.asarray(longitude, dtype=float)
+    n = len(latitude)
+    if n <= 2 or tolerance_m <= 0:
+        return np.arange(n)
+
+    x, y = _project(latitude, longitude)
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        px = x[start + 1:end]
+        py = y[start + 1:end]
+        dx = x[end] - x[start]
+        dy = y[end] - y[start]
+        seg_len = np.hypot(dx, dy)
+        if seg_len == 0.0:
+            dist = np.hypot(px - x[start], py - y[start])
+        else:
+            dist = np.abs(dy * (px - x[start]) - dx * (py - y[start])) / seg_len
+        i = int(np.argmax(dist))
+        if dist[i] > tolerance_m:
+            split = start + 1 + i
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return np.flatnonzero(keep)
@@ -0,0 +1,211 @@
+# util/geofence.py
+
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Tuple
+import numpy as np
+from psycopg2.extras import RealDictCursor
+from config.settings import GeofenceSettings
+from database.notification_queries import enqueue_notification
+from database.postgres import get_connection
+from database.redisdb import get_client
+from util.geo import cell_of, cells_within, haversine_m
+from util.logit import get_logger
+
+logger = get_logger("logs", "Geofence")
+
+geofence_settings = GeofenceSettings()
+
+OPEN_STATUSES = ("open", "in_progress")
+# geofence:inside:<user_id>  set of job ids whose fence the user is inside
+INSIDE_PREFIX = "geofence:inside"
+
+
+class SiteIndex:
+    """
+    Open job sites bucketed by the util.geo grid (the same cells as
+    jobs.geo_cell). A point only looks at the few cells around it, so the
+    cost per point does not grow with the number of open jobs.
+    """
+
+    def __init__(self, sites: List[Dict[str, Any]]):
+        self.sites = sites
+        self.latitude = np.array([float(s["latitude"]) for s in sites], dtype=float)
+        self.longitude = np.array([float(s["longitude"]) for s in sites], dtype=float)
+        self.by_id = {s["id"]: i for i, s in enumerate(sites)}
+        buckets = defaultdict(list)
+        for i, cell in enumerate(cell_of(self.latitude, self.longitude).tolist()):
+            buckets[cell].append(i)
+        self.cells = {cell: np.array(idx, dtype=np.int64) for cell, idx in buckets.items()}
+
+    def within(self, latitude: float, longitude: float, radius_m: float) -> Dict[int, float]:
+        """
+        {job_id: distance_m} of every site within radius_m of the point.
+        """
+        found = [self.cells[c] for c in cells_within(latitude, longitude, radius_m) if c in self.cells]
+        if not found:
+            return {}
+        idx = np.concatenate(found)
+        dist = haversine_m(latitude, longitude, self.latitude[idx], self.longitude[idx])
+        return {self.sites[i]["id"]: float(d) for i, d in zip(idx.tolist(), dist.tolist()) if d <= radius_m}
+
+
+_index = None
+_index_loaded_at = 0.0
+_index_lock = threading.Lock()
+
+
+def load_sites() -> List[Dict[str, Any]]:
+    with get_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(
+                """SELECT id, title, reporter_id, assignee_id, latitude, longitude
+                   FROM jobs
+                   WHERE status = ANY(%s) AND latitude IS NOT NULL AND longitude IS NOT NULL
+                """,
+                (list(OPEN_STATUSES),),
+            )
+            return cur.fetchall()
+
+
+def get_index(force: bool = False) -> SiteIndex:
+    """
+    The process-wide site index, rebuilt from Postgres at most every
+    GEOFENCE_REFRESH_SECONDS. Readers keep using the old index while a
+    new one is built.
+    """
+    global _index, _index_loaded_at
+    if not force and _index is not None and time.monotonic() - _index_loaded_at < geofence_settings.refresh_seconds:
+        return _index
+    with _index_lock:
+        if force or _index is None or time.monotonic() - _index_loaded_at >= geofence_settings.refresh_seconds:
+            _index = SiteIndex(load_sites())
+            _index_loaded_at = time.monotonic()
+    return _index
+
+
+def _epoch(value) -> float:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    return time.time() if value is None else float(value)
+
+
+def _transitions(index: SiteIndex, inside: set, points: List[Dict[str, Any]]) -> Tuple[List, List]:
+    """
+    Walks one user's points in time order and returns the (job_id, point)
+    pairs where the user entered or left a fence.
+    """
+    enter_r = geofence_settings.radius_m
+    exit_r = enter_r + geofence_settings.exit_margin_m
+    entered, left = [], []
+    # Fences of jobs that are no longer open are forgotten silently
+    # (evaluate_points removes them from Redis)
+    inside = {job_id for job_id in inside if job_id in index.by_id}
+    for p in points:
+        lat, lon = float(p["latitude"]), float(p["longitude"])
+        near = index.within(lat, lon, exit_r)
+        for job_id in [j for j in inside if j not in near]:
+            inside.discard(job_id)
+            left.append((job_id, p))
+        for job_id, dist in near.items():
+            if dist <= enter_r and job_id not in inside:
+                inside.add(job_id)
+                entered.append((job_id, p))
+    return entered, left
+
+
+def evaluate_points(rows: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    Checks ingested location rows against the open job sites and notifies
+    the job's reporter and assignee when a crew member arrives or leaves.
+
+    Enter/leave state lives in Redis so every worker agrees on it; SADD and
+    SREM report whether this call changed the state, so concurrent workers
+    never emit the same event twice. Points older than
+    GEOFENCE_MAX_POINT_AGE_S (late buffered uploads) are ignored.
+    Best-effort: failures are logged, never raised to the ingestion path.
+    """
+    if not geofence_settings.enabled:
+        return {"entered": 0, "left": 0}
+    try:
+        oldest = time.time() - geofence_settings.max_point_age_s
+        by_user = defaultdict(list)
+        for row in rows:
+            # Only numeric ids; the Redis state and notifications key on them
+            if isinstance(row.get("user_id"), int) and _epoch(row.get("timestamp")) >= oldest:
+                by_user[row["user_id"]].append(row)
+        if not by_user:
+            return {"entered": 0, "left": 0}
+
+        index = get_index()
+        client = get_client()
+        users = list(by_user)
+        pipe = client.pipeline(transaction=False)
+        for user_id in users:
+            pipe.smembers(f"{INSIDE_PREFIX}:{user_id}")
+        states = pipe.execute()
+
+        candidates, stale = [], {}
+        for user_id, members in zip(users, states):
+            inside = {int(m) for m in members}
+            gone = [job_id for job_id in inside if job_id not in index.by_id]
+            if gone:
+                stale[user_id] = gone
+            points = sorted(by_user[user_id], key=lambda r: _epoch(r.get("timestamp")))
+            entered, left = _transitions(index, inside, points)
+            candidates += [("entered", user_id, job_id, p) for job_id, p in entered]
+            candidates += [("left", user_id, job_id, p) for job_id, p in left]
+        if stale:
+            # Closed or deleted jobs would otherwise stay in the sets forever
+            pipe = client.pipeline(transaction=False)
+            for user_id, gone in stale.items():
+                pipe.srem(f"{INSIDE_PREFIX}:{user_id}", *gone)
+            pipe.execute()
+        if not candidates:
+            return {"entered": 0, "left": 0}
+
+        pipe = client.pipeline(transaction=False)
+        for kind, user_id, job_id, _ in candidates:
+            key = f"{INSIDE_PREFIX}:{user_id}"
+            if kind == "entered":
+                pipe.sadd(key, job_id)
+            else:
+                pipe.srem(key, job_id)
+        changed = pipe.execute()
+        events = [c for c, won in zip(candidates, changed) if won]
+        _notify(index, events)
+        return {
+            "entered": sum(1 for e in events if e[0] == "entered"),
+            "left": sum(1 for e in events if e[0] == "left"),
+        }
+    except Exception as e:
+        logger.error(f"Geofence evaluation failed: {e}")
+        return {"entered": 0, "left": 0}
+
+
+def _notify(index: SiteIndex, events: List[Tuple[str, Any, int, Dict[str, Any]]]):
+    """
+    Queues the arrival/leave notifications on the outbox, so they are
+    coalesced, counted, pushed and emailed like every other notification
+    (util/notification_dispatcher.py).
+    """
+    rows = []
+    for kind, user_id, job_id, point in events:
+        site = index.sites[index.by_id[job_id]]
+        verb = "arrived at" if kind == "entered" else "left"
+        message = f"User {user_id} {verb} job #{job_id} ({site['title']})"
+        for receiver in {site["reporter_id"], site["assignee_id"]} - {None, user_id}:
+            rows.append((receiver, job_id, message, f"geofence_{kind}"))
+    if not rows:
+        return
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            for receiver, job_id, message, kind in rows:
+                enqueue_notification(cur, receiver, job_id, message, kind=kind)
+            conn.commit()
@@ -0,0 +1,231 @@
+# util/ingest_queue.py
+
+import atexit
+import queue
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+from config.settings import IngestSettings
+from util.geo import haversine_m
+from util.logit import get_logger
+
+logger = get_logger("logs", "Ingest Queue")
+
+ingest_settings = IngestSettings()
+
+
+class IngestQueueFull(Exception):
+    """Raised by submit() when the flush thread cannot keep up."""
+
+
+class LocationIngestQueue:
+    """
+    Write-behind buffer for single location points.
+
+    submit() drops GPS jitter (a point within dedup_distance_m and
+    dedup_seconds of the last stored point of the same device, where a
+    device is the (user_id, job_id) pair) and queues everything else;
+    points queued within one flush interval are deduplicated at flush.
+    A daemon thread drains the queue every flush_interval seconds, or as
+    soon as max_batch points are waiting, and hands each batch to `writer`.
+    """
+
+    def __init__(self, name: str, writer: Callable[[List[Dict[str, Any]]], int],
+                 settings: IngestSettings = ingest_settings):
+        self.name = name
+        self._writer = writer
+        self._settings = settings
+        self._queue = queue.Queue(maxsize=settings.max_queue)
+        self._last = OrderedDict()  # device -> (latitude, longitude, epoch seconds)
+        self._last_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            "accepted": 0,
+            "deduplicated": 0,
+            "written": 0,
+            "rejected": 0,
+            "failed": 0,
+            "batches": 0,
+        }
+
+    def _count(self, **deltas):
+        with self._metrics_lock:
+            for key, delta in deltas.items():
+                self._metrics[key] += delta
+
+    @staticmethod
+    def _position(point: Dict[str, Any]):
+        device = (point.get("user_id"), point["job_id"])
+        return device, (float(point["latitude"]), float(point["longitude"]), point["timestamp"].timestamp())
+
+    def _is_jitter(self, previous, current) -> bool:
+        if previous is None:
+            return False
+        p_lat, p_lon, p_ts = previous
+        lat, lon, ts = current
+        return (abs(ts - p_ts) < self._settings.dedup_seconds
+                and haversine_m(p_lat, p_lon, lat, lon) < self._settings.dedup_distance_m)
+
+    def _dedup(self, batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Drops the points of a drained batch that are jitter of an earlier
+        point in the same batch, for devices reporting faster than the
+        flush interval.
+        """
+        kept, seen = [], {}
+        with self._last_lock:
+            for point in batch:
+                device, current = self._position(point)
+                if self._is_jitter(seen.get(device, self._last.get(device)), current):
+                    continue
+                seen[device] = current
+                kept.append(point)
+        if len(kept) < len(batch):
+            self._count(deduplicated=len(batch) - len(kept))
+        return kept
+
+    def _remember(self, batch: List[Dict[str, Any]]):
+        """
+        Makes the points of a stored batch the devices' new references.
+        Only called after the writer succeeded, so a failed flush never
+        suppresses the next points as jitter of something never stored.
+        """
+        with self._last_lock:
+            for point in batch:
+                device, current = self._position(point)
+                previous = self._last.get(device)
+                if previous is None or current[2] >= previous[2]:
+                    self._last[device] = current
+                self._last.move_to_end(device)
+            while len(self._last) > self._settings.max_devices:
+                self._last.popitem(last=False)
+
+    def submit(self, point: Dict[str, Any]) -> bool:
+        """
+        Queues one point (job_id, latitude, longitude, optional user_id and
+        timestamp; the timestamp defaults to now, not to the flush time).
+        Returns False when the point was dropped as jitter.
+        Raises IngestQueueFull when the queue is at max_queue.
+        """
+        point = dict(point)
+        if point.get("timestamp") is None:
+            point["timestamp"] = datetime.now(timezone.utc)
+        device, current = self._position(point)
+        with self._last_lock:
+            previous = self._last.get(device)
+        if self._is_jitter(previous, current):
+            self._count(deduplicated=1)
+            return False
+
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(point)
+        except queue.Full:
+            raise IngestQueueFull(f"{self.name} ingest queue is full")
+        self._count(accepted=1)
+        if self._queue.qsize() >= self._settings.max_batch:
+            self._wake.set()
+        return True
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name=f"ingest-{self.name}", daemon=True
+                )
+                self._thread.start()
+
+    def _drain(self) -> List[Dict[str, Any]]:
+        batch = []
+        while len(batch) < self._settings.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def flush(self) -> int:
+        """
+        Writes everything queued so far on the calling thread.
+        Returns the number of points the writer stored.
+        """
+        written = 0
+        while True:
+            drained = self._drain()
+            if not drained:
+                return written
+            batch = self._dedup(drained)
+            if not batch:
+                continue
+            try:
+                stored = self._writer(batch)
+                self._count(written=stored, rejected=len(batch) - stored, batches=1)
+                self._remember(batch)
+                written += stored
+            except Exception as e:
+                self._count(failed=len(batch))
+                logger.error(f"{self.name} ingest flush of {len(batch)} points failed: {e}")
+
+    def _run(self):
+        while True:
+            self._wake.wait(self._settings.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._metrics_lock:
+            metrics = dict(self._metrics)
+        metrics["queued"] = self._queue.qsize()
+        metrics["devices"] = len(self._last)
+        return metrics
+
+
+def _write_postgres(batch: List[Dict[str, Any]]) -> int:
+    from database.location_queries import insert_locations
+    from util.activity_logger import log_activity
+
+    results = insert_locations(batch)
+    created = sum(1 for r in results if "location" in r)
+    # One activity row per flushed batch instead of one per GPS report
+    log_activity("Locations ingested", "location",
+                 details={"created": created, "rejected": len(results) - created})
+    return created
+
+
+def _write_firestore(batch: List[Dict[str, Any]]) -> int:
+    from database.location_ops import insert_locations
+    from database.latest_positions import record_positions
+    from util.geofence import evaluate_points
+
+    docs = insert_locations(batch)
+    record_positions(docs)
+    evaluate_points(docs)
+    return len(docs)
+
+
+postgres_queue = LocationIngestQueue("postgres", _write_postgres)
+firestore_queue = LocationIngestQueue("firestore", _write_firestore)
+QUEUES = (postgres_queue, firestore_queue)
+
+
+def ingest_stats() -> Dict[str, Any]:
+    return {q.name: q.stats() for q in QUEUES}
+
+
+def _flush_all(timeout: Optional[float] = None):
+    deadline = None if timeout is None else time.monotonic() + timeout
+    for q in QUEUES:
+        if deadline is not None and time.monotonic() > deadline:
+            break
+        q.flush()
+
+
+# Do not lose buffered points on a clean shutdown
+atexit.register(_flush_all, 10.0)
@@ -0,0 +1,36 @@
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from flask_limiter import Limiter
+from flask_limiter.util import get_remote_address
+from config.settings import RedisSettings, RateLimitSettings
+from database.redisdb import get_pool
+
+_redis_settings = RedisSettings()
+rate_limits = RateLimitSettings()
+
+
+def get_identity_or_address() -> str:
+    """
+    Rate-limit key for authenticated device traffic: the JWT identity when a
+    token is present, so crews behind one NAT do not share a bucket,
+    otherwise the remote address.
+    """
+    try:
+        verify_jwt_in_request(optional=True)
+        identity = get_jwt_identity()
+    except Exception:
+        identity = None
+    return f"user:{identity}" if identity else get_remote_address()
+
+
+# Single limiter for the whole app. Counters live in the shared Redis so
+# every worker process enforces the same limits; the moving-window
+# strategy checks and records a hit in one Lua round-trip per limit.
+limiter = Limiter(
+    key_func=get_remote_address,
+    default_limits=[rate_limits.default] if rate_limits.default else [],
+    storage_uri=_redis_settings.url,
+    storage_options={"connection_pool": get_pool()},
+    strategy=rate_limits.strategy,
+    key_prefix="ratelimit",
+    swallow_errors=True,
+)
@@ -5,8 +5,10 @@ import time
 import os
 from colorama import init
 from pydantic import ValidationError
-from database.into_redis import clone_postgres_to_redis
+from database.redis_snapshot import warm_start
+from database.location_partitions import ensure_partitions
 from database.postgres import check_database as checkDB
+from database.redisdb import check_database as checkRedis
 from util.braille.logo import render_image_as_braille_banner
 from util.braille.progress_bar import animate_multiple_braille_bars
 from util.logit import get_logger
@@ -160,15 +162,12 @@ def check_database():
 
 
 def check_redis():
-    # Example: Try import and ping redis
+    # Ping through the shared pool so REDIS_* settings apply here too
     try:
-        import redis
-
-        r = redis.StrictRedis(
-            host="localhost", port=6379, db=0, socket_connect_timeout=2
-        )
-        r.ping()
-        return "OK"
+        if checkRedis():
+            return "OK"
+        else:
+            return "FAIL"
     except Exception:
         return "FAIL"
 
@@ -366,13 +365,18 @@ def main_starship_check():
     else:
         print(f"\033[92mAll systems nominal. D4B LAUNCHED! 🚀{RESET}\n")
 
-    # 4) Clone if Database & Redis OK
+    # 4) Warm the mirror if Database & Redis OK (snapshot + catch-up, else full clone)
     db = next((x for x in system_status if x["name"]=="Database"), None)
     rd = next((x for x in system_status if x["name"]=="Cache/Redis"), None)
+    if db and db["status"]=="OK":
+        try:
+            ensure_partitions()
+        except Exception:
+            logger.exception("Could not create upcoming locations partitions")
     if db and rd and db["status"]=="OK" and rd["status"]=="OK":
-        clone_postgres_to_redis()
+        warm_start()
     else:
-        print("\n\033[91mCRITICAL: Skipping clone_postgres_to_redis()—DB/Redis offline.\033[0m")
+        print("\n\033[91mCRITICAL: Skipping warm_start()—DB/Redis offline.\033[0m")
 
     return system_status
 
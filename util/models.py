@@ -1,5 +1,5 @@
 # models.py
-from pydantic import BaseModel, EmailStr, constr, Field
+from pydantic import BaseModel, EmailStr, constr, Field, validator
 
 
 class RegisterRequest(BaseModel):
@@ -20,3 +20,44 @@ class LocationPayload(BaseModel):
     job_id: int = Field(..., description="Related job identifier")
     latitude: float = Field(..., description="Latitude")
     longitude: float = Field(..., description="Longitude")
+
+# Job statuses after which a job is done (close_job sets "completed")
+FINISHED_JOB_STATUSES = ("completed", "closed")
+
+class JobCreateRequest(BaseModel):
+    title: str = Field(..., min_length=2)
+    description: str | None = None
+    priority: str = Field("Medium", regex="^(Critical|High|Medium|Low)$")
+    location: str | None = None
+    latitude: float | None = Field(None, ge=-90, le=90)
+    longitude: float | None = Field(None, ge=-180, le=180)
+    team_id: int | None = None
+    assignee_id: int | None = None
+
+class JobUpdateRequest(BaseModel):
+    title: str | None = None
+    description: str | None = None
+    priority: str | None = Field(None, regex="^(Critical|High|Medium|Low)$")
+    location: str | None = None
+    latitude: float | None = Field(None, ge=-90, le=90)
+    longitude: float | None = Field(None, ge=-180, le=180)
+    status: str | None = Field(None, regex="^(open|in_progress|completed|closed)$")
+    team_id: int | None = None
+    assignee_id: int | None = None
+
+class JobListFilters(BaseModel):
+    # Query string filters of list_jobs, normalized to the stored values
+    # so the Redis indexes and Postgres match the same rows
+    status: str | None = None
+    priority: str | None = None
+    team_id: int | None = None
+    assignee_id: int | None = None
+    reporter_id: int | None = None
+
+    @validator("status", pre=True)
+    def _lower(cls, v):
+        return v.strip().lower() if isinstance(v, str) else v
+
+    @validator("priority", pre=True)
+    def _capitalize(cls, v):
+        return v.strip().capitalize() if isinstance(v, str) else v
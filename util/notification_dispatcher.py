@@ -0,0 +1,131 @@
+# util/notification_dispatcher.py
+
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+from psycopg2.extras import RealDictCursor
+from config.settings import NotificationSettings
+from database.notification_queries import (
+    OUTBOX_CHANNEL,
+    claim_outbox,
+    claim_outbox_ids,
+    delete_outbox,
+    deliver_outbox,
+    reschedule_outbox,
+)
+from database.pg_listener import listener
+from database.postgres import get_connection
+from database.redisdb import get_client
+from database.unread_counters import count_new, reconcile_unread
+from util.activity_logger import log_activity
+from util.email_delivery import email_new_notifications
+from util.logit import get_logger
+
+logger = get_logger("logs", "Notification Dispatcher")
+
+notification_settings = NotificationSettings()
+
+RECONCILE_LOCK = "notify:reconcile:lock"
+
+
+class NotificationDispatcher:
+    """
+    Worker pool that drains notification_outbox into notifications.
+
+    Each worker claims a batch with FOR UPDATE SKIP LOCKED, delivers it with
+    one multi-row insert and deletes the outbox rows in the same
+    transaction, so an intent is delivered exactly once even if a worker
+    dies mid-batch. A NOTIFY from enqueue_notification wakes the workers;
+    the poll interval only matters for retries and missed wake-ups.
+    """
+
+    def __init__(self, settings: NotificationSettings = notification_settings):
+        self._settings = settings
+        self._wake = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            listener.subscribe(OUTBOX_CHANNEL, lambda _payload: self._wake.set())
+            for i in range(max(1, self._settings.workers)):
+                thread = threading.Thread(target=self._run, name=f"notify-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            thread = threading.Thread(target=self._reconcile_loop, name="notify-reconcile", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _reconcile_loop(self):
+        interval = self._settings.reconcile_interval
+        while True:
+            time.sleep(interval)
+            try:
+                # One process per interval does the work
+                if get_client().set(RECONCILE_LOCK, 1, nx=True, ex=max(1, int(interval * 0.9))):
+                    reconcile_unread()
+            except Exception as e:
+                logger.error(f"Unread counter reconciliation failed: {e}")
+
+    def _run(self):
+        while True:
+            self._wake.wait(self._settings.poll_interval)
+            self._wake.clear()
+            try:
+                while self.dispatch_batch() == self._settings.batch_size:
+                    pass
+            except Exception as e:
+                logger.error(f"Notification dispatch failed: {e}")
+
+    def dispatch_batch(self) -> int:
+        """
+        Claims and delivers one batch. Returns the number of rows claimed.
+        """
+        with get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                rows = claim_outbox(cur, self._settings.batch_size)
+                if not rows:
+                    conn.rollback()
+                    return 0
+                try:
+                    notified = deliver_outbox(cur, rows)
+                    delivered, failed = rows, []
+                except Exception:
+                    conn.rollback()
+                    rows = claim_outbox_ids(cur, [r["id"] for r in rows])
+                    delivered, failed, notified = self._deliver_one_by_one(cur, rows)
+
+                if delivered:
+                    delete_outbox(cur, [r["id"] for r in delivered])
+                for row, error in failed:
+                    reschedule_outbox(cur, [row["id"]], error,
+                                      self._settings.max_attempts, self._settings.retry_base_s)
+                conn.commit()
+
+        count_new(notified)
+        email_new_notifications(notified)
+        if delivered:
+            # One activity row per batch rather than per notification
+            log_activity("Notifications sent", "notification",
+                         details={"intents": len(delivered), "notifications": len(notified), "failed": len(failed)})
+        return len(rows)
+
+    @staticmethod
+    def _deliver_one_by_one(cur, rows) -> Tuple[List[Dict[str, Any]], List[Tuple[Dict[str, Any], str]], List[int]]:
+        # Isolates the rows that break the batch insert (e.g. a deleted user)
+        delivered, failed, notified = [], [], []
+        for row in rows:
+            cur.execute("SAVEPOINT deliver_one")
+            try:
+                notified += deliver_outbox(cur, [row])
+                cur.execute("RELEASE SAVEPOINT deliver_one")
+                delivered.append(row)
+            except Exception as e:
+                cur.execute("ROLLBACK TO SAVEPOINT deliver_one")
+                failed.append((row, str(e)))
+        return delivered, failed, notified
+
+
+notification_dispatcher = NotificationDispatcher()
@@ -0,0 +1,119 @@
+# util/notification_stream.py
+
+import json
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List
+from psycopg2.extras import RealDictCursor
+from database.pg_listener import listener
+from database.postgres import get_connection
+from util.logit import get_logger
+from util.sse import StreamFull, Subscriber, stream_settings
+
+logger = get_logger("logs", "Notification Stream")
+
+# Sent by the trigger in database/SQL/notification_push.sql:
+# {"user_id": 7, "ids": [101, 102]} for every statement inserting notifications
+NOTIFICATIONS_CHANNEL = "notifications_new"
+
+
+class UserSubscriber(Subscriber):
+    def __init__(self, user_id: int):
+        super().__init__()
+        self.user_id = user_id
+
+
+class NotificationHub:
+    """
+    Routes new notifications to the SSE and long-poll clients of this
+    process, keyed by user. Every worker shares the one pg_listener
+    connection; a NOTIFY for a user without a local client is dropped
+    without touching the database, so idle users cost nothing.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[int, List[UserSubscriber]] = defaultdict(list)
+        self._count = 0
+        self._lock = threading.Lock()
+        self._started = False
+
+    def _start(self):
+        if not self._started:
+            listener.subscribe(NOTIFICATIONS_CHANNEL, self._on_notify)
+            self._started = True
+
+    def _on_notify(self, payload: str):
+        event = json.loads(payload)
+        with self._lock:
+            subscribers = list(self._subscribers.get(event["user_id"], []))
+        if not subscribers:
+            return
+        with get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(
+                    "SELECT * FROM notifications WHERE id = ANY(%s) ORDER BY id",
+                    (event["ids"],),
+                )
+                rows = cur.fetchall()
+        for row in rows:
+            for subscriber in subscribers:
+                subscriber.push(row)
+
+    def subscribe(self, user_id: int) -> UserSubscriber:
+        # NOTIFY payloads carry the numeric id; any other key never matches
+        if not isinstance(user_id, int) or isinstance(user_id, bool):
+            raise TypeError(f"subscribe needs the numeric user id, got {user_id!r}")
+        with self._lock:
+            if self._count >= stream_settings.max_clients:
+                raise StreamFull("Too many live notification clients")
+            self._start()
+            subscriber = UserSubscriber(user_id)
+            self._subscribers[user_id].append(subscriber)
+            self._count += 1
+        return subscriber
+
+    def unsubscribe(self, subscriber: UserSubscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(subscriber.user_id, [])
+            if subscriber in subscribers:
+                subscribers.remove(subscriber)
+                self._count -= 1
+                if not subscribers:
+                    del self._subscribers[subscriber.user_id]
+
+    def client_count(self) -> int:
+        return self._count
+
+
+notification_hub = NotificationHub()
+
+
+def fetch_since(user_id: int, after_id: int, limit: int = 100) -> List[Dict[str, Any]]:
+    with get_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(
+                """SELECT * FROM notifications
+                   WHERE user_id = %s AND id > %s
+                   ORDER BY id
+                   LIMIT %s
+                """,
+                (user_id, after_id, limit),
+            )
+            return cur.fetchall()
+
+
+def wait_for_notifications(user_id: int, after_id: int, timeout: float) -> List[Dict[str, Any]]:
+    """
+    Long poll: returns the user's notifications with id > after_id, waiting
+    up to `timeout` seconds for one to arrive when there are none yet.
+    Subscribes before querying, so a row inserted in between is not missed.
+    """
+    subscriber = notification_hub.subscribe(user_id)
+    try:
+        rows = fetch_since(user_id, after_id)
+        if rows or not subscriber.ready.wait(timeout):
+            return rows
+        # New rows, or older unread ones that absorbed a repeat (update_count)
+        return list(subscriber.buffer)
+    finally:
+        notification_hub.unsubscribe(subscriber)
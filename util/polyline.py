@@ -0,0 +1,67 @@
+# util/polyline.py
+
+from typing import List, Tuple
+import numpy as np
+
+# Google encoded polyline algorithm:
+# https://developers.google.com/maps/documentation/utilities/polylinealgorithm
+
+
+def _encode_values(values: np.ndarray) -> str:
+    """
+    Encodes signed integer deltas as polyline characters, vectorized:
+    every value is split into at most 13 five-bit chunks at once (enough
+    for any int64, e.g. epoch milliseconds) and the unused chunks are
+    masked out.
+    """
+    if len(values) == 0:
+        return ""
+    v = values.astype(np.int64)
+    v = np.where(v < 0, ~(v << 1), v << 1).astype(np.uint64)
+    shifts = np.arange(13, dtype=np.uint64) * np.uint64(5)
+    chunks = ((v[:, None] >> shifts) & np.uint64(0x1F)).astype(np.int64)
+    # Number of chunks each value needs (at least one)
+    bits = np.zeros(len(v), dtype=np.int64)
+    rest = v.copy()
+    while np.any(rest):
+        bits += rest > 0
+        rest >>= np.uint64(5)
+    n_chunks = np.maximum(bits, 1)
+    used = np.arange(13)[None, :] < n_chunks[:, None]
+    more = np.arange(13)[None, :] < (n_chunks - 1)[:, None]
+    chars = (chunks | np.where(more, 0x20, 0)) + 63
+    return chars[used].astype(np.uint8).tobytes().decode("ascii")
+
+
+def encode_polyline(latitude, longitude, precision: int = 5) -> str:
+    """
+    Encodes a track as a Google polyline string.
+    """
+    factor = 10 ** precision
+    lat = np.round(np.asarray(latitude, dtype=float) * factor).astype(np.int64)
+    lon = np.round(np.asarray(longitude, dtype=float) * factor).astype(np.int64)
+    deltas = np.empty(2 * len(lat), dtype=np.int64)
+    deltas[0::2] = np.diff(lat, prepend=0)
+    deltas[1::2] = np.diff(lon, prepend=0)
+    return _encode_values(deltas)
+
+
+def _decode_values(encoded: str) -> List[int]:
+    values, result, shift = [], 0, 0
+    for ch in encoded.encode("ascii"):
+        b = ch - 63
+        result |= (b & 0x1F) << shift
+        shift += 5
+        if b < 0x20:
+            values.append(~(result >> 1) if result & 1 else result >> 1)
+            result, shift = 0, 0
+    return values
+
+
+def decode_polyline(encoded: str, precision: int = 5) -> List[Tuple[float, float]]:
+    """
+    Decodes a Google polyline string into (latitude, longitude) pairs.
+    """
+    values = np.asarray(_decode_values(encoded), dtype=np.int64)
+    coords = np.cumsum(values.reshape(-1, 2), axis=0) / 10 ** precision
+    return [tuple(p) for p in coords.tolist()]
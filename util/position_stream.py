@@ -0,0 +1,119 @@
+# util/position_stream.py
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set
+from database.pg_listener import listener
+from database.postgres import get_connection
+from util.logit import get_logger
+from util.sse import StreamFull, Subscriber, stream_settings
+
+logger = get_logger("logs", "Position Stream")
+
+# insert_locations publishes every stored point on this channel
+POSITIONS_CHANNEL = "location_points"
+
+
+class PositionSubscriber(Subscriber):
+    """
+    A live-map client and its filters. Dropping the oldest positions of a
+    slow client is harmless: a newer position supersedes them anyway.
+    """
+
+    def __init__(self, job_ids: Optional[Set[int]], team_ids: Optional[Set[int]]):
+        super().__init__()
+        self.job_ids = job_ids
+        self.team_ids = team_ids
+
+    def wants(self, point: Dict[str, Any]) -> bool:
+        if self.job_ids is None and self.team_ids is None:
+            return True
+        return bool(
+            (self.job_ids and point.get("job_id") in self.job_ids)
+            or (self.team_ids and point.get("team_id") in self.team_ids)
+        )
+
+
+class PositionBroadcaster:
+    """
+    Fans positions published by any worker (Postgres NOTIFY on
+    POSITIONS_CHANNEL) out to every client of this process. The single
+    listener thread does the filtering, so the database sees one
+    connection per worker no matter how many dashboards are open.
+    """
+
+    def __init__(self):
+        self._subscribers: List[PositionSubscriber] = []
+        self._lock = threading.Lock()
+        self._job_team = OrderedDict()  # job_id -> (team_id, monotonic load time)
+        self._started = False
+
+    def _start(self):
+        if not self._started:
+            listener.subscribe(POSITIONS_CHANNEL, self._on_notify)
+            self._started = True
+
+    def _teams_of(self, job_ids: Set[int]) -> Dict[int, Optional[int]]:
+        """
+        Team of each job, cached for STREAM_TEAM_CACHE_SECONDS in an LRU of
+        STREAM_TEAM_CACHE_SIZE jobs. Only the listener thread calls this.
+        """
+        now = time.monotonic()
+        teams, missing = {}, []
+        for job_id in job_ids:
+            cached = self._job_team.get(job_id)
+            if cached is not None and now - cached[1] < stream_settings.team_cache_seconds:
+                teams[job_id] = cached[0]
+                self._job_team.move_to_end(job_id)
+            else:
+                missing.append(job_id)
+        if missing:
+            with get_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT id, team_id FROM jobs WHERE id = ANY(%s)", (missing,))
+                    loaded = dict(cur.fetchall())
+            for job_id in missing:
+                # Unknown jobs are cached too, as having no team
+                teams[job_id] = loaded.get(job_id)
+                self._job_team[job_id] = (teams[job_id], now)
+                self._job_team.move_to_end(job_id)
+            while len(self._job_team) > stream_settings.team_cache_size:
+                self._job_team.popitem(last=False)
+        return teams
+
+    def _on_notify(self, payload: str):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        if not subscribers:
+            return
+        points = json.loads(payload)
+        if any(s.team_ids for s in subscribers):
+            teams = self._teams_of({p["job_id"] for p in points})
+            for p in points:
+                p["team_id"] = teams.get(p["job_id"])
+        for point in points:
+            for subscriber in subscribers:
+                if subscriber.wants(point):
+                    subscriber.push(point)
+
+    def subscribe(self, job_ids: Optional[Set[int]] = None, team_ids: Optional[Set[int]] = None) -> PositionSubscriber:
+        with self._lock:
+            if len(self._subscribers) >= stream_settings.max_clients:
+                raise StreamFull("Too many live position clients")
+            self._start()
+            subscriber = PositionSubscriber(job_ids, team_ids)
+            self._subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: PositionSubscriber):
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+    def client_count(self) -> int:
+        return len(self._subscribers)
+
+
+broadcaster = PositionBroadcaster()
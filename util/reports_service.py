@@ -11,7 +11,17 @@ from database.reports_queries import (
     export_report_csv   as db_export_report_csv,
     refresh_reports_data as db_refresh_reports_data,
 )
+from config.settings import CacheSettings
+from util.cache import cached, invalidate
 
+_cache = CacheSettings()
+
+
+def _reports_cache(name: str):
+    return cached(f"reports:{name}", ttl=_cache.reports_ttl, stale_ttl=_cache.stale_ttl, beta=_cache.beta)
+
+
+@_reports_cache("metrics")
 def get_job_metrics(time_range: str) -> Dict[str, Any]:
     raw = db_get_job_metrics(time_range)
     return {
@@ -24,6 +34,7 @@ def get_job_metrics(time_range: str) -> Dict[str, Any]:
         "closedJobs":          raw["closed_jobs"],
     }
 
+@_reports_cache("teams")
 def get_team_performance(time_range: str) -> List[Dict[str, Any]]:
     rows = db_get_team_performance(time_range)
     return [
@@ -36,11 +47,13 @@ def get_team_performance(time_range: str) -> List[Dict[str, Any]]:
         for r in rows
     ]
 
+@_reports_cache("priority")
 def get_priority_distribution(time_range: str) -> List[Dict[str, Any]]:
     rows = db_get_priority_distribution(time_range)
     # keys are already priority, count, percentage
     return rows
 
+@_reports_cache("trends")
 def get_trend_data(time_range: str, granularity: str = "daily") -> List[Dict[str, Any]]:
     rows = db_get_trend_data(time_range, granularity)
     return [
@@ -69,6 +82,7 @@ def get_activity_log(limit: int = 10) -> List[Dict[str, Any]]:
         for r in rows
     ]
 
+@_reports_cache("system_health")
 def get_system_health() -> Dict[str, Any]:
     raw = db_get_system_health()
     return {
@@ -87,4 +101,6 @@ def export_report_bytes(fmt: str, time_range: str, options: dict) -> Tuple[bytes
     return csv_bytes, "text/csv", "csv"
 
 def refresh_reports_data() -> Dict[str, Any]:
-    return db_refresh_reports_data()
+    result = db_refresh_reports_data()
+    invalidate(prefix="reports:")
+    return result
@@ -0,0 +1,73 @@
+# util/sse.py
+
+import json
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Iterator
+from config.settings import StreamSettings
+
+stream_settings = StreamSettings()
+
+
+class StreamFull(Exception):
+    """Raised when STREAM_MAX_CLIENTS clients are already connected."""
+
+
+class Subscriber:
+    """
+    One connected client with a bounded buffer. When a slow client falls
+    behind, the oldest events are dropped and counted.
+    """
+
+    def __init__(self):
+        self.buffer = deque(maxlen=stream_settings.buffer_size)
+        self.dropped = 0
+        self.ready = threading.Event()
+
+    def wants(self, item: Dict[str, Any]) -> bool:
+        return True
+
+    def push(self, item: Dict[str, Any]):
+        if len(self.buffer) == self.buffer.maxlen:
+            self.dropped += 1
+        self.buffer.append(item)
+        self.ready.set()
+
+
+def _json_default(obj):
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    return str(obj)
+
+
+def sse_events(subscriber: Subscriber, event: str, on_close: Callable[[Subscriber], None]) -> Iterator[str]:
+    """
+    Server-sent event stream for one subscriber: an `event` message per
+    buffered item, a `dropped` message when items were skipped, and a
+    comment line every STREAM_HEARTBEAT_SECONDS of silence so proxies keep
+    the connection open and dead clients are noticed. Calls on_close when
+    the client goes away.
+    """
+    try:
+        yield "retry: 3000\n\n"
+        last_sent = time.monotonic()
+        while True:
+            subscriber.ready.wait(stream_settings.heartbeat_seconds)
+            subscriber.ready.clear()
+            sent = False
+            while subscriber.buffer:
+                item = subscriber.buffer.popleft()
+                data = json.dumps(item, default=_json_default, separators=(",", ":"))
+                yield f"event: {event}\ndata: {data}\n\n"
+                sent = True
+            if subscriber.dropped:
+                yield f"event: dropped\ndata: {subscriber.dropped}\n\n"
+                subscriber.dropped = 0
+            if sent:
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent >= stream_settings.heartbeat_seconds:
+                yield ": heartbeat\n\n"
+                last_sent = time.monotonic()
+    finally:
+        on_close(subscriber)
@@ -0,0 +1,158 @@
+# util/track_codec.py
+
+import struct
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+import numpy as np
+from util.polyline import _decode_values, _encode_values
+
+# Compact columnar encodings of location rows for GET /geo/ (content negotiation).
+#
+# Every column is turned into integers (coordinates scaled by 10**precision,
+# timestamps in epoch milliseconds, user_id shifted by one so 0 means null),
+# delta-encoded against the previous row and zigzag-encoded, then written as
+#   - polyline text: the Google polyline character scheme, in a JSON document
+#   - binary: LEB128 varints after a small header
+# Consecutive rows of one track share ids and move a little, so most
+# deltas fit in one or two characters/bytes.
+TRACK_JSON_MIME = "application/vnd.d4b.track+json"
+TRACK_BINARY_MIME = "application/vnd.d4b.track"
+
+BINARY_MAGIC = b"D4BT"
+BINARY_VERSION = 1
+COLUMNS = ("id", "job_id", "user_id", "latitude", "longitude", "timestamp")
+
+
+def _epoch_ms(value) -> int:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(round(value.timestamp() * 1000))
+
+
+def _columns(rows: List[Dict[str, Any]], precision: int) -> Dict[str, np.ndarray]:
+    factor = 10 ** precision
+    return {
+        "id": np.fromiter((r["id"] for r in rows), dtype=np.int64, count=len(rows)),
+        "job_id": np.fromiter((r["job_id"] for r in rows), dtype=np.int64, count=len(rows)),
+        "user_id": np.fromiter(
+            (0 if r["user_id"] is None else r["user_id"] + 1 for r in rows), dtype=np.int64, count=len(rows)
+        ),
+        "latitude": np.round(
+            np.fromiter((float(r["latitude"]) for r in rows), dtype=float, count=len(rows)) * factor
+        ).astype(np.int64),
+        "longitude": np.round(
+            np.fromiter((float(r["longitude"]) for r in rows), dtype=float, count=len(rows)) * factor
+        ).astype(np.int64),
+        "timestamp": np.fromiter((_epoch_ms(r["timestamp"]) for r in rows), dtype=np.int64, count=len(rows)),
+    }
+
+
+def _rows(columns: Dict[str, np.ndarray], precision: int) -> List[Dict[str, Any]]:
+    factor = 10 ** precision
+    rows = []
+    for i in range(len(columns["id"])):
+        user_id = int(columns["user_id"][i])
+        rows.append({
+            "id": int(columns["id"][i]),
+            "job_id": int(columns["job_id"][i]),
+            "user_id": user_id - 1 if user_id else None,
+            "latitude": round(int(columns["latitude"][i]) / factor, precision),
+            "longitude": round(int(columns["longitude"][i]) / factor, precision),
+            "timestamp": datetime.fromtimestamp(int(columns["timestamp"][i]) / 1000, tz=timezone.utc),
+        })
+    return rows
+
+
+def encode_track_columns(rows: List[Dict[str, Any]], precision: int = 5) -> Dict[str, Any]:
+    """
+    Columnar JSON document: one polyline-encoded delta string per column.
+    """
+    columns = _columns(rows, precision)
+    return {
+        "format": "columnar-polyline",
+        "precision": precision,
+        "count": len(rows),
+        "columns": {
+            name: _encode_values(np.diff(values, prepend=0)) for name, values in columns.items()
+        },
+    }
+
+
+def decode_track_columns(doc: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Inverse of encode_track_columns.
+    """
+    columns = {
+        name: np.cumsum(np.asarray(_decode_values(doc["columns"][name]), dtype=np.int64))
+        for name in COLUMNS
+    }
+    return _rows(columns, doc["precision"])
+
+
+def _zigzag(values: np.ndarray) -> np.ndarray:
+    return np.where(values < 0, ~(values << 1), values << 1).astype(np.uint64)
+
+
+def _varints(values: np.ndarray) -> bytes:
+    """
+    LEB128 varints of non-negative integers, vectorized like
+    polyline._encode_values: 10 seven-bit chunks per value, masked.
+    """
+    if len(values) == 0:
+        return b""
+    v = values.astype(np.uint64)
+    shifts = np.arange(10, dtype=np.uint64) * np.uint64(7)
+    chunks = (v[:, None] >> shifts) & np.uint64(0x7F)
+    n_chunks = np.ones(len(v), dtype=np.int64)
+    rest = v >> np.uint64(7)
+    while np.any(rest):
+        n_chunks += rest > 0
+        rest >>= np.uint64(7)
+    used = np.arange(10)[None, :] < n_chunks[:, None]
+    more = np.arange(10)[None, :] < (n_chunks - 1)[:, None]
+    out = chunks | np.where(more, np.uint64(0x80), np.uint64(0))
+    return out[used].astype(np.uint8).tobytes()
+
+
+def _read_varints(data: bytes, offset: int, count: int):
+    values, result, shift = [], 0, 0
+    while len(values) < count:
+        b = data[offset]
+        offset += 1
+        result |= (b & 0x7F) << shift
+        shift += 7
+        if b < 0x80:
+            values.append((result >> 1) ^ -(result & 1))
+            result, shift = 0, 0
+    return np.asarray(values, dtype=np.int64), offset
+
+
+def encode_track_binary(rows: List[Dict[str, Any]], precision: int = 5) -> bytes:
+    """
+    Binary layout:
+      magic "D4BT" | u8 version | u8 precision | u32 row count
+      then for each column in COLUMNS order: count zigzag LEB128 deltas
+    """
+    columns = _columns(rows, precision)
+    parts = [BINARY_MAGIC, struct.pack(">BBI", BINARY_VERSION, precision, len(rows))]
+    for name in COLUMNS:
+        parts.append(_varints(_zigzag(np.diff(columns[name], prepend=0))))
+    return b"".join(parts)
+
+
+def decode_track_binary(data: bytes) -> List[Dict[str, Any]]:
+    """
+    Inverse of encode_track_binary.
+    """
+    if data[:4] != BINARY_MAGIC:
+        raise ValueError("Not a D4B track payload")
+    version, precision, count = struct.unpack(">BBI", data[4:10])
+    if version != BINARY_VERSION:
+        raise ValueError(f"Unsupported track payload version {version}")
+    offset, columns = 10, {}
+    for name in COLUMNS:
+        deltas, offset = _read_varints(data, offset, count)
+        columns[name] = np.cumsum(deltas)
+    return _rows(columns, precision)